@@ -5,55 +5,136 @@ import os
 
 import instruction_set
 import assembly_parser
+import include_resolver
+import listing
+import memory_image
+import run_stats
+import table_generators
+from assembly_parser import TokenKind
+from assembly_ir import Node, NodeKind
+from symbol_table import SymbolKind, SymbolTable, format_symbol
 
 # Notes:
 # https://c64os.com/post/6502instructions
 
-class Assembler:
+# State of a single assembly run: addresses, labels, output and listing. The tables and compiled parser it
+# reads are owned by the Assembler and never modified, so any number of contexts can run at the same time.
+class AssemblyContext:
 
     # Modes
     MODE_PRESCAN = 0
     MODE_ASSEMBLE = 1
 
-    # Constructor (of sorts)
-    def __init__(self):
-
-        self._working_directory = os.getcwd()
-
-        self._instruction_set = instruction_set.InstructionSet()
-        self._instruction_set.loadInstructions()
+    # Token kinds holding a 16 bit value
+    WORD_TOKEN_KINDS = ( TokenKind.ABSOLUTE, TokenKind.ABSOLUTE_X, TokenKind.ABSOLUTE_Y, TokenKind.INDIRECT )
+
+    # Addressing modes an operand token of each kind can be assembled as, in order of preference
+    OPERAND_ADDRESSING_MODES = {
+        TokenKind.IMMEDIATE: ( instruction_set.InstructionSet.addressing_mode_Immediate, ),
+        TokenKind.ABSOLUTE_X: ( instruction_set.InstructionSet.addressing_mode_AbsoluteX, ),
+        TokenKind.ABSOLUTE_Y: ( instruction_set.InstructionSet.addressing_mode_AbsoluteY, ),
+        TokenKind.ABSOLUTE: ( instruction_set.InstructionSet.addressing_mode_Absolute, ),
+        TokenKind.ZEROPAGE_X: ( instruction_set.InstructionSet.addressing_mode_ZeroPageX, ),
+        TokenKind.ZEROPAGE_Y: ( instruction_set.InstructionSet.addressing_mode_ZeroPageY, ),
+        TokenKind.ZEROPAGE: ( instruction_set.InstructionSet.addressing_mode_ZeroPage, instruction_set.InstructionSet.addressing_mode_Relative ),
+        TokenKind.INDIRECT_INDEXED_Y: ( instruction_set.InstructionSet.addressing_mode_Indirect_Indexed_Y, ),
+        TokenKind.INDIRECT: ( instruction_set.InstructionSet.addressing_mode_Indirect, ),
+        TokenKind.INDEXED_INDIRECT_X: ( instruction_set.InstructionSet.addressing_mode_Indexed_Indirect_X, ),
+        TokenKind.RELATIVE: ( instruction_set.InstructionSet.addressing_mode_Relative, ),
+        TokenKind.ACCUMULATOR: ( instruction_set.InstructionSet.addressing_mode_Accumulator, )
+    }
+
+    # ( absolute, zero page ) operand token kinds of a symbol by the index register it is used with
+    INDEXED_TOKEN_KINDS = {
+        None: ( TokenKind.ABSOLUTE, TokenKind.ZEROPAGE ),
+        "X": ( TokenKind.ABSOLUTE_X, TokenKind.ZEROPAGE_X ),
+        "Y": ( TokenKind.ABSOLUTE_Y, TokenKind.ZEROPAGE_Y )
+    }
+
+    PAGE_SIZE = 0x100
+    MAX_ALIGNMENT = 0x8000
+
+    # Padding is filled with NOPs so code running into it carries on
+    PADDING = b"\xEA"
+
+    # ( instruction set, operand table ) of the last instruction set an operand table was built for
+    _operand_table_cache = None
 
-        self._parser = assembly_parser.AssemblyParser()
+    # Constructor (of sorts)
+    def __init__( self, assembler, base_address = 0xC000, working_directory = None ):
+
+        # Shared, read only
+        self._instruction_set = assembler._instruction_set
+        self._parser = assembler._parser
+        self._include_resolver = assembler._include_resolver
+        self._operand_table = assembler._operand_table
+
+        if ( working_directory == None ):
+            working_directory = assembler._working_directory
+        self._working_directory = working_directory
+
+        # Timings and counters when the assembler is profiling, None otherwise
+        self._stats = run_stats.RunStats() if assembler._profile else None
+
+        # Handlers turning each kind of statement into IR nodes, tokens are classified once so these are looked up directly
+        self._dispatch = {
+            TokenKind.INSTRUCTION: self.parse_instruction,
+            TokenKind.BYTESTRING_DECL: self.parse_bytestring,
+            TokenKind.WORDSTRING_DECL: self.parse_wordstring,
+            TokenKind.STRING_DECL: self.parse_string,
+            TokenKind.LABEL_DECL: self.parse_label_token,
+            TokenKind.VAR_DECL: self.parse_variable_token,
+            TokenKind.ORG_DIRECTIVE: self.parse_org_directive,
+            TokenKind.TABLE_DECL: self.parse_generated_data,
+            TokenKind.FILL_DECL: self.parse_generated_data,
+            TokenKind.ALIGN_DIRECTIVE: self.parse_align_directive,
+            TokenKind.PAGE_DIRECTIVE: self.parse_align_directive,
+            TokenKind.KEEP_PAGE_DIRECTIVE: self.parse_keep_page_directive,
+            TokenKind.END_KEEP_PAGE_DIRECTIVE: self.parse_end_keep_page_directive
+        }
 
         self.reset()
 
+        self.set_base_address( base_address )
 
-    # reset the assembler
+
+    # reset the context
     def reset(self):
         self._base_address = 0xC000
         self._address = 0xC000
-        self._labels = {}
-        self._assembly_output = bytearray()
-
-        self._machine_code_line = ""
-        self._assembly_line = ""
-
-
-    # Dump assembly line
-    def dump_assembly( self, address ):
-
-        tab = max(30 - len(self._machine_code_line),0)
+        self._labels = SymbolTable()
+        self._image = memory_image.MemoryImage()
+        self._memory = self._image.memory
+        self._segment_start = 0xC000
+        self._segments = []
+        self._output = None
+        self._included = []
+        self._ir = None
+        self._listing = None
+        self._keep_block = None
+        self._layout_hint = {}
+
+
+    # Rows of the listing of this run, formatted on demand. With cycles the rows show the size and cycles of
+    # every instruction and end with the totals per label, that takes the IR so runs restored from the
+    # assembly cache only have the plain listing.
+    def listing_rows( self, cycles = False ):
+        if ( cycles and self._ir != None ):
+            return listing.listing_rows( self._ir, self._instruction_set )
+        elif ( self._listing != None ):
+            return iter( self._listing )
+        elif ( self._ir != None ):
+            return listing.listing_rows( self._ir )
+        else:
+            return iter( () )
 
-        str = "$" + '{:04x}'.format(address).upper() + "  "
-        str = str + self._machine_code_line.upper()
-        str = str + " " * tab
 
-        str = str + self._assembly_line + " "
-        loggy.log( loggy.LOG_INFO, str )
+    # The listing of this run as a list of rows
+    def get_listing( self ):
+        if ( self._listing == None ):
+            self._listing = list( self.listing_rows() )
+        return self._listing
 
-        self._assembly_line = ""
-        self._machine_code_line = ""
-    
 
     # Calculate offset for relative addressing mode
     def calculate_relative_offset(self, current_address, target_address):
@@ -71,499 +152,1123 @@ class Assembler:
 
         return offset
 
-    # Set the working directory of the input file
-    def set_working_directory( self, directory ):
-        
-        self._working_directory = directory
-
-        loggy.log( loggy.LOG_DIAGNOSTIC, "Setting working directory - " + directory )
-
-
     # Parse implied instructions with no operands, i.e. RTS, BRK, INX etc.
     def parse_implied_instruction( self, current_instruction ):
     
         # Assemble the instruction
         opcode = current_instruction["addressing_modes"][self._instruction_set.addressing_mode_Implied]
-        self._assembly_output.append(opcode)
-        self._assembly_line = self._assembly_line + current_instruction["operator"]
-        self._machine_code_line = self._machine_code_line + '{:02x}'.format(opcode) + "       "
+        self._memory[self._address] = opcode
 
 
     # Parse label declaration, i.e. 'foo:' preceding a line with an instruction on it
     def parse_label_declaration( self, label_name ):
-        if ( label_name in self._labels.keys() ):
-            loggy.log( loggy.LOG_ERROR, "[!] Duplicate label " + label_name )
+        if ( label_name in self._labels ):
+            loggy.log( loggy.LOG_ERROR, "[!] Duplicate label %s", label_name )
             exit(1)
         else:
-            self._labels[label_name] = '${:04x}'.format(self._address)
-            loggy.log(loggy.LOG_DIAGNOSTIC, "Stored label " + label_name + " as " + self._labels[label_name] )
+            self._labels[label_name] = ( SymbolKind.ADDRESS, self._address )
+            loggy.log(loggy.LOG_DIAGNOSTIC, "Stored label %s as $%04x", label_name, self._address )
 
 
-    # Parse variable declaration, i.e. 'FOO = 5'
-    def parse_variable_declaration( self, variable_name, token ):
-        if ( variable_name in self._labels.keys() ):
-            loggy.log( loggy.LOG_ERROR, "[!] Duplicate variable " + variable_name )
+    # Parse variable declaration, i.e. 'FOO = $C000', 'FOO = $FB' or 'FOO = #$20'
+    def parse_variable_declaration( self, variable_name, kind, value ):
+        if ( variable_name in self._labels ):
+            loggy.log( loggy.LOG_ERROR, "[!] Duplicate variable %s", variable_name )
             exit(1)
         else:
-            loggy.log(loggy.LOG_DIAGNOSTIC, "Stored variable " + variable_name + " as " + token )
-            self._labels[variable_name] = token
+            self._labels[variable_name] = ( kind, value )
+            loggy.log(loggy.LOG_DIAGNOSTIC, "Stored variable %s as %s", variable_name, format_symbol( kind, value ) )
 
 
-    # Parse label references, i.e. where variables / labels are used as operands like JMP foo
+    # Parse label references, i.e. where variables / labels are used as operands like JMP foo.
+    # Returns the ( kind, value ) the reference resolves to, < and > give the low and high byte as an immediate.
     def parse_label_reference( self, match, mode ):
 
-        # Store original declaration, in the case of < and > modifiers this is useful
-        orig_label = match
-
         # Check for high/low byte modifier
-        if ( self._parser.is_high_low_byte_extract(orig_label) ):
-            match = match.replace("<", "").replace(">","")
-            loggy.log( loggy.LOG_DIAGNOSTIC, "Label without high/low modifier is: " + match )
+        modifier = match[:1]
+        if ( modifier == "<" or modifier == ">" ):
+            match = match[1:]
 
-        # Check whether match exists in our label store
-        if ( match in self._labels.keys() ):
-            
-            # Resolve the label
-            match = self._labels[match]
-            
-            # If we are modifying then use original label
-            if ( self._parser.is_high_low_byte_extract(orig_label) ):
-                byte = self._parser.extract_high_low_byte( orig_label, match )
-                match = "#$" + '{:02x}'.format(byte)
-                
-            loggy.log( loggy.LOG_DIAGNOSTIC, "Resolved label/variable reference: " + match )
-        else:
+        symbol = self._labels.get( match )
+
+        if ( symbol == None ):
 
             if ( mode == self.MODE_PRESCAN ):
                 # If we are modifying then only output will be byte literal, so assume that for now
-                # so we can derive addressing mode and instruction length
-                if ( self._parser.is_high_low_byte_extract(orig_label) ):
-                    match = "#$00"
-                else:
-                    # Otherwise let's assume that if this reference is not yet defined then it isn't
-                    # a variable, and so must be a label so treat as an address
-                    match = "$" + '{:04x}'.format(self._address)
+                # so we can derive addressing mode and instruction length. Otherwise let's assume that
+                # if this reference is not yet defined then it isn't a variable, and so must be a label
+                symbol = ( SymbolKind.IMMEDIATE, 0 ) if modifier == "<" or modifier == ">" else ( SymbolKind.ADDRESS, self._address )
 
-                loggy.log( loggy.LOG_DIAGNOSTIC, "Label not yet defined in first parse, so placeholder for now " + match )
+                loggy.log( loggy.LOG_DIAGNOSTIC, "Label not yet defined in first parse, so placeholder for now %s", match )
+                return symbol
 
-            elif ( mode == self.MODE_ASSEMBLE ):
-                loggy.log( loggy.LOG_ERROR, "Unresolved label/variable reference: " + match )
+            else:
+                loggy.log( loggy.LOG_ERROR, "Unresolved label/variable reference: %s", match )
                 exit(1)
 
-        return match
+        if ( modifier == "<" ):
+            symbol = ( SymbolKind.IMMEDIATE, symbol[1] & 0xFF )
+        elif ( modifier == ">" ):
+            symbol = ( SymbolKind.IMMEDIATE, ( symbol[1] >> 8 ) & 0xFF )
+
+        return symbol
             
 
-    # Parse a relative address and turn a reference to 16 bit address to a byte  
-    def parse_relative_address( self, match, current_instruction_address, mode ):
+    # Parse a label declaration token into a label node
+    def parse_label_token( self, tokens, idx, ir ):
 
-        if ( self._parser.is_word(match) ):
-            relative_offset = self.calculate_relative_offset( current_instruction_address, int( "0x" + match.replace("$",""),16 ) )
-            match = "$" + '{:02x}'.format(relative_offset)
-            loggy.log(loggy.LOG_DIAGNOSTIC, "Resolved relative addressing: " + match )
-        else:
-            if ( mode == self.MODE_ASSEMBLE ):
-                loggy.log( loggy.LOG_DIAGNOSTIC, "unresolved relative addressing: " + match )
-                exit(1)
-            elif ( mode == self.MODE_PRESCAN ):
-                match = "$00"
-        
-        return match
+        node = Node( NodeKind.LABEL, tokens[idx].text, tokens[idx].line )
+        node.symbol = tokens[idx].text.replace(":","")
+        ir.append(node)
+
+        return idx
+
+
+    # Parse a variable declaration token and its value into a variable node
+    def parse_variable_token( self, tokens, idx, ir ):
+
+        node = Node( NodeKind.VARIABLE, tokens[idx].text, tokens[idx].line )
+        node.symbol = self._parser.get_variable_name_from_declaration(tokens[idx].text)
+
+        # next token
+        idx = idx + 1
+        token = tokens[idx]
+        node.text = token.text
+
+        kind = SymbolKind.FROM_TOKEN_KINDS.get( token.kind )
+        if ( kind == None ):
+            loggy.log( loggy.LOG_ERROR, "Variable %s on line %d must be an address, byte or immediate value: %s", node.symbol, token.line, token.text )
+            exit(1)
+
+        node.data = ( kind, token.value )
+        ir.append(node)
+
+        return idx
+
+
+    # Parse a relative address, turning the 16 bit target of a branch into the offset byte
+    def parse_relative_address( self, symbol, current_instruction_address, mode ):
+
+        kind, value = symbol
+
+        if ( kind == SymbolKind.ADDRESS or kind == SymbolKind.WORD ):
+            relative_offset = self.calculate_relative_offset( current_instruction_address, value )
+            loggy.log(loggy.LOG_DIAGNOSTIC, "Resolved relative addressing: $%02x", relative_offset )
+            return relative_offset
+
+        if ( mode == self.MODE_ASSEMBLE ):
+            loggy.log( loggy.LOG_ERROR, "Branch target must be an address: %s", format_symbol( kind, value ) )
+            exit(1)
 
+        return 0
+
+
+    # Parse assembly directive to instruct what address assembly output should be addressed at, every
+    # origin starts a new segment
+    def parse_org_directive( self, tokens, idx, ir ):
+        self.check_outside_keep_block( tokens[idx] )
 
-    # Parse assembly directive to instruct what address assembly output should be addressed at
-    def parse_org_directive( self, matches, idx ):
         # next token
         idx = idx + 1
-        token = matches[idx]
+        token = tokens[idx]
 
-        if ( self._parser.is_word( token ) ):
-            self._base_address = self._parser.word_to_int(token)
-            self._address = self._base_address
-            loggy.log( loggy.LOG_INFO, "Setting origin to " + str(hex(self._address)) )
+        if ( token.kind in self.WORD_TOKEN_KINDS ):
+            node = Node( NodeKind.ORG, ".org " + token.text, token.line )
+            node.address = token.value
+            ir.append(node)
+            loggy.log( loggy.LOG_INFO, "Setting origin to %#x", node.address )
         else:
-            loggy.log( loggy.LOG_ERROR, "Invalid origin " + token )
+            loggy.log( loggy.LOG_ERROR, "Invalid origin %s", token.text )
             exit(1)
 
         return idx
 
     
+    # Bytes and listing text of the run of values the tokenizer converted along with a .byte or .word,
+    # the listing shows the values as written without the commas
+    def get_run( self, token ):
+        if ( token.value == None ):
+            return bytearray(), []
+
+        return bytearray( token.value ), token.text[5:].replace( ",", " " ).split()
+
+
     # Parse a series of 16 bit words, used to store arbitrary strings of words in assembly output
-    def parse_wordstring( self, instruction_address, matches, idx, mode ):
-        
-        while ( idx + 1 < len(matches) and self._parser.is_word( matches[idx+1] ) ):
+    def parse_wordstring( self, tokens, idx, ir ):
+
+        node = Node( NodeKind.DATA, None, tokens[idx].line )
+        data, text = self.get_run( tokens[idx] )
+
+        while ( idx + 1 < len(tokens) and tokens[idx+1].kind in self.WORD_TOKEN_KINDS ):
             idx = idx + 1
-            match = matches[idx]
-            bytes = self._parser.parse_word_big_endian(match)
-            
-            for b in bytes:
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self._assembly_output.append(b)
-                    self._machine_code_line = self._machine_code_line + '{:02x}'.format(b) + " "
-                    self._assembly_line = self._assembly_line + match + " "
-                self._address = self._address + 2
-        
+            value = tokens[idx].value
+            data.append( value >> 8 )
+            data.append( value & 0xFF )
+            text.append( tokens[idx].text )
+
+        node.data = data
+        node.size = len(data)
+        node.text = " ".join(text)
+        ir.append(node)
+
         return idx
 
 
     # Parse a series of 8 bit bytes, used to store arbitrary strings of bytes in assembly output
-    def parse_bytestring( self, instruction_address, matches, idx, mode ):
-        
-        while ( idx + 1 < len(matches) and self._parser.is_byte( matches[idx+1] ) ):
+    def parse_bytestring( self, tokens, idx, ir ):
+
+        node = Node( NodeKind.DATA, None, tokens[idx].line )
+        data, text = self.get_run( tokens[idx] )
+
+        # Any operand token carrying a hex value continues the run, the first two digits are the byte
+        while ( idx + 1 < len(tokens) and tokens[idx+1].value != None and tokens[idx+1].kind not in self._parser.RUN_KINDS ):
             idx = idx + 1
-            match = matches[idx]
-            bytes = self._parser.parse_byte(match)
-            for b in bytes:
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self._assembly_output.append(b)
-                    self._assembly_line = self._assembly_line + match + " "
-                    self._machine_code_line = self._machine_code_line + '{:02x}'.format(b) + " "
-                self._address = self._address + 1
+            value = tokens[idx].value
+            data.append( value >> 8 if tokens[idx].kind in self.WORD_TOKEN_KINDS else value )
+            text.append( tokens[idx].text )
+
+        node.data = data
+        node.size = len(data)
+        node.text = " ".join(text)
+        ir.append(node)
 
         return idx
 
 
-    def parse_string(self, instruction_address, matches, idx, mode ):
+    # Parse a string into zero terminated bytes
+    def parse_string(self, tokens, idx, ir ):
         idx = idx + 1
-        match = matches[idx]
+        match = tokens[idx].text
 
-        loggy.log( loggy.LOG_DIAGNOSTIC, "Parsing string " + match )
+        loggy.log( loggy.LOG_DIAGNOSTIC, "Parsing string %s", match )
 
-        str = match.replace("\"","")
+        node = Node( NodeKind.DATA, match, tokens[idx].line )
+        node.data = bytearray( ord(char) for char in match.replace("\"","") )
+        node.data.append(0)
+        node.size = len(node.data)
+        ir.append(node)
 
-        for char in str:
-            if ( mode == self.MODE_ASSEMBLE):
-                b = ord(char)
-                self._assembly_output.append(b)
-                self._machine_code_line = self._machine_code_line + '{:02x}'.format(b) + " "
-            self._address = self._address + 1
-        
-        if ( mode == self.MODE_ASSEMBLE):
-            self._assembly_output.append(0)
+        return idx
 
-        self._machine_code_line = self._machine_code_line + '{:02x}'.format(0) + " "
-        self._address = self._address + 1
-        
-        self._assembly_line = self._assembly_line + match + " "
+
+    # Parse a .table or .fill directive, the bytes are generated here and emitted like any other data
+    def parse_generated_data( self, tokens, idx, ir ):
+        token = tokens[idx]
+        directive, arguments = token.text.split( None, 1 )
+
+        try:
+            if ( token.kind == TokenKind.TABLE_DECL ):
+                data = table_generators.table( arguments )
+            else:
+                data = table_generators.fill( arguments )
+        except ValueError as e:
+            loggy.log( loggy.LOG_ERROR, "Invalid %s on line %d: %s", directive, token.line, str(e) )
+            exit(1)
+
+        node = Node( NodeKind.DATA, token.text.strip(), token.line )
+        node.data = data
+        node.size = len(data)
+        ir.append(node)
 
         return idx
 
 
-    def parse_include_directive(self, matches, idx ):
+    # Parse .align and .page, padding up to the next multiple of the alignment is worked out when laying out
+    def parse_align_directive( self, tokens, idx, ir ):
+        token = tokens[idx]
+        self.check_outside_keep_block( token )
 
-        include_idx = idx
+        if ( token.kind == TokenKind.PAGE_DIRECTIVE ):
+            alignment = self.PAGE_SIZE
+        else:
+            arguments = token.text.split()
+            try:
+                alignment = table_generators.parse_number( arguments[1] ) if len(arguments) == 2 else None
+            except ValueError:
+                alignment = None
+
+            if ( not isinstance( alignment, int ) or alignment < 1 or alignment > self.MAX_ALIGNMENT or alignment & ( alignment - 1 ) != 0 ):
+                loggy.log( loggy.LOG_ERROR, "Invalid .align on line %d, expected a power of two up to $%04X: %s", token.line, self.MAX_ALIGNMENT, token.text.strip() )
+                exit(1)
 
-        idx = idx + 1
-        match = matches[idx]
+        node = Node( NodeKind.ALIGN, token.text.strip(), token.line )
+        node.operand = alignment
+        ir.append(node)
 
-        filename = match.replace("\"","")
+        return idx
 
-        fullpath = os.path.join( self._working_directory, filename )
 
-        loggy.log( loggy.LOG_DIAGNOSTIC, "Including " + fullpath + "("+filename+")" )
+    # Parse .keeppage, the start of a block that is moved to the next page when it would cross one
+    def parse_keep_page_directive( self, tokens, idx, ir ):
+        token = tokens[idx]
+        self.check_outside_keep_block( token )
 
-        if ( os.path.isfile(fullpath) ):
+        node = Node( NodeKind.KEEP_IN_PAGE, token.text, token.line )
+        self._keep_block = node
+        ir.append(node)
 
-            with open(fullpath, "r") as source_file:
-                source = source_file.read()
+        return idx
 
-                # parse the file
-                include_matches = self._parser.parse(source)
-
-                # remove include directive and path
-                matches.pop(include_idx)
-                matches.pop(include_idx)
-
-                elements_to_copy = len(matches) - include_idx
-                included_matches_len = len(include_matches)
-
-                # Extend matches array
-                for a in range(0,included_matches_len):
-                    matches.append('')
-                
-                copy_dest_idx = len(matches)-1
-                copy_source_idx = copy_dest_idx - included_matches_len
-                for b in range(0,elements_to_copy):
-                    matches[copy_dest_idx] = matches[copy_source_idx]
-                    
-                    copy_dest_idx = copy_dest_idx - 1
-                    copy_source_idx = copy_source_idx - 1
-                    elements_to_copy = elements_to_copy - 1
-
-                for match in include_matches:
-                    matches[include_idx] = match
-                    include_idx = include_idx + 1
-        else:
-            loggy.log( loggy.LOG_ERROR, "Unable to load include file: " + fullpath)
-            exit()
+
+    # Parse .endkeeppage, closing the block kept in a page
+    def parse_end_keep_page_directive( self, tokens, idx, ir ):
+        if ( self._keep_block == None ):
+            loggy.log( loggy.LOG_ERROR, ".endkeeppage on line %d without a .keeppage", tokens[idx].line )
+            exit(1)
+
+        self._keep_block.operand = len(ir)
+        self._keep_block = None
 
         return idx
 
 
+    # Blocks kept in a page can't be nested and can't hold anything else that moves the address
+    def check_outside_keep_block( self, token ):
+        if ( self._keep_block != None ):
+            loggy.log( loggy.LOG_ERROR, "%s on line %d inside the block kept in a page from line %d", token.text.strip(), token.line, self._keep_block.line )
+            exit(1)
+
+
     # Set the base address of assembly output
     def set_base_address( self, base_address ):
         self._base_address = base_address
         self._address = base_address
 
 
-    # Given instruction and addressing mode write the opcode to assembly output
-    def assemble_instruction( self, current_instruction, addressing_mode, mode ):
-        
-        opcode = current_instruction["addressing_modes"][addressing_mode]
-
-        loggy.log(loggy.LOG_DIAGNOSTIC, "Derived opcode " + str(opcode) )
+    # Given the opcode derived from instruction and addressing mode write it to assembly output
+    def assemble_instruction( self, opcode, mode ):
 
         # Derived opcode from instruction + addressing mode, write it
         if ( mode == self.MODE_ASSEMBLE ):
-            self._assembly_output.append(opcode)
-            self._assembly_line = self._assembly_line + current_instruction["operator"] + " "
-            self._machine_code_line = self._machine_code_line + '{:02x}'.format(opcode) + " "
+            self._memory[self._address] = opcode
 
         self._address = self._address + 1
 
 
-    # Given operand and addressing mode write the operand to assembly output
-    def assemble_operand( self, addressing_mode, match, mode ):
+    # Given operand value and addressing mode write the operand to assembly output
+    def assemble_operand( self, addressing_mode, value, mode ):
 
         # Determine instruction length based on addressing mode
-        instruction_length = self._instruction_set.get_instruction_length(addressing_mode)
+        instruction_length = self._instruction_set.INSTRUCTION_LENGTHS[addressing_mode]
 
         if ( instruction_length == 2 ):
-            loggy.log(loggy.LOG_DIAGNOSTIC, "Derived instruction length " + str(instruction_length) )
-
-            bytes = self._parser.parse_byte(match)
-            self._assembly_line = self._assembly_line + match
-            for b in bytes:
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self._assembly_output.append(b)
-                    self._machine_code_line = self._machine_code_line + '{:02x}'.format(b) + "    "
+            if ( mode == self.MODE_ASSEMBLE ):
+                self._memory[self._address] = value & 0xFF
 
             self._address = self._address + 1
         elif ( instruction_length == 3 ):  
-            loggy.log(loggy.LOG_DIAGNOSTIC, "Derived instruction length " + str(instruction_length) )                          
-            bytes = self._parser.parse_word_little_endian(match)
-            self._assembly_line = self._assembly_line + match
-            for b in bytes:
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self._assembly_output.append(b)
-                    self._machine_code_line = self._machine_code_line + '{:02x}'.format(b) + " "
-                self._address = self._address + 1
+            if ( mode == self.MODE_ASSEMBLE ):
+                self._memory[self._address] = value & 0xFF
+                self._memory[self._address + 1] = value >> 8
+
+            self._address = self._address + 2
         else:
-            loggy.log( loggy.LOG_ERROR, "[!] Invalid instruction length " + str(instruction_length))
+            loggy.log( loggy.LOG_ERROR, "[!] Invalid instruction length %d", instruction_length )
             exit(1)
 
 
-    def preassemble( self, matches ):        
+    # ( operator, operand token kind ) -> ( addressing mode, opcode, size ) of every operand an instruction
+    # takes, the first of OPERAND_ADDRESSING_MODES the instruction has wins. Built once per instruction set.
+    @classmethod
+    def get_operand_table( cls, instructions ):
 
-        idx = 0
+        cached = cls._operand_table_cache
+        if ( cached != None and cached[0] is instructions ):
+            return cached[1]
 
-        while idx < len(matches):
+        table = {}
+        for operator in instructions._instructions:
+            for kind, addressing_modes in cls.OPERAND_ADDRESSING_MODES.items():
+                for addressing_mode in addressing_modes:
+                    opcode = instructions.get_opcode( operator, addressing_mode )
+                    if ( opcode != None ):
+                        table[ ( operator, kind ) ] = ( addressing_mode, opcode, instructions.INSTRUCTION_LENGTHS[addressing_mode] )
+                        break
 
-            match = matches[idx]
+        cls._operand_table_cache = ( instructions, table )
+        return table
 
-            if ( self._parser.is_org_directive( match ) ):
-                
-                loggy.log(loggy.LOG_DIAGNOSTIC, "Identified an .org directive on first pass" )
 
-                # parse the address token
-                idx = self.parse_org_directive( matches, idx )
+    # Pick the addressing mode for an operand of the given token kind and store its value on the node
+    def set_operand( self, node, kind, value ):
 
-            elif ( self._parser.is_include_directive( match ) ):
-                
-                loggy.log(loggy.LOG_DIAGNOSTIC, "Identified an .include directive on first pass" )
+        encoding = self._operand_table.get( ( node.instruction["operator"], kind ) )
 
-                # parse the address token
-                idx = self.parse_include_directive( matches, idx )
+        if ( encoding == None ):
+            loggy.log( loggy.LOG_ERROR, "No addressing mode of %s matches operand on line %d: %s", node.instruction["operator"], node.line, node.text )
+            exit(1)
 
-                loggy.log( loggy.LOG_DIAGNOSTIC, "Post include matches - " + str(matches) )
+        node.addressing_mode, node.opcode, node.size = encoding
+        node.operand = value
 
-            idx = idx + 1
 
+    # Operand token kind a symbol is assembled as by an instruction, labels in the zero page
+    # take the shorter zero page form when the instruction has one. Indexed symbols such as
+    # 'table,X' take the absolute indexed form otherwise, i.e. 'LDA zp,Y' as there is no LDA $xx,Y.
+    # Variables keep the width they were written with, 'PTR = $00FB' is absolute.
+    def get_operand_kind( self, node, kind, value ):
+        if ( node.index == None ):
+            if ( kind == SymbolKind.ADDRESS and value < 0x100 and ( node.instruction["operator"], TokenKind.ZEROPAGE ) in self._operand_table ):
+                return TokenKind.ZEROPAGE
+            return SymbolKind.TOKEN_KINDS[kind]
 
-    def load_source(self, filename):
+        if ( kind == SymbolKind.IMMEDIATE ):
+            loggy.log( loggy.LOG_ERROR, "Immediate value can't be indexed on line %d: %s", node.line, node.text )
+            exit(1)
 
-        source = None
+        absolute, zeropage = self.INDEXED_TOKEN_KINDS[node.index]
+        if ( kind != SymbolKind.WORD and value < 0x100 and ( node.instruction["operator"], zeropage ) in self._operand_table ):
+            return zeropage
+        return absolute
 
-        if ( os.path.isfile(filename) ):
 
-            with open(filename, "r") as source_file:
-                self.set_working_directory(os.path.dirname(os.path.abspath(filename)))
-                source = source_file.read()
+    # Size an instruction with a symbol operand from what is known so far. A symbol that isn't known
+    # yet is sized as the previous run laid it out when there is a layout hint, otherwise it is
+    # assumed to be a zero page address when the instruction has a zero page form, the smallest it
+    # can be. Returns the symbol when the size depends on it, None when it's final.
+    def size_operand( self, node ):
+
+        # Check for relative addressing
+        # Note: Instructions that use relative addressing have no other addressing modes so you 
+        #       do not have to worry about any other scenarios here
+        if ( self._instruction_set.addressing_mode_Relative in node.instruction["addressing_modes"] ):
+            self.set_operand( node, TokenKind.RELATIVE, 0 )
+            return None
+
+        modifier = node.symbol[:1]
+        if ( modifier == "<" or modifier == ">" ):
+            self.set_operand( node, TokenKind.IMMEDIATE, 0 )
+            return None
+
+        symbol = self._labels.get( node.symbol )
+        if ( symbol != None ):
+            self.set_operand( node, self.get_operand_kind( node, symbol[0], symbol[1] ), symbol[1] )
+            return None
+
+        hint = self._layout_hint.get( node.symbol )
+        if ( hint != None ):
+            self.set_operand( node, self.get_operand_kind( node, hint[0], hint[1] ), 0 )
+            return node.symbol
+
+        absolute, zeropage = self.INDEXED_TOKEN_KINDS[node.index]
+        if ( ( node.instruction["operator"], zeropage ) in self._operand_table ):
+            self.set_operand( node, zeropage, 0 )
+            return node.symbol
+
+        self.set_operand( node, absolute, 0 )
+        return None
+
+
+    # Resolve a label/variable operand against the final symbols and patch it into the node, the
+    # size it was laid out with is kept
+    def resolve_operand( self, node, mode ):
+
+        symbol = self.parse_label_reference( node.symbol, mode )
+
+        if ( self._instruction_set.addressing_mode_Relative in node.instruction["addressing_modes"] ):
+
+            loggy.log( loggy.LOG_DIAGNOSTIC, "Determined relative addressing mode, referring to : %s", node.symbol )
+
+            self.set_operand( node, TokenKind.RELATIVE, self.parse_relative_address( symbol, node.address, mode ) )
         else:
-            loggy.log( loggy.LOG_ERROR, "Unable to load include file: " + filename)
-            exit()
+            kind = self.get_operand_kind( node, symbol[0], symbol[1] )
+            absolute, zeropage = self.INDEXED_TOKEN_KINDS[node.index]
 
-        return source
+            # Laid out as an absolute address before the symbol turned out to be in the zero page
+            if ( kind == zeropage and node.size == 3 ):
+                kind = absolute
 
+            self.set_operand( node, kind, symbol[1] )
 
-    #################################################
-    # Main loop for assembler!
-    #################################################
-    def assemble( self, matches, mode ):        
+        if ( self._stats != None ):
+            self._stats.count( "label_lookups" )
 
-        loggy.log( loggy.LOG_DIAGNOSTIC, str(matches) )
 
-        current_instruction = None
-        idx = 0
-        
-        self._assembly_line = ""
-        self._machine_code_line = ""
+    # Address of the segment the node at index is in
+    def get_segment_start( self, ir, index ):
+        while ( index > 0 ):
+            index = index - 1
+            if ( ir[index].kind == NodeKind.ORG ):
+                return ir[index].address
+        return self._base_address
 
-        # In run() we call set base address before the first pass, this sets address and base_address
-        # We then do 1st pass assemble which updates base_address with any changes on org directive
-        # So for 2nd pass assemble we do not call set_base_address so that we can ensure we don't override 
-        # the above
-        self._address = self._base_address
 
-        while idx < len(matches):
-            match = matches[idx]
+    # Bytes of padding an .align or a block kept in a page needs at address. A block is moved to the
+    # start of the next page when it would cross into it.
+    def get_padding( self, ir, index, address ):
 
-            instruction_address = self._address
+        node = ir[index]
+        if ( node.kind == NodeKind.ALIGN ):
+            return -address % node.operand
 
-            if ( self._instruction_set.isInstruction(match) ):
+        size = 0
+        for inner in range( index + 1, node.operand ):
+            size = size + ir[inner].size
 
-                loggy.log( loggy.LOG_DIAGNOSTIC, "INSTRUCTION: " + match + " at 0x" + '{:02x}'.format(self._address) )
+        if ( size > self.PAGE_SIZE ):
+            loggy.log( loggy.LOG_ERROR, "Block kept in a page from line %d is %d bytes, more than a page", node.line, size )
+            exit(1)
 
-                # Obtain the current instruction
-                current_instruction = self._instruction_set.getInstruction( match )
-                current_instruction_address = self._address
+        if ( ( address % self.PAGE_SIZE ) + size > self.PAGE_SIZE ):
+            return -address % self.PAGE_SIZE
+        return 0
 
-                # Check for implied addressing modes that do not have an operand e.g. RTS, BRK, INC etc.
-                if ( self._instruction_set.addressing_mode_Implied in current_instruction["addressing_modes"].keys() ):
 
-                    loggy.log( loggy.LOG_DIAGNOSTIC, "Determined implied addressing: " + match )
+    # Lay out addresses from the node at index on, every node before it keeps its address.
+    # Labels are defined on the first lay out, which fails on duplicates and names already
+    # taken by a variable. Later ones only move the labels it defined and return those that moved.
+    def lay_out( self, ir, index = 0, define = True ):
 
-                    if ( mode == self.MODE_ASSEMBLE ):
-                        self.parse_implied_instruction( current_instruction )
+        labels = self._labels
+        moved = []
 
-                    self._address = self._address + 1
+        if ( index == 0 ):
+            address = self._base_address
+            self._segment_start = address
+        else:
+            address = ir[index].address
+            self._segment_start = self.get_segment_start( ir, index )
 
-                else:
-                    
-                    # All other addressing modes get parsed here
+        for index in range( index, len(ir) ):
 
-                    # next token
-                    idx = idx + 1
-                    match = matches[idx]
+            node = ir[index]
+            kind = node.kind
 
-                    # Resolve Labels referenced in the assembly
-                    if ( self._parser.is_label_reference(match) ):
+            if ( kind == NodeKind.INSTRUCTION or kind == NodeKind.DATA ):
+                node.address = address
+                address = address + node.size
 
-                        loggy.log( loggy.LOG_DIAGNOSTIC, "Parsed label/variable reference: " + match )
+            elif ( kind == NodeKind.LABEL ):
 
-                        match = self.parse_label_reference( match, mode )
-                        
-                        # Check for relative addressing
-                        # Note: Instructions that use relative addressing have no other addressing modes so you 
-                        #       do not have to worry about any other scenarios here
-                        if ( self._instruction_set.addressing_mode_Relative in current_instruction["addressing_modes"].keys() ):
-        
-                            loggy.log( loggy.LOG_DIAGNOSTIC, "Determined relative addressing mode, referring to : " + match )
-    
-                            match = self.parse_relative_address( match, current_instruction_address, mode )
+                if ( define ):
+                    self._address = address
+                    self.parse_label_declaration( node.symbol )
+                    moved.append( node.symbol )
+                elif ( node.address != address ):
+                    labels[node.symbol] = ( SymbolKind.ADDRESS, address )
+                    moved.append( node.symbol )
+
+                node.address = address
+
+            elif ( kind == NodeKind.ORG ):
+
+                self._address = address
+                self.end_segment( self.MODE_PRESCAN )
+
+                address = node.address
+                self._segment_start = address
+
+            elif ( kind == NodeKind.ALIGN or kind == NodeKind.KEEP_IN_PAGE ):
+                node.address = address
+                node.size = self.get_padding( ir, index, address )
+                address = address + node.size
+
+        self._address = address
+        self.end_segment( self.MODE_PRESCAN )
+
+        return moved
+
+
+    # Lay out the program and resolve every symbol, iterating to a fixpoint.
+    #
+    # Variables are defined and instructions referencing symbols are sized as they are met, references
+    # to labels are assumed to be zero page addresses where they can be. Once the labels are laid out,
+    # only instructions depending on labels that moved are looked at again. An instruction outgrowing
+    # its zero page assumption is widened and everything after it laid out again, which can move
+    # further labels. Instructions only ever grow so addresses only ever increase, every instruction
+    # grows at most once and the iteration always ends, on real programs after one or two rounds.
+    # Padding never takes an address back either, it only ever ends at the same or a later address.
+    # An instruction growing inside a block kept in a page can move the whole block, so laying out
+    # again starts from the block.
+    #
+    # Reassembling the same program, forward references are sized from the layout hint, the labels of
+    # the previous run, so the first lay out usually is the last. When the hint made an instruction
+    # longer than its symbol needs, e.g. a label moved into the zero page, the result would differ
+    # from assembling from scratch, so everything is resolved again without the hint.
+    def resolve( self, ir ):
+
+        labels = self._labels
+        dependents = {}
+        symbolic = []
+        restart = {}
+        hinted = []
+        block = None
+
+        for index, node in enumerate( ir ):
+
+            kind = node.kind
+
+            if ( kind == NodeKind.INSTRUCTION and node.symbol != None ):
+                symbolic.append( node )
+
+                symbol = self.size_operand( node )
+                if ( symbol != None ):
+                    dependents.setdefault( symbol, [] ).append( index )
+
+                    if ( symbol in self._layout_hint ):
+                        hinted.append( index )
+
+                    if ( block != None and index < ir[block].operand ):
+                        restart[index] = block
+
+            elif ( kind == NodeKind.KEEP_IN_PAGE ):
+                block = index
+
+            elif ( kind == NodeKind.VARIABLE ):
+                loggy.log(loggy.LOG_DIAGNOSTIC, "Encountered a variable declaration on first pass %s", node.symbol )
+
+                self.parse_variable_declaration( node.symbol, node.data[0], node.data[1] )
+
+        # Every symbol referenced before it was known has to be looked at, after that only labels that moved
+        changed = list( dependents )
+        self.lay_out( ir )
+        passes = 1
+
+        while ( True ):
+
+            grown = None
+
+            for name in changed:
+
+                symbol = labels.get( name )
+                if ( symbol == None ):
+                    # Unresolved, reported once every symbol is known
+                    continue
+
+                for index in dependents.get( name, () ):
+                    node = ir[index]
+                    encoding = self._operand_table.get( ( node.instruction["operator"], self.get_operand_kind( node, symbol[0], symbol[1] ) ) )
+
+                    if ( encoding != None and encoding[2] > node.size ):
+                        self.set_operand( node, self.INDEXED_TOKEN_KINDS[node.index][0], 0 )
+
+                        start = restart.get( index, index )
+                        if ( grown == None or start < grown ):
+                            grown = start
+
+            if ( grown == None ):
+                break
+
+            changed = self.lay_out( ir, grown, False )
+            passes = passes + 1
+
+        if ( self.outgrew_hint( ir, hinted ) ):
+            loggy.log( loggy.LOG_DIAGNOSTIC, "Layout hint no longer holds, resolving from scratch" )
+
+            if ( self._stats != None ):
+                self._stats.count( "layout_hint_misses" )
+
+            self._labels.clear()
+            self._layout_hint = {}
+            return self.resolve( ir )
 
-                    # match addressing modes
-                    for addressing_mode in current_instruction["addressing_modes"]:
-                        
-                        if ( self._parser.matches_addressing_mode( match, addressing_mode ) == True ):
+        for node in symbolic:
+            self.resolve_operand( node, self.MODE_ASSEMBLE )
 
-                            loggy.log(loggy.LOG_DIAGNOSTIC, "Matched addressing mode " + str(addressing_mode) + " for " + match )
+        if ( self._stats != None ):
+            self._stats.count( "layout_passes", passes )
 
-                            # Assembly step for instructions, this writes the instruction to the output!
-                            self.assemble_instruction( current_instruction, addressing_mode, mode )
+        if ( loggy.enabled( loggy.LOG_WARN ) ):
+            crossings = self.check_page_crossings( ir )
 
-                            # Assembly step for operands, this writes the operand to the output!
-                            self.assemble_operand( addressing_mode, match, mode )
+            if ( self._stats != None ):
+                self._stats.count( "page_crossings", crossings )
 
-                # If Assembling then dump output
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self.dump_assembly( instruction_address )
+        loggy.log( loggy.LOG_DIAGNOSTIC, "Resolved %d symbol references in %d passes", len(symbolic), passes )
 
-            elif ( self._parser.is_bytestring_declaration(match) ):
 
-                loggy.log(loggy.LOG_DIAGNOSTIC, "Identified a bytestring " + match )
+    # Whether any of the instructions at the indexes, sized from the layout hint, is longer than its
+    # resolved symbol needs
+    def outgrew_hint( self, ir, indexes ):
 
-                idx = self.parse_bytestring( instruction_address, matches, idx, mode )
-                
-                # If Assembling then dump output
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self.dump_assembly( instruction_address )
+        for index in indexes:
+            node = ir[index]
+            symbol = self._labels.get( node.symbol )
 
-            elif ( self._parser.is_wordstring_declaration(match) ):
+            if ( symbol != None ):
+                encoding = self._operand_table.get( ( node.instruction["operator"], self.get_operand_kind( node, symbol[0], symbol[1] ) ) )
+                if ( encoding != None and encoding[2] < node.size ):
+                    return True
 
-                loggy.log(loggy.LOG_DIAGNOSTIC, "Identified a wordstring " + match )
+        return False
 
-                # Loop until we run out of words
-                idx = self.parse_wordstring( instruction_address, matches, idx, mode )
 
-                # If Assembling then dump output
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self.dump_assembly(instruction_address )
+    # Address range of the code or data following each label up to the next label, padding or origin,
+    # i.e. the table a label names. Labels with nothing between them share the range.
+    def get_label_extents( self, ir ):
 
-            elif ( self._parser.is_string_declaration(match) ):
+        extents = {}
+        names = []
+        start = 0
+        end = 0
 
-                loggy.log(loggy.LOG_DIAGNOSTIC, "Identified a string " + match )
+        for node in ir:
 
-                idx = self.parse_string( instruction_address, matches, idx, mode )
-                
-                # If Assembling then dump output
-                if ( mode == self.MODE_ASSEMBLE ):
-                    self.dump_assembly( instruction_address )
+            kind = node.kind
 
-            elif ( self._parser.is_label_declaration(match) ):
-                
-                if ( mode == self.MODE_PRESCAN ):
-                    label = match.replace(":","")
+            if ( kind == NodeKind.INSTRUCTION or kind == NodeKind.DATA ):
+                end = node.address + node.size
 
-                    loggy.log(loggy.LOG_DIAGNOSTIC, "Encountered a label declaration on first pass " + label )
+            elif ( kind == NodeKind.LABEL or kind == NodeKind.ORG or kind == NodeKind.ALIGN or kind == NodeKind.KEEP_IN_PAGE ):
 
-                    self.parse_label_declaration( label )
+                if ( kind != NodeKind.LABEL or end > start ):
+                    for name in names:
+                        extents[name] = ( start, end )
+                    names = []
 
-            elif ( self._parser.is_variable_declaration(match) ):
+                if ( kind == NodeKind.LABEL ):
+                    if ( len(names) == 0 ):
+                        start = node.address
+                        end = start
+                    names.append( node.symbol )
 
-                if ( mode == self.MODE_PRESCAN ):
-                    variable_name = self._parser.get_variable_name_from_declaration(match)
-                    
-                    loggy.log(loggy.LOG_DIAGNOSTIC, "Encountered a variable declaration on first pass " + variable_name )
+        for name in names:
+            extents[name] = ( start, end )
 
-                    # next token
-                    idx = idx + 1
-                    match = matches[idx]
-                    
-                    self.parse_variable_declaration( variable_name, match )
+        return extents
 
+
+    # Warn about branches taken to another page and indexed reads of labelled tables straddling a page,
+    # both take a cycle more than the instruction's base cycles. Returns the number of warnings.
+    def check_page_crossings( self, ir ):
+
+        instructions = self._instruction_set
+        extents = None
+        crossings = 0
+
+        for node in ir:
+
+            if ( node.kind != NodeKind.INSTRUCTION or node.symbol == None ):
+                continue
+
+            penalty = instructions.get_cycle_penalty( node.instruction["operator"], node.addressing_mode )
+
+            if ( penalty == instructions.cycle_penalty_Branch ):
+                target = self._labels[node.symbol][1]
+
+                if ( ( node.address + 2 ) >> 8 != target >> 8 ):
+                    loggy.log( loggy.LOG_WARN, "%s on line %d at $%04X branches to %s at $%04X on another page, +1 cycle when taken", node.text, node.line, node.address, node.symbol, target )
+                    crossings = crossings + 1
+
+            elif ( penalty == instructions.cycle_penalty_Page and node.index != None ):
+                if ( extents == None ):
+                    extents = self.get_label_extents( ir )
+
+                start, end = extents.get( node.symbol, ( 0, 0 ) )
+
+                if ( end > start and start >> 8 != ( end - 1 ) >> 8 ):
+                    loggy.log( loggy.LOG_WARN, "%s on line %d reads %s at $%04X-$%04X across a page boundary, +1 cycle when the index crosses it", node.text, node.line, node.symbol, start, end - 1 )
+                    crossings = crossings + 1
+
+        return crossings
+
+
+    # Resolve includes, returning the complete token list
+    def preassemble( self, matches ):        
+
+        stats = self._stats
+        if ( stats != None ):
+            resolver = self._include_resolver
+            hits, misses = resolver.hits, resolver.misses
+
+        # Splice every include in one pass
+        included = self._included
+        matches = self._include_resolver.resolve( matches, self._working_directory, included )
+
+        if ( stats != None ):
+            # The resolver is shared, runs on other threads at the same time blur these
+            stats.count( "include_cache_hits", resolver.hits - hits )
+            stats.count( "include_cache_misses", resolver.misses - misses )
+
+        return matches
+
+
+    # Close the segment being assembled, the prescan checks it fits in memory and the assemble pass records it
+    def end_segment( self, mode ):
+
+        if ( self._address > memory_image.MemoryImage.SIZE ):
+            loggy.log( loggy.LOG_ERROR, "Segment starting at $%04X runs past $FFFF", self._segment_start )
+            exit(1)
+
+        if ( mode == self.MODE_ASSEMBLE ):
+            self._image.add_segment( self._segment_start, self._address )
+
+
+    # Parse an instruction and its operand into an instruction node
+    def parse_instruction( self, tokens, idx, ir ):
+
+        token = tokens[idx]
+
+        # Obtain the current instruction
+        current_instruction = self._instruction_set.getInstruction( token.text )
+
+        node = Node( NodeKind.INSTRUCTION, token.text, token.line )
+        node.instruction = current_instruction
+
+        # Check for implied addressing modes that do not have an operand e.g. RTS, BRK, INC etc.
+        if ( self._instruction_set.addressing_mode_Implied in current_instruction["addressing_modes"] ):
+
+            node.addressing_mode = self._instruction_set.addressing_mode_Implied
+            node.opcode = self._instruction_set.get_opcode( token.text, node.addressing_mode )
+            node.size = 1
+
+        else:
+
+            # next token
+            idx = idx + 1
+            operand = tokens[idx]
+            node.text = token.text + " " + operand.text
+
+            # Labels referenced in the assembly are resolved on each pass, anything else is fixed now
+            if ( operand.kind == TokenKind.LABEL ):
+                node.symbol, _, index = operand.text.partition( "," )
+
+                if ( index ):
+                    if ( self._parser.is_high_low_byte_extract( node.symbol ) ):
+                        loggy.log( loggy.LOG_ERROR, "Byte of an address can't be indexed on line %d: %s", node.line, node.text )
+                        exit(1)
+                    node.index = index
             else:
-                loggy.log(loggy.LOG_DIAGNOSTIC, "Not processing token " + match )
+                self.set_operand( node, operand.kind, operand.value )
+
+        ir.append(node)
+
+        return idx
+
+
+    # Build the intermediate representation from the classified tokens
+    def build_ir( self, matches ):
+
+        ir = []
+        dispatch = self._dispatch
+        idx = 0
+
+        while idx < len(matches):
+            token = matches[idx]
+
+            if ( token.kind in dispatch ):
+                idx = dispatch[token.kind]( matches, idx, ir )
+            else:
+                loggy.log(loggy.LOG_DIAGNOSTIC, "Not processing token %s", token.text )
 
             idx = idx + 1
 
-        return self._assembly_output
+        if ( self._keep_block != None ):
+            loggy.log( loggy.LOG_ERROR, ".keeppage on line %d without an .endkeeppage", self._keep_block.line )
+            exit(1)
+
+        return ir
 
 
     #################################################
-    # Entry point for assembler!
+    # Main loop for assembler!
     #################################################
-    def run( self, source, base_address ):
+    def assemble( self, ir, mode ):        
 
-        self.reset()
+        # The prescan lays out addresses and resolves every symbol, see resolve()
+        if ( mode == self.MODE_PRESCAN ):
+            self.resolve( ir )
+            return self._image.get_data()
 
-        self.set_base_address( base_address )
+        # Every .org starts a new segment
+        self._address = self._base_address
+        self._segment_start = self._address
+
+        for node in ir:
+
+            kind = node.kind
+
+            if ( kind == NodeKind.INSTRUCTION ):
+
+                if ( node.addressing_mode == self._instruction_set.addressing_mode_Implied ):
+                    self.parse_implied_instruction( node.instruction )
+                    self._address = self._address + 1
+                else:
+                    self.assemble_instruction( node.opcode, mode )
+                    self.assemble_operand( node.addressing_mode, node.operand, mode )
+
+            elif ( kind == NodeKind.DATA ):
+
+                self._memory[self._address:self._address + node.size] = node.data
+                self._address = self._address + node.size
+
+            elif ( kind == NodeKind.ALIGN or kind == NodeKind.KEEP_IN_PAGE ):
+
+                node.data = self.PADDING * node.size
+                self._memory[self._address:self._address + node.size] = node.data
+                self._address = self._address + node.size
+
+            elif ( kind == NodeKind.ORG ):
 
-        # parse the file
-        matches = self._parser.parse(source)
+                self.end_segment( mode )
+
+                self._address = node.address
+                self._segment_start = node.address
+
+        self.end_segment( mode )
+
+        return self._image.get_data()
+
+
+    # Assemble source text
+    def run( self, source ):
+
+        stats = self._stats
+        if ( stats != None ):
+            stats.start( "tokenize" )
+
+        # parse the file and classify the tokens once for both passes
+        matches = self._parser.tokenize(source)
+        self._parser.classify( matches, self._instruction_set )
+
+        if ( stats != None ):
+            stats.stop( "tokenize" )
+
+            # Tokens of the source itself, "tokens" counts those of its includes as well
+            stats.count( "source_tokens", len(matches) )
+
+        return self.assemble_tokens( matches )
+
+
+    # Assemble classified tokens
+    def assemble_tokens( self, matches ):
+
+        stats = self._stats
 
         loggy.log ( loggy.LOG_INFO, "*** Pre-process ***")
-        assembly_output = self.preassemble( matches )
+        if ( stats != None ):
+            stats.start( "preassemble" )
+
+        matches = self.preassemble( matches )
+
+        if ( stats != None ):
+            stats.stop( "preassemble" )
+            stats.start( "build_ir" )
+
+        # Build the IR once, both passes walk it
+        ir = self.build_ir( matches )
+
+        if ( stats != None ):
+            stats.stop( "build_ir" )
+            stats.start( "prescan" )
 
         loggy.log ( loggy.LOG_INFO, "*** Labels and variables ***")
-        assembly_output = self.assemble( matches, self.MODE_PRESCAN )
+        self.assemble( ir, self.MODE_PRESCAN )
+
+        if ( loggy.enabled( loggy.LOG_DIAGNOSTIC ) ):
+            loggy.log ( loggy.LOG_DIAGNOSTIC, "%s", self._labels.export_text() )
 
-        loggy.log ( loggy.LOG_DIAGNOSTIC, str(self._labels) )
+        if ( stats != None ):
+            stats.stop( "prescan" )
+            stats.start( "assemble" )
 
         loggy.log ( loggy.LOG_INFO, "*** Assemble ***")
-        assembly_output = self.assemble( matches, self.MODE_ASSEMBLE )
+        self.assemble( ir, self.MODE_ASSEMBLE )
+
+        if ( stats != None ):
+            stats.stop( "assemble" )
+
+        # Keep the IR for the listing, it's only formatted when someone asks for it
+        self._ir = ir
+
+        if ( loggy.enabled( loggy.LOG_INFO ) ):
+            for row in self.listing_rows():
+                loggy.log( loggy.LOG_INFO, row )
+
+        # A single PRG loading at the lowest address written, gaps between segments are padded
+        self._segments = sorted( self._image.segments )
+        self._output = self._image.get_prg( self._base_address )
+
+        if ( stats != None ):
+            stats.count( "tokens", len(matches) )
+            stats.count( "nodes", len(ir) )
+            stats.count( "labels", len(self._labels) )
+            stats.count( "bytes_emitted", sum( end - start for start, end in self._image.segments ) )
+
+        return self._output
+
+
+    # RunStats of this run, None unless the assembler is profiling
+    def get_stats( self ):
+        return self._stats
+
+
+    # ( load address, memoryview of the program ) of the padded program, as written to a single PRG
+    def get_program( self ):
+        view = memoryview( self._output )
+        return ( view[0] | ( view[1] << 8 ), view[2:] )
+
+
+    # Every segment in address order as ( start, memoryview of its bytes )
+    def get_segments( self ):
+
+        if ( self._image.segments ):
+            return self._image.get_segments()
+
+        # Restored from the assembly cache, cut the segments out of the padded program
+        view = memoryview( self._output )
+        lowest = view[0] | ( view[1] << 8 )
+        return [ ( start, view[2 + start - lowest:2 + end - lowest] ) for start, end in self._segments ]
+
+
+# Assembles programs. Only the immutable parts live here, the instruction set tables, the compiled
+# parser and the include token cache, every run gets its own AssemblyContext. One assembler can
+# serve any number of run() calls at the same time, e.g. from a thread pool.
+class Assembler:
+
+    # Bump when a change alters the output for the same source, it keys the assembly cache
+    VERSION = "0.8"
+
+    # Modes
+    MODE_PRESCAN = AssemblyContext.MODE_PRESCAN
+    MODE_ASSEMBLE = AssemblyContext.MODE_ASSEMBLE
+
+    # Constructor (of sorts)
+    def __init__(self):
+
+        # Default working directory for run(), set by load_source()
+        self._working_directory = os.getcwd()
+
+        # The instruction set is never modified so every assembler shares the one loaded from the frozen table
+        self._instruction_set = instruction_set.InstructionSet.shared()
+
+        self._parser = assembly_parser.AssemblyParser()
+
+        # Addressing mode, opcode and size of every instruction and operand kind, one lookup per operand
+        self._operand_table = AssemblyContext.get_operand_table( self._instruction_set )
+
+        # Tokens of included files are cached here between runs
+        self._include_resolver = include_resolver.IncludeResolver( self._parser, self._instruction_set )
+
+        # Optional assembly cache, see set_cache()
+        self._cache = None
+
+        # Whether runs collect RunStats, see set_profile()
+        self._profile = False
+
+        # Included files of the last run_file() of each file
+        self._sources = {}
+
+        # ( base address, labels ) of the last run_file() of each file, the layout hint of the next
+        self._layouts = {}
+
+
+    # Start a new run
+    def create_context( self, base_address = 0xC000, working_directory = None ):
+        return AssemblyContext( self, base_address, working_directory )
+
+
+    # Use an assembly_cache.AssemblyCache to skip assembling sources that haven't changed, None to disable
+    def set_cache( self, cache ):
+        self._cache = cache
+
+
+    # Collect timings and counters of every run from now on, each context gets a run_stats.RunStats
+    def set_profile( self, enabled ):
+        self._profile = enabled
+
+
+    # Set the default working directory includes are resolved against
+    def set_working_directory( self, directory ):
+        
+        self._working_directory = directory
+
+        loggy.log( loggy.LOG_DIAGNOSTIC, "Setting working directory - %s", directory )
+
+
+    def load_source(self, filename):
+
+        source = None
+
+        if ( os.path.isfile(filename) ):
+
+            with open(filename, "r") as source_file:
+                self.set_working_directory(os.path.dirname(os.path.abspath(filename)))
+                source = source_file.read()
+        else:
+            loggy.log( loggy.LOG_ERROR, "Unable to load include file: %s", filename )
+            exit()
+
+        return source
+
+
+    #################################################
+    # Entry point for assembler!
+    #################################################
+    def run( self, source, base_address, working_directory = None ):
+        return self.run_context( source, base_address, working_directory )._output
+
+
+    # Assemble source text and return the context of the run, its labels and listing included.
+    # Concurrent callers should pass the working directory rather than rely on load_source() setting it.
+    def run_context( self, source, base_address, working_directory = None ):
+
+        context = self.create_context( base_address, working_directory )
+
+        if ( self._cache != None ):
+            cached = self._cache.lookup( source, base_address, context._working_directory )
+
+            if ( cached != None ):
+                context._output, labels, context._listing, context._segments = cached
+                context._labels = SymbolTable.load( labels )
+
+                if ( context._stats != None ):
+                    context._stats.count( "assembly_cache_hits" )
+
+                if ( loggy.enabled( loggy.LOG_INFO ) ):
+                    for line in context._listing:
+                        loggy.log( loggy.LOG_INFO, line )
+
+                return context
+
+        context.run( source )
+
+        if ( self._cache != None ):
+            self._cache.store( source, base_address, context._working_directory, context._included, context._output, context._labels.export(), context.get_listing(), context._segments )
+
+        return context
+
+
+    # Assemble a source file, reusing the tokens of the file and its includes if they haven't changed since
+    # the last run and the label layout of the last run for forward references. Meant for a long lived
+    # assembler reassembling the same program, the assembly cache isn't used.
+    def run_file( self, filename, base_address ):
+        return self.run_file_context( filename, base_address )._output
+
+
+    # As run_file() but returns the context of the run
+    def run_file_context( self, filename, base_address ):
+
+        fullpath = os.path.abspath(filename)
+
+        context = self.create_context( base_address, os.path.dirname(fullpath) )
+
+        layout = self._layouts.get( fullpath )
+        if ( layout != None and layout[0] == base_address ):
+            context._layout_hint = layout[1]
+
+        stats = context._stats
+        if ( stats != None ):
+            stats.start( "tokenize" )
+
+        matches = self._include_resolver.load_tokens( fullpath )
+
+        if ( stats != None ):
+            stats.stop( "tokenize" )
+
+        context.assemble_tokens( matches )
 
-        assembly_header = bytearray( base_address.to_bytes(2, byteorder='little') )
+        self._sources[fullpath] = context._included
+        self._layouts[fullpath] = ( base_address, context._labels )
 
-        return assembly_header + assembly_output
+        return context
 
 
+    # Every file the last run_file() of filename read, the root file first
+    def get_source_files( self, filename ):
+        fullpath = os.path.abspath(filename)
+        files = [ fullpath ]
+        for path in self._sources.get( fullpath, [] ):
+            if ( path not in files ):
+                files.append( path )
+        return files
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import loggy
+
+# Content addressed cache of assembled programs, kept in a local directory so it can be shared between builds.
+#
+# A program is looked up in two steps:
+#   1. The root key hashes the assembler version, base address, working directory and root source. It names a
+#      manifest listing the files the source included last time it was assembled.
+#   2. The entry key hashes the root key with the content of every included file. It names the entry holding
+#      the assembled output (<key>.prg) and the labels, listing and segments (<key>.json).
+#
+# Entries are written atomically so concurrent builds can share a directory. The least recently used entries
+# and manifests are evicted once the cache grows past max_bytes, a hit refreshes the modification time of
+# both the entry and its manifest.
+class AssemblyCache:
+
+    def __init__( self, directory, version, max_bytes = 64 * 1024 * 1024 ):
+        self._directory = directory
+        self._version = version
+        self._max_bytes = max_bytes
+
+        os.makedirs( os.path.join( directory, "manifests" ), exist_ok=True )
+        os.makedirs( os.path.join( directory, "entries" ), exist_ok=True )
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+
+    # Hash identifying the root source assembled at a base address
+    def get_root_key( self, source, base_address, working_directory ):
+        digest = hashlib.sha256()
+        digest.update( self._version.encode() )
+        digest.update( b"\0" + str(base_address).encode() )
+        digest.update( b"\0" + working_directory.encode() )
+        digest.update( b"\0" + source.encode() )
+        return digest.hexdigest()
+
+
+    # Hash identifying the root source together with the content of everything it includes,
+    # None if an included file no longer exists
+    def get_entry_key( self, root_key, included ):
+        digest = hashlib.sha256()
+        digest.update( root_key.encode() )
+
+        for path in included:
+            if ( not os.path.isfile(path) ):
+                return None
+
+            with open(path, "rb") as include_file:
+                digest.update( b"\0" + path.encode() + b"\0" + hashlib.sha256( include_file.read() ).digest() )
+
+        return digest.hexdigest()
+
+
+    # Look up a program, returns ( output, labels, listing, segments ) or None on a miss
+    def lookup( self, source, base_address, working_directory ):
+
+        root_key = self.get_root_key( source, base_address, working_directory )
+        manifest = self.read_json( os.path.join( self._directory, "manifests", root_key + ".json" ) )
+
+        entry_key = None
+        if ( manifest != None ):
+            entry_key = self.get_entry_key( root_key, manifest["includes"] )
+
+        if ( entry_key != None ):
+            entry_path = os.path.join( self._directory, "entries", entry_key )
+            metadata = self.read_json( entry_path + ".json" )
+
+            if ( metadata != None and os.path.isfile( entry_path + ".prg" ) ):
+                with open( entry_path + ".prg", "rb" ) as output_file:
+                    output = bytearray( output_file.read() )
+
+                # Refresh for the LRU eviction
+                os.utime( entry_path + ".json" )
+                os.utime( os.path.join( self._directory, "manifests", root_key + ".json" ) )
+
+                self.hits = self.hits + 1
+                loggy.log( loggy.LOG_DIAGNOSTIC, "Assembly cache hit " + entry_key )
+
+                segments = [ tuple(segment) for segment in metadata.get( "segments", [] ) ]
+
+                return ( output, metadata["labels"], metadata["listing"], segments )
+
+        self.misses = self.misses + 1
+        return None
+
+
+    # Store an assembled program
+    def store( self, source, base_address, working_directory, included, output, labels, listing, segments = () ):
+
+        root_key = self.get_root_key( source, base_address, working_directory )
+        entry_key = self.get_entry_key( root_key, included )
+
+        if ( entry_key == None ):
+            return
+
+        entry_path = os.path.join( self._directory, "entries", entry_key )
+
+        self.write_atomic( entry_path + ".prg", bytes(output) )
+        self.write_atomic( entry_path + ".json", json.dumps( { "labels": labels, "listing": listing, "segments": list(segments) } ).encode() )
+        self.write_atomic( os.path.join( self._directory, "manifests", root_key + ".json" ), json.dumps( { "includes": included } ).encode() )
+
+        self.stores = self.stores + 1
+        loggy.log( loggy.LOG_DIAGNOSTIC, "Assembly cache store " + entry_key )
+
+        self.evict()
+
+
+    # ( bytes, last used ) of every entry and manifest keyed by ( directory, key ), an entry being its
+    # .prg and .json files. Temporary files still being written are left out.
+    def get_usage( self ):
+
+        usage = {}
+
+        for directory in ( "entries", "manifests" ):
+            for filename in os.listdir( os.path.join( self._directory, directory ) ):
+                key, extension = os.path.splitext(filename)
+                if ( extension != ".json" and extension != ".prg" ):
+                    continue
+
+                try:
+                    stat = os.stat( os.path.join( self._directory, directory, filename ) )
+                except FileNotFoundError:
+                    continue
+
+                size, used = usage.get( ( directory, key ), ( 0, 0 ) )
+                if ( extension == ".json" ):
+                    used = stat.st_mtime
+                usage[ ( directory, key ) ] = ( size + stat.st_size, used )
+
+        return usage
+
+
+    # Evict least recently used entries and manifests until the cache fits in max_bytes
+    def evict( self ):
+
+        usage = self.get_usage()
+        total = sum( size for size, used in usage.values() )
+
+        if ( total <= self._max_bytes ):
+            return
+
+        for directory, key in sorted( usage, key=lambda item: usage[item][1] ):
+            for extension in ( ".json", ".prg" ):
+                try:
+                    os.remove( os.path.join( self._directory, directory, key + extension ) )
+                except FileNotFoundError:
+                    pass
+
+            total = total - usage[ ( directory, key ) ][0]
+            if ( directory == "entries" ):
+                self.evictions = self.evictions + 1
+
+            if ( total <= self._max_bytes ):
+                break
+
+
+    # Counters for this process plus the current size of the cache
+    def stats( self ):
+        usage = self.get_usage()
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len( [ item for item in usage if item[0] == "entries" ] ),
+            "manifests": len( [ item for item in usage if item[0] == "manifests" ] ),
+            "bytes": sum( size for size, used in usage.values() )
+        }
+
+
+    def read_json( self, filename ):
+        try:
+            with open( filename, "r" ) as json_file:
+                return json.load( json_file )
+        except ( FileNotFoundError, ValueError ):
+            return None
+
+
+    # Write via a temporary file and rename so readers never see a partial file
+    def write_atomic( self, filename, data ):
+        descriptor, temporary = tempfile.mkstemp( dir=os.path.dirname(filename) )
+        with os.fdopen( descriptor, "wb" ) as temporary_file:
+            temporary_file.write( data )
+        os.replace( temporary, filename )
@@ -0,0 +1,49 @@
+# Intermediate representation, built once from the classified tokens so the assembler passes
+# only have to lay out addresses, patch resolved operands and emit bytes
+
+class NodeKind:
+    INSTRUCTION = 0
+    DATA = 1
+    LABEL = 2
+    VARIABLE = 3
+    ORG = 4
+    ALIGN = 5
+    KEEP_IN_PAGE = 6
+
+    names = ( "INSTRUCTION", "DATA", "LABEL", "VARIABLE", "ORG", "ALIGN", "KEEP_IN_PAGE" )
+
+
+# A single statement of the program
+#
+#   instruction     - instruction from the instruction set (INSTRUCTION)
+#   addressing_mode - addressing mode, fixed for literal operands and derived per pass for symbols
+#   opcode          - opcode for the instruction in its addressing mode
+#   operand         - operand value as an int, for branches this is the target address, the alignment
+#                     (ALIGN), the index of the first node after the block (KEEP_IN_PAGE)
+#   symbol          - label/variable reference (INSTRUCTION), declared name (LABEL, VARIABLE)
+#   index           - index register of a label/variable reference such as 'table,X', "X", "Y" or None
+#   size            - size in bytes as laid out by the prescan, the padding (ALIGN, KEEP_IN_PAGE)
+#   address         - address as laid out by the prescan, the new origin (ORG)
+#   data            - bytes to emit (DATA)
+#   text            - source text of the statement, used for the listing and variable values
+#   line            - source line of the statement
+class Node:
+
+    __slots__ = ( "kind", "instruction", "addressing_mode", "opcode", "operand", "symbol", "index", "size", "address", "data", "text", "line" )
+
+    def __init__( self, kind, text, line ):
+        self.kind = kind
+        self.instruction = None
+        self.addressing_mode = None
+        self.opcode = None
+        self.operand = None
+        self.symbol = None
+        self.index = None
+        self.size = 0
+        self.address = 0
+        self.data = None
+        self.text = text
+        self.line = line
+
+    def __repr__( self ):
+        return "Node(" + NodeKind.names[self.kind] + ", " + repr(self.text) + ", $" + '{:04x}'.format(self.address) + ", size " + str(self.size) + ")"
@@ -1,8 +1,68 @@
 import re
 import loggy
 
+# Token kinds, order mirrors _asm_regex_list so a match's group index maps straight to its kind
+class TokenKind:
+    ORG_DIRECTIVE = 0
+    BYTESTRING_DECL = 1
+    WORDSTRING_DECL = 2
+    STRING_DECL = 3
+    INCLUDE_DECL = 4
+    VAR_DECL = 5
+    LABEL_DECL = 6
+    LABEL = 7
+    INSTRUCTION = 8
+    IMMEDIATE = 9
+    ABSOLUTE_X = 10
+    ABSOLUTE_Y = 11
+    ABSOLUTE = 12
+    ZEROPAGE_X = 13
+    ZEROPAGE_Y = 14
+    ZEROPAGE = 15
+    INDIRECT_INDEXED_Y = 16
+    INDIRECT = 17
+    INDEXED_INDIRECT_X = 18
+    RELATIVE = 19
+    ACCUMULATOR = 20
+    STRING = 21
+    COMMENT = 22
+    TABLE_DECL = 23
+    FILL_DECL = 24
+    ALIGN_DIRECTIVE = 25
+    PAGE_DIRECTIVE = 26
+    KEEP_PAGE_DIRECTIVE = 27
+    END_KEEP_PAGE_DIRECTIVE = 28
+
+    names = ( "ORG_DIRECTIVE", "BYTESTRING_DECL", "WORDSTRING_DECL", "STRING_DECL", "INCLUDE_DECL",
+              "VAR_DECL", "LABEL_DECL", "LABEL", "INSTRUCTION", "IMMEDIATE", "ABSOLUTE_X", "ABSOLUTE_Y",
+              "ABSOLUTE", "ZEROPAGE_X", "ZEROPAGE_Y", "ZEROPAGE", "INDIRECT_INDEXED_Y", "INDIRECT",
+              "INDEXED_INDIRECT_X", "RELATIVE", "ACCUMULATOR", "STRING", "COMMENT", "TABLE_DECL", "FILL_DECL",
+              "ALIGN_DIRECTIVE", "PAGE_DIRECTIVE", "KEEP_PAGE_DIRECTIVE", "END_KEEP_PAGE_DIRECTIVE" )
+
+
+# A single token from the source, kind and value are worked out once when tokenizing
+class Token:
+
+    __slots__ = ( "kind", "text", "value", "line" )
+
+    def __init__( self, kind, text, value, line ):
+        self.kind = kind
+        self.text = text
+        self.value = value
+        self.line = line
+
+    def __repr__( self ):
+        return "Token(" + TokenKind.names[self.kind] + ", " + repr(self.text) + ", " + repr(self.value) + ", line " + str(self.line) + ")"
+
+
 class AssemblyParser:
 
+    # Compiled tokenizer pattern, shared by every parser and only compiled when first needed
+    _token_regex = None
+
+    # Compiled addressing mode patterns, as above
+    _op_regexes = None
+
     ASM_REGEX_ORG_DIRECTIVE = "\.org\s?"
     ASM_REGEX_BYTESTRING_DECL = "\.byte\s?"
     ASM_REGEX_WORDSTRING_DECL = "\.word\s?"
@@ -10,7 +70,7 @@ class AssemblyParser:
     ASM_REGEX_INCLUDE_DECL = "\.include\s?"
     ASM_REGEX_VAR_DECL = "[a-zA-Z0-9_]{1,20}\s*=\s*"
     ASM_REGEX_LABEL_DECL = "[a-zA-Z0-9_]{1,20}:"
-    ASM_REGEX_LABEL = "[<>]?[a-zA-Z0-9_]{1,20}"
+    ASM_REGEX_LABEL = "[<>]?[a-zA-Z0-9_]{1,20}(?:,[XY])?"
     ASM_REGEX_INSTRUCTION = "[a-zA-Z]{3}"
     ASM_REGEX_IMMEDIATE = "\#\$[0-9a-fA-F]{2}"
     ASM_REGEX_ABSOLUTE_X = "\$[0-9a-fA-F]{4},[X]"
@@ -27,11 +87,52 @@ class AssemblyParser:
     ASM_REGEX_STRING = "\".*\""
     ASM_REGEX_COMMENT = ";.*"
 
+    # Generated data, the arguments up to the end of the line or a comment are part of the token
+    ASM_REGEX_TABLE_DECL = r"\.table[ \t]+[^;\n]*"
+    ASM_REGEX_FILL_DECL = r"\.fill[ \t]+[^;\n]*"
+
+    # Alignment, the argument is part of the token so '.align $100' isn't split into a byte and a label
+    ASM_REGEX_ALIGN_DIRECTIVE = r"\.align\b[ \t]*[^;\s]*"
+    ASM_REGEX_PAGE_DIRECTIVE = r"\.page\b"
+    ASM_REGEX_KEEP_PAGE_DIRECTIVE = r"\.keeppage\b"
+    ASM_REGEX_END_KEEP_PAGE_DIRECTIVE = r"\.endkeeppage\b"
+
     ASM_REGEX_BYTESTRING = "\$\b[0-9A-F]{2}\b(\s*,\s*\$[0-9A-F]{2})*"
+
+    # Runs of plain hex values following .byte and .word on the same line, matched as part of the
+    # declaration so a table line is a single token. A value that is part of an operand such as
+    # '$20,X' or '$C000' in a .byte ends the run and is tokenized as before.
+    ASM_REGEX_BYTE_RUN = r"(?:[ \t,]*\$[0-9a-fA-F]{2}(?![0-9a-fA-F]|,[XY]))*"
+    ASM_REGEX_WORD_RUN = r"(?:[ \t,]*\$[0-9a-fA-F]{4}(?![0-9a-fA-F]|,[XY]))*"
     ASM_REGEX_HEX8_DIGITS = "\$[0-9a-fA-F]{2}"
     ASM_REGEX_HEX16_DIGITS = "\$[0-9a-fA-F]{4}"
     
 
+    # Where the hex digits sit within each operand token, i.e. '#$20' -> [2:4]
+    TOKEN_VALUE_SLICES = {
+        TokenKind.IMMEDIATE: (2, 4),
+        TokenKind.ABSOLUTE_X: (1, 5),
+        TokenKind.ABSOLUTE_Y: (1, 5),
+        TokenKind.ABSOLUTE: (1, 5),
+        TokenKind.ZEROPAGE_X: (1, 3),
+        TokenKind.ZEROPAGE_Y: (1, 3),
+        TokenKind.ZEROPAGE: (1, 3),
+        TokenKind.INDIRECT_INDEXED_Y: (2, 4),
+        TokenKind.INDIRECT: (2, 6),
+        TokenKind.INDEXED_INDIRECT_X: (2, 4),
+        TokenKind.RELATIVE: (1, 3)
+    }
+
+    # Declarations that carry a run of values, with the size of each value in bytes. Both directives are
+    # five characters long, the run starts after them.
+    RUN_KINDS = {
+        TokenKind.BYTESTRING_DECL: 1,
+        TokenKind.WORDSTRING_DECL: 2
+    }
+
+    # '$' and ',' are dropped from a run, bytes.fromhex() skips the whitespace
+    RUN_SEPARATORS = str.maketrans( "", "", "$," )
+
     # Use these for matching tokens that are already split
     ASM_REGEX_LABEL_DECL_TOKEN = "[a-zA-Z0-9_]{1,20}:$"
     ASM_REGEX_LABEL_TOKEN = "^[<>]?[a-zA-Z0-9_]{1,20}$"
@@ -42,8 +143,8 @@ class AssemblyParser:
         # Language Patterns
         self._asm_regex_list = [
             self.ASM_REGEX_ORG_DIRECTIVE,
-            self.ASM_REGEX_BYTESTRING_DECL,
-            self.ASM_REGEX_WORDSTRING_DECL,
+            self.ASM_REGEX_BYTESTRING_DECL + self.ASM_REGEX_BYTE_RUN,
+            self.ASM_REGEX_WORDSTRING_DECL + self.ASM_REGEX_WORD_RUN,
             self.ASM_REGEX_STRING_DECL,
             self.ASM_REGEX_INCLUDE_DECL,
             self.ASM_REGEX_VAR_DECL,
@@ -63,7 +164,13 @@ class AssemblyParser:
             self.ASM_REGEX_RELATIVE,
             self.ASM_REGEX_ACCUMULATOR,
             self.ASM_REGEX_STRING,
-            self.ASM_REGEX_COMMENT
+            self.ASM_REGEX_COMMENT,
+            self.ASM_REGEX_TABLE_DECL,
+            self.ASM_REGEX_FILL_DECL,
+            self.ASM_REGEX_ALIGN_DIRECTIVE,
+            self.ASM_REGEX_PAGE_DIRECTIVE,
+            self.ASM_REGEX_KEEP_PAGE_DIRECTIVE,
+            self.ASM_REGEX_END_KEEP_PAGE_DIRECTIVE
         ]
 
         # Note: Order has to mirror the addressing_mode constants in mnemonics6510.py
@@ -85,14 +192,71 @@ class AssemblyParser:
         # join to one regex
         self._asm_regex = '|'.join(self._asm_regex_list)
 
+    # Same alternation as _asm_regex, but every pattern is a named group so one scan also tells us the token kind
+    def get_token_regex( self ):
+        if ( AssemblyParser._token_regex == None ):
+            AssemblyParser._token_regex = re.compile( '|'.join( "(?P<" + TokenKind.names[kind] + ">" + pattern + ")" for kind, pattern in enumerate(self._asm_regex_list) ) )
+
+        return AssemblyParser._token_regex
+
     # PARSING ASSEMBLY
     def parse( self, input_string ):
-        matches = re.findall(self._asm_regex, input_string)
-        return matches
+        return [ token.text for token in self.tokenize(input_string) ]
+
+    # Tokenize the source in a single scan, returning typed tokens. The values following a .byte or .word
+    # are converted in one go, the declaration's value is their bytes in the order they are written.
+    def tokenize( self, input_string ):
+        tokens = []
+        append = tokens.append
+        value_slices = self.TOKEN_VALUE_SLICES
+        run_kinds = self.RUN_KINDS
+        separators = self.RUN_SEPARATORS
+
+        line = 1
+        line_pos = 0
+
+        for match in self.get_token_regex().finditer(input_string):
+            start = match.start()
+            line = line + input_string.count( "\n", line_pos, start )
+            line_pos = start
+
+            # None of the patterns have groups of their own, so the group index is the kind
+            kind = match.lastindex - 1
+            text = match.group()
+
+            value = None
+            if ( kind in value_slices ):
+                first, last = value_slices[kind]
+                value = int( text[first:last], 16 )
+            elif ( kind in run_kinds and len(text) > 6 ):
+                value = bytes.fromhex( text[5:].translate( separators ) ) or None
+
+            append( Token( kind, text, value, line ) )
+
+        return tokens
+
+    # Classify tokens once, marking identifiers that are instructions so later passes can dispatch on kind.
+    # Operands are left alone so a label that happens to share a mnemonic's name still resolves as a label.
+    def classify( self, tokens, instruction_set ):
+        idx = 0
+
+        while idx < len(tokens):
+            token = tokens[idx]
+
+            if ( token.kind == TokenKind.LABEL and instruction_set.isInstruction(token.text) ):
+                token.kind = TokenKind.INSTRUCTION
+
+                # Instructions taking an operand are followed by it, skip over it
+                if ( instruction_set.addressing_mode_Implied not in instruction_set.getInstruction(token.text)["addressing_modes"] ):
+                    idx = idx + 1
+
+            idx = idx + 1
 
     def matches_addressing_mode( self, token, addressing_mode ):
-        match = re.match( self._op_regex_list[addressing_mode - 1], token )
-        return match != None
+        if ( AssemblyParser._op_regexes == None ):
+            AssemblyParser._op_regexes = [ re.compile( pattern ) for pattern in self._op_regex_list ]
+
+        return AssemblyParser._op_regexes[addressing_mode - 1].match( token ) != None
 
     # PARSING OPERANDS
 
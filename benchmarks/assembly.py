@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.insert(0, ROOT)
+
+import assembler
+import loggy
+
+# Assembly benchmark, times every phase of assembling synthetic programs of increasing size and
+# compares the timings and output hashes against a committed baseline
+#
+#   python3 benchmarks/assembly.py [-sizes 1000,10000,50000] [-runs 5] [-threshold 0.25] [-update] [-json]
+#
+# Exits non zero when a phase is slower than the baseline by more than the threshold or any output
+# hash differs, so a speedup can't silently change what is assembled.
+
+BASELINE = os.path.join( os.path.dirname(os.path.abspath(__file__)), "baseline.json" )
+
+SIZES = [ 1000, 10000, 50000 ]
+
+# Timings this close to the baseline are noise whatever the fraction, small programs take well under a ms
+NOISE_MS = 1.0
+
+# Real programs whose output is checked along with the synthetic ones
+PROGRAMS = [ "asm/border.asm", "asm/hires.asm", "asm/include.asm", "asm/labels.asm", "asm/sine.asm", "asm/text.asm", "asm/toolkit64.asm" ]
+
+# Lines of a generated program between .org directives and the bytes they may take up
+BLOCK_LINES = 1000
+BLOCK_SIZE = 0x1000
+
+# Instructions the generator picks from, with an operand in the given format and its size
+OPERANDS = [
+    ( "LDA", "#$%02X", 2 ), ( "LDX", "#$%02X", 2 ), ( "LDY", "#$%02X", 2 ), ( "CMP", "#$%02X", 2 ),
+    ( "STA", "$%04X", 3 ), ( "STX", "$%04X", 3 ), ( "LDA", "$%04X,X", 3 ), ( "STA", "$%04X,Y", 3 ),
+    ( "LDA", "$%02X", 2 ), ( "STA", "$%02X,X", 2 ), ( "ADC", "($%02X),Y", 2 ), ( "EOR", "($%02X,X)", 2 )
+]
+IMPLIED = [ "INX", "INY", "DEX", "DEY", "TAX", "TXA", "CLC", "SEC", "PHA", "PLA", "NOP" ]
+
+
+# Generate a program of about lines lines, many labels and variables, .byte tables and a chain of includes
+# depth deep. The main file and the includes are written to directory, returns the main file's name.
+def generate( directory, lines, depth = 8, seed = 64 ):
+
+    rng = random.Random( seed )
+    blocks = []
+
+    for block in range( 0, max( 1, lines // BLOCK_LINES ) ):
+        blocks.append( generate_block( rng, block, min( BLOCK_LINES, lines ) ) )
+
+    # The main file holds the first blocks and includes the rest as a chain, each include including the next
+    depth = min( depth, len(blocks) - 1 )
+    files = [ [] for level in range( 0, depth + 1 ) ]
+    for block, text in enumerate( blocks ):
+        files[ block * ( depth + 1 ) // len(blocks) ].append( text )
+
+    for level, texts in enumerate( files ):
+        if ( level < depth ):
+            texts.append( '\t.include "include_%d.asm"\n' % ( level + 1 ) )
+
+        filename = os.path.join( directory, "main.asm" if level == 0 else "include_%d.asm" % level )
+        with open( filename, "w" ) as source_file:
+            source_file.write( "".join( texts ) )
+
+    return os.path.join( directory, "main.asm" )
+
+
+# One block of code starting at its own origin, blocks wrap around memory so programs of any size fit
+def generate_block( rng, block, lines ):
+
+    address = 0x1000 + ( block % 14 ) * BLOCK_SIZE
+    out = [ "\t.org $%04X\n" % address ]
+    size = 0
+    labels = []
+
+    while ( len(out) < lines and size < BLOCK_SIZE - 64 ):
+        choice = rng.random()
+
+        if ( choice < 0.1 ):
+            # A label, every block has its own so names don't clash
+            labels.append( ( "L%d_%d" % ( block, len(labels) ), size ) )
+            out.append( labels[-1][0] + ":\n" )
+
+        elif ( choice < 0.13 ):
+            name = "V%d_%d" % ( block, len(out) )
+            out.append( "\t%s = $%02X\n" % ( name, rng.randrange( 0x02, 0x100 ) ) )
+            out.append( "\tLDA %s\n" % name )
+            size = size + 2
+
+        elif ( choice < 0.18 and len(labels) > 0 and size - labels[-1][1] < 100 ):
+            out.append( "\tBNE %s\n" % labels[-1][0] )
+            size = size + 2
+
+        elif ( choice < 0.22 and len(labels) > 0 ):
+            out.append( "\t%s %s\n" % ( rng.choice( [ "JMP", "JSR" ] ), rng.choice( labels )[0] ) )
+            size = size + 3
+
+        elif ( choice < 0.24 and len(labels) > 0 ):
+            out.append( "\tLDA %s%s\n" % ( rng.choice( "<>" ), rng.choice( labels )[0] ) )
+            size = size + 2
+
+        elif ( choice < 0.3 ):
+            # A line of a big table
+            out.append( "\t.byte " + " ".join( "$%02X" % rng.randrange( 0, 0x100 ) for index in range( 0, 16 ) ) + "\n" )
+            size = size + 16
+
+        elif ( choice < 0.5 ):
+            out.append( "\t" + rng.choice( IMPLIED ) + "\n" )
+            size = size + 1
+
+        else:
+            instruction, operand, operand_size = rng.choice( OPERANDS )
+            value = rng.randrange( 0x100, 0x10000 ) if operand_size == 3 else rng.randrange( 0, 0x100 )
+            out.append( "\t" + instruction + " " + ( operand % value ) + "\n" )
+            size = size + operand_size
+
+    out.append( "\tRTS\n" )
+
+    return "".join( out )
+
+
+# Median wall time in ms of calling fn runs times
+def time_phase( fn, runs ):
+    timings = []
+    for run in range( 0, runs ):
+        start = time.perf_counter()
+        fn()
+        timings.append( ( time.perf_counter() - start ) * 1000 )
+    return statistics.median( timings )
+
+
+# Time every phase of assembling a file, includes are relative to directory. Returns the results of the file.
+def benchmark( filename, directory, runs ):
+
+    asm64 = assembler.Assembler()
+    source = asm64.load_source( filename )
+
+    # Each phase gets its input from running the ones before it
+    def phases():
+        context = asm64.create_context( 0xC000, directory )
+        state = { "context": context }
+
+        def parse():
+            state["matches"] = context._parser.tokenize( source )
+            context._parser.classify( state["matches"], context._instruction_set )
+            state["parsed"] = len( state["matches"] )
+
+        def preassemble():
+            state["matches"] = context.preassemble( state["matches"] )
+
+        def build_ir():
+            state["ir"] = context.build_ir( state["matches"] )
+
+        def prescan():
+            context.assemble( state["ir"], context.MODE_PRESCAN )
+
+        def assemble():
+            context.assemble( state["ir"], context.MODE_ASSEMBLE )
+
+        return state, [ ( "parse", parse ), ( "preassemble", preassemble ), ( "build_ir", build_ir ), ( "prescan", prescan ), ( "assemble", assemble ) ]
+
+    timings = { name: [] for name, fn in phases()[1] }
+    for run in range( 0, runs ):
+        state, steps = phases()
+        for name, fn in steps:
+            start = time.perf_counter()
+            fn()
+            timings[name].append( ( time.perf_counter() - start ) * 1000 )
+
+    results = { name + "_ms": round( statistics.median( values ), 3 ) for name, values in timings.items() }
+
+    output = []
+    results["run_ms"] = round( time_phase( lambda: output.append( asm64.run( source, 0xC000, directory ) ), runs ), 3 )
+
+    tracemalloc.start()
+    asm64.run( source, 0xC000, directory )
+    results["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+    tracemalloc.stop()
+
+    # Lines and tokens of the program with everything it includes
+    results["lines"] = source.count( "\n" ) + 1
+    for path in state["context"]._included:
+        with open( path, "r" ) as source_file:
+            results["lines"] = results["lines"] + source_file.read().count( "\n" ) + 1
+
+    results["tokens"] = len( state["matches"] )
+    results["parse_tokens_per_sec"] = int( state["parsed"] / ( results["parse_ms"] / 1000 ) ) if results["parse_ms"] > 0 else 0
+    results["run_tokens_per_sec"] = int( results["tokens"] / ( results["run_ms"] / 1000 ) ) if results["run_ms"] > 0 else 0
+    results["md5"] = hashlib.md5( output[-1] ).hexdigest()
+
+    return results
+
+
+# Everything measured that gets worse as it grows, checked against the threshold
+def get_regressions( name, results, baseline, threshold ):
+
+    regressions = []
+
+    for key, value in results.items():
+        if ( key.endswith( "_ms" ) or key == "peak_kb" ) and key in baseline:
+            slack = NOISE_MS if key.endswith( "_ms" ) else 0
+            if ( value > baseline[key] * ( 1 + threshold ) + slack ):
+                regressions.append( '%s %s %.1f, baseline %.1f (+%.0f%%)' % ( name, key, value, baseline[key], ( value / baseline[key] - 1 ) * 100 ) )
+
+    if ( "md5" in baseline and results["md5"] != baseline["md5"] ):
+        regressions.append( "%s output changed, md5 %s, baseline %s" % ( name, results["md5"], baseline["md5"] ) )
+
+    return regressions
+
+
+def start():
+    parser = argparse.ArgumentParser(description="Assembler benchmark")
+    parser.add_argument('-sizes',     default=",".join( str(size) for size in SIZES ), help='Comma separated line counts of the generated programs (up to 200000)')
+    parser.add_argument('-depth',     type=int, default=8, help='Depth of the include chain of generated programs')
+    parser.add_argument('-runs',      type=int, default=5, help='Number of runs to take the median of')
+    parser.add_argument('-threshold', type=float, default=0.25, help='Fraction a timing may exceed the baseline by before it fails')
+    parser.add_argument('-baseline',  default=BASELINE, help='Baseline JSON file')
+    parser.add_argument('-update',    action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('-json',      action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    # Warnings about generated blocks overwriting each other aren't what is being measured
+    loggy.LOG_LEVEL = loggy.LOG_ERROR
+
+    results = {}
+
+    for program in PROGRAMS:
+        results[program] = benchmark( os.path.join( ROOT, program ), ROOT, args.runs )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [ int(size) for size in args.sizes.split(",") ]:
+            size_directory = os.path.join( directory, str(size) )
+            os.makedirs( size_directory )
+            results[ "synthetic_" + str(size) ] = benchmark( generate( size_directory, size, args.depth ), size_directory, args.runs )
+
+    if ( args.json ):
+        print ( json.dumps( results, indent=4 ) )
+    else:
+        print ( '{:<24}{:>10}{:>10}{:>12}{:>10}{:>10}{:>10}{:>10}{:>12}{:>10}'.format( "program", "lines", "parse", "preassem", "build_ir", "prescan", "assemble", "run", "tokens/s", "peak kb" ) )
+        for name, result in results.items():
+            print ( '{:<24}{:>10}{:>10.2f}{:>12.2f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}{:>12}{:>10}'.format( name, result["lines"], result["parse_ms"], result["preassemble_ms"],
+                    result["build_ir_ms"], result["prescan_ms"], result["assemble_ms"], result["run_ms"], result["run_tokens_per_sec"], result["peak_kb"] ) )
+
+    if ( args.update ):
+        with open( args.baseline, "w" ) as baseline_file:
+            json.dump( results, baseline_file, indent=4, sort_keys=True )
+            baseline_file.write( "\n" )
+        print ( "Baseline written to " + args.baseline )
+        return
+
+    if ( not os.path.isfile( args.baseline ) ):
+        print ( "No baseline, run with -update to create one" )
+        return
+
+    with open( args.baseline, "r" ) as baseline_file:
+        baseline = json.load( baseline_file )
+
+    regressions = []
+    for name, result in results.items():
+        if ( name in baseline ):
+            regressions.extend( get_regressions( name, result, baseline[name], args.threshold ) )
+
+    for regression in regressions:
+        print ( "REGRESSION " + regression )
+
+    if ( len(regressions) > 0 ):
+        exit(1)
+
+    print ( "No regressions against " + args.baseline )
+
+
+if __name__ == "__main__":
+    start()
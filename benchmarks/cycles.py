@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.insert(0, ROOT)
+
+import assembler
+import cpu6510
+import loggy
+
+# Cycle benchmark, runs routines of the programs in asm/ on the 6510 emulator and compares the cycles
+# they take against a committed baseline
+#
+#   python3 benchmarks/cycles.py [-update] [-json]
+#
+# Cycle counts are exact, so unlike the timing benchmarks there's no threshold. Exits non zero when a
+# routine takes more cycles than the baseline, e.g. because an operand is no longer in the zero page.
+
+BASELINE = os.path.join( os.path.dirname(os.path.abspath(__file__)), "cycles.json" )
+
+BASE_ADDRESS = 0xC000
+
+# ( program, label of the routine, addresses of routines outside the program to stub with an RTS )
+ROUTINES = [
+    ( "asm/toolkit64.asm", "clear_screen", () ),
+    ( "asm/toolkit64.asm", "print_string", () ),
+    ( "asm/toolkit64.asm", "set_cursor", () ),
+    ( "asm/hires.asm", "setup", () ),
+    ( "asm/text.asm", "setup", ( 0xFF9F, ) ),
+    ( "asm/labels.asm", "loop", () ),
+    ( "asm/include.asm", "go", () )
+]
+
+
+# Assemble a program and run one of its routines from power on, returns ( cycles, instructions )
+def measure( asm64, program, routine, stubs ):
+
+    context = asm64.run_context( asm64.load_source( os.path.join( ROOT, program ) ), BASE_ADDRESS, ROOT )
+
+    symbol = context._labels.get( routine )
+    if ( symbol == None ):
+        raise cpu6510.CPUError( "No label %s in %s" % ( routine, program ) )
+
+    cpu = cpu6510.CPU6510()
+    cpu.load_prg( context._output )
+    cpu.stub( *stubs )
+
+    return cpu.call( symbol[1] ), cpu.instructions
+
+
+# Routines taking more cycles than the baseline, and those taking fewer as a reminder to update it
+def compare( results, baseline ):
+
+    regressions = []
+    improvements = []
+
+    for name, result in results.items():
+        if ( name in baseline ):
+            if ( result["cycles"] > baseline[name]["cycles"] ):
+                regressions.append( "%s %d cycles, baseline %d (+%d)" % ( name, result["cycles"], baseline[name]["cycles"], result["cycles"] - baseline[name]["cycles"] ) )
+            elif ( result["cycles"] < baseline[name]["cycles"] ):
+                improvements.append( "%s %d cycles, baseline %d (-%d)" % ( name, result["cycles"], baseline[name]["cycles"], baseline[name]["cycles"] - result["cycles"] ) )
+
+    return regressions, improvements
+
+
+def start():
+    parser = argparse.ArgumentParser(description="Cycle benchmark of assembled routines")
+    parser.add_argument('-baseline',  default=BASELINE, help='Baseline JSON file')
+    parser.add_argument('-update',    action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('-json',      action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    loggy.LOG_LEVEL = loggy.LOG_ERROR
+
+    asm64 = assembler.Assembler()
+    results = {}
+
+    for program, routine, stubs in ROUTINES:
+        cycles, instructions = measure( asm64, program, routine, stubs )
+        results[ program + ":" + routine ] = { "cycles": cycles, "instructions": instructions }
+
+    if ( args.json ):
+        print ( json.dumps( results, indent=4 ) )
+    else:
+        print ( '{:<36}{:>12}{:>14}'.format( "routine", "cycles", "instructions" ) )
+        for name, result in results.items():
+            print ( '{:<36}{:>12}{:>14}'.format( name, result["cycles"], result["instructions"] ) )
+
+    if ( args.update ):
+        with open( args.baseline, "w" ) as baseline_file:
+            json.dump( results, baseline_file, indent=4, sort_keys=True )
+            baseline_file.write( "\n" )
+        print ( "Baseline written to " + args.baseline )
+        return
+
+    if ( not os.path.isfile( args.baseline ) ):
+        print ( "No baseline, run with -update to create one" )
+        return
+
+    with open( args.baseline, "r" ) as baseline_file:
+        baseline = json.load( baseline_file )
+
+    regressions, improvements = compare( results, baseline )
+
+    for improvement in improvements:
+        print ( "IMPROVED " + improvement + ", run with -update to keep it" )
+
+    for regression in regressions:
+        print ( "REGRESSION " + regression )
+
+    if ( len(regressions) > 0 ):
+        exit(1)
+
+    print ( "No regressions against " + args.baseline )
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.insert(0, ROOT)
+
+import instruction_set
+import assembler
+
+# Startup benchmark, tracks how long it takes before retroasm.py gets to do any work
+#
+#   python3 benchmarks/startup.py [-runs 20] [-source fixtures/border.asm] [-json]
+
+
+# Median wall time in ms of calling fn runs times
+def time_call( fn, runs ):
+    timings = []
+    for run in range(0, runs):
+        start = time.perf_counter()
+        fn()
+        timings.append( (time.perf_counter() - start) * 1000 )
+    return statistics.median(timings)
+
+
+# Median wall time in ms of running a command in a fresh interpreter
+def time_process( command, runs ):
+    timings = []
+    for run in range(0, runs):
+        start = time.perf_counter()
+        subprocess.run( command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL )
+        timings.append( (time.perf_counter() - start) * 1000 )
+    return statistics.median(timings)
+
+
+def load_instructions():
+    instructions = instruction_set.InstructionSet()
+    instructions.loadInstructions()
+
+
+def load_frozen():
+    instructions = instruction_set.InstructionSet()
+    instructions.loadFrozen()
+
+
+def start():
+    parser = argparse.ArgumentParser(description="Assembler startup benchmark")
+    parser.add_argument('-runs',   type=int, default=20, help='Number of runs to take the median of')
+    parser.add_argument('-source', default='fixtures/border.asm', help='Source to assemble for the CLI timing')
+    parser.add_argument('-json',   action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join( directory, "out.prg" )
+
+        results = {
+            "load_instructions_ms": time_call( load_instructions, args.runs ),
+            "load_frozen_ms": time_call( load_frozen, args.runs ),
+            "assembler_construct_ms": time_call( assembler.Assembler, args.runs ),
+            "interpreter_ms": time_process( [ sys.executable, "-c", "pass" ], args.runs ),
+            "cli_ms": time_process( [ sys.executable, "retroasm.py", args.source, "-output", output ], args.runs )
+        }
+
+    results["cli_overhead_ms"] = results["cli_ms"] - results["interpreter_ms"]
+
+    if ( args.json ):
+        print ( json.dumps( results, indent=4 ) )
+    else:
+        for name, value in results.items():
+            print ( '{:<24}'.format(name) + '{:8.3f}'.format(value) )
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,474 @@
+import instruction_set
+
+# A headless 6510, enough to run assembled routines and count the cycles they take without VICE.
+# Opcodes are decoded with the instruction set's decode table, its base cycle counts plus the penalties
+# for crossing a page and taking a branch give exact cycle counts for the documented instructions.
+#
+# The 64KB of memory is plain RAM, there's no ROM, I/O or interrupts. A write to $D020 lands in RAM and
+# a JSR into the KERNAL runs whatever is there, stub() puts an RTS at such addresses.
+#
+#   cpu = CPU6510()
+#   cpu.load_prg( assembler.run( source, 0xC000 ) )
+#   cycles = cpu.call( 0xC000 )
+
+# Status register flags
+FLAG_C = 0x01
+FLAG_Z = 0x02
+FLAG_I = 0x04
+FLAG_D = 0x08
+FLAG_B = 0x10
+FLAG_U = 0x20
+FLAG_V = 0x40
+FLAG_N = 0x80
+
+OPCODE_RTS = 0x60
+
+
+# Raised for an unused opcode or a routine that doesn't return
+class CPUError( Exception ):
+    pass
+
+
+class CPU6510:
+
+    InstructionSet = instruction_set.InstructionSet
+
+    # Flag and whether it is set for a branch to be taken
+    BRANCHES = {
+        "BCC": ( FLAG_C, False ),
+        "BCS": ( FLAG_C, True ),
+        "BNE": ( FLAG_Z, False ),
+        "BEQ": ( FLAG_Z, True ),
+        "BVC": ( FLAG_V, False ),
+        "BVS": ( FLAG_V, True ),
+        "BPL": ( FLAG_N, False ),
+        "BMI": ( FLAG_N, True )
+    }
+
+    def __init__( self, instructions = None ):
+
+        if ( instructions == None ):
+            instructions = self.InstructionSet.shared()
+
+        self.memory = bytearray( 0x10000 )
+
+        # opcode -> ( handler, addressing mode, length, base cycles, takes the page crossing cycle ), None for unused opcodes
+        self._table = [ None ] * 256
+        for opcode in range( 0, 256 ):
+            entry = instructions.decode( opcode )
+            if ( entry != None ):
+                operator, addressing_mode, length, cycles = entry
+                if ( operator in self.BRANCHES ):
+                    handler = self.branch
+                else:
+                    handler = getattr( self, "op_" + operator )
+                page_penalty = instructions.get_cycle_penalty( operator, addressing_mode ) == self.InstructionSet.cycle_penalty_Page
+                self._table[opcode] = ( handler, addressing_mode, length, cycles, page_penalty )
+
+        self._branch_flags = [ None ] * 256
+        for operator, condition in self.BRANCHES.items():
+            self._branch_flags[ instructions.get_opcode( operator, self.InstructionSet.addressing_mode_Relative ) ] = condition
+
+        self.reset()
+
+
+    # Registers to their power on values, memory is left alone
+    def reset( self ):
+        self.a = 0
+        self.x = 0
+        self.y = 0
+        self.sp = 0xFF
+        self.p = FLAG_I | FLAG_U
+        self.pc = 0
+
+        # Totals since the reset
+        self.cycles = 0
+        self.instructions = 0
+
+
+    # Copy data into memory at address
+    def load( self, data, address ):
+        self.memory[address:address + len(data)] = data
+
+
+    # Load a program as returned by Assembler.run(), the two byte load address followed by the data. Returns the load address.
+    def load_prg( self, program ):
+        address = program[0] | ( program[1] << 8 )
+        self.load( program[2:], address )
+        return address
+
+
+    # Put an RTS at each address so JSRs to routines that aren't loaded, e.g. in the KERNAL, return straight away
+    def stub( self, *addresses ):
+        for address in addresses:
+            self.memory[address] = OPCODE_RTS
+
+
+    # Run the routine at address until it returns with an RTS and return the cycles taken, the RTS included.
+    # Raises CPUError if it hasn't returned after max_cycles.
+    def call( self, address, max_cycles = 10000000 ):
+
+        self.pc = address
+        sp = self.sp
+        start = self.cycles
+        memory = self.memory
+
+        while ( memory[self.pc] != OPCODE_RTS or self.sp != sp ):
+            self.step()
+
+            if ( self.cycles - start > max_cycles ):
+                raise CPUError( "Routine at $%04X didn't return within %d cycles, at $%04X" % ( address, max_cycles, self.pc ) )
+
+        # The routine's own RTS, there's nothing on the stack to return to
+        self.cycles = self.cycles + self._table[OPCODE_RTS][3]
+        self.instructions = self.instructions + 1
+
+        return self.cycles - start
+
+
+    # Execute one instruction and return the cycles it took
+    def step( self ):
+
+        memory = self.memory
+        pc = self.pc
+        entry = self._table[ memory[pc] ]
+
+        if ( entry == None ):
+            raise CPUError( "Unused opcode $%02X at $%04X" % ( memory[pc], pc ) )
+
+        handler, addressing_mode, length, cycles, page_penalty = entry
+        address, crossed = self.get_address( addressing_mode, pc )
+
+        self.pc = ( pc + length ) & 0xFFFF
+
+        if ( crossed and page_penalty ):
+            cycles = cycles + 1
+
+        extra = handler( addressing_mode, address )
+        if ( extra != None ):
+            cycles = cycles + extra
+
+        self.cycles = self.cycles + cycles
+        self.instructions = self.instructions + 1
+
+        return cycles
+
+
+    # ( address the instruction at pc operates on, whether indexing crossed a page ), the address is
+    # None for implied and accumulator instructions and the branch target for relative ones
+    def get_address( self, addressing_mode, pc ):
+
+        memory = self.memory
+        modes = self.InstructionSet
+
+        if ( addressing_mode == modes.addressing_mode_Implied or addressing_mode == modes.addressing_mode_Accumulator ):
+            return None, False
+
+        operand = memory[ ( pc + 1 ) & 0xFFFF ]
+
+        if ( addressing_mode == modes.addressing_mode_Immediate ):
+            return ( pc + 1 ) & 0xFFFF, False
+        elif ( addressing_mode == modes.addressing_mode_ZeroPage ):
+            return operand, False
+        elif ( addressing_mode == modes.addressing_mode_ZeroPageX ):
+            return ( operand + self.x ) & 0xFF, False
+        elif ( addressing_mode == modes.addressing_mode_ZeroPageY ):
+            return ( operand + self.y ) & 0xFF, False
+        elif ( addressing_mode == modes.addressing_mode_Relative ):
+            return ( pc + 2 + ( operand - 0x100 if operand & 0x80 else operand ) ) & 0xFFFF, False
+        elif ( addressing_mode == modes.addressing_mode_Indexed_Indirect_X ):
+            pointer = ( operand + self.x ) & 0xFF
+            return memory[pointer] | ( memory[ ( pointer + 1 ) & 0xFF ] << 8 ), False
+        elif ( addressing_mode == modes.addressing_mode_Indirect_Indexed_Y ):
+            base = memory[operand] | ( memory[ ( operand + 1 ) & 0xFF ] << 8 )
+            address = ( base + self.y ) & 0xFFFF
+            return address, ( base ^ address ) & 0xFF00 > 0
+
+        base = operand | ( memory[ ( pc + 2 ) & 0xFFFF ] << 8 )
+
+        if ( addressing_mode == modes.addressing_mode_Absolute ):
+            return base, False
+        elif ( addressing_mode == modes.addressing_mode_AbsoluteX ):
+            address = ( base + self.x ) & 0xFFFF
+            return address, ( base ^ address ) & 0xFF00 > 0
+        elif ( addressing_mode == modes.addressing_mode_AbsoluteY ):
+            address = ( base + self.y ) & 0xFFFF
+            return address, ( base ^ address ) & 0xFF00 > 0
+        else:
+            # JMP ($xxFF) reads the high byte from $xx00, the 6510 doesn't carry into the pointer's high byte
+            return memory[base] | ( memory[ ( base & 0xFF00 ) | ( ( base + 1 ) & 0xFF ) ] << 8 ), False
+
+
+    # FLAGS AND STACK
+
+    def set_nz( self, value ):
+        self.p = ( self.p & ~( FLAG_N | FLAG_Z ) ) | ( value & FLAG_N ) | ( FLAG_Z if value == 0 else 0 )
+        return value
+
+
+    def set_flag( self, flag, on ):
+        if ( on ):
+            self.p = self.p | flag
+        else:
+            self.p = self.p & ~flag
+
+
+    def push( self, value ):
+        self.memory[ 0x100 + self.sp ] = value
+        self.sp = ( self.sp - 1 ) & 0xFF
+
+
+    def pull( self ):
+        self.sp = ( self.sp + 1 ) & 0xFF
+        return self.memory[ 0x100 + self.sp ]
+
+
+    def push_word( self, value ):
+        self.push( value >> 8 )
+        self.push( value & 0xFF )
+
+
+    def pull_word( self ):
+        low = self.pull()
+        return low | ( self.pull() << 8 )
+
+
+    # Taken branches take a cycle more, and another when the target is on a different page
+    def branch( self, addressing_mode, address ):
+        flag, on = self._branch_flags[ self.memory[ ( self.pc - 2 ) & 0xFFFF ] ]
+
+        if ( ( self.p & flag > 0 ) != on ):
+            return None
+
+        extra = 2 if ( self.pc ^ address ) & 0xFF00 else 1
+        self.pc = address
+        return extra
+
+
+    # Read-modify-write instructions operate on the accumulator or memory
+    def modify( self, addressing_mode, address, fn ):
+        if ( address == None ):
+            self.a = self.set_nz( fn( self.a ) )
+        else:
+            self.memory[address] = self.set_nz( fn( self.memory[address] ) )
+
+
+    def compare( self, register, address ):
+        value = self.memory[address]
+        self.set_flag( FLAG_C, register >= value )
+        self.set_nz( ( register - value ) & 0xFF )
+
+
+    # INSTRUCTIONS
+
+    def op_ADC( self, addressing_mode, address ):
+        value = self.memory[address]
+        carry = self.p & FLAG_C
+        result = self.a + value + carry
+
+        if ( self.p & FLAG_D ):
+            # Z comes from the binary sum, N and V from the sum before the high digit is adjusted
+            low = ( self.a & 0x0F ) + ( value & 0x0F ) + carry
+            if ( low >= 0x0A ):
+                low = ( ( low + 0x06 ) & 0x0F ) + 0x10
+            decimal = ( self.a & 0xF0 ) + ( value & 0xF0 ) + low
+
+            self.set_nz( decimal & 0xFF )
+            self.set_flag( FLAG_Z, not result & 0xFF )
+            self.set_flag( FLAG_V, ~( self.a ^ value ) & ( self.a ^ decimal ) & 0x80 )
+
+            if ( decimal >= 0xA0 ):
+                decimal = decimal + 0x60
+            self.set_flag( FLAG_C, decimal >= 0x100 )
+            self.a = decimal & 0xFF
+        else:
+            self.set_flag( FLAG_C, result > 0xFF )
+            self.set_flag( FLAG_V, ~( self.a ^ value ) & ( self.a ^ result ) & 0x80 )
+            self.a = self.set_nz( result & 0xFF )
+
+
+    def op_SBC( self, addressing_mode, address ):
+        value = self.memory[address]
+        borrow = 1 - ( self.p & FLAG_C )
+        result = self.a - value - borrow
+
+        # The flags always come from the binary difference
+        self.set_flag( FLAG_C, result >= 0 )
+        self.set_flag( FLAG_V, ( self.a ^ value ) & ( self.a ^ result ) & 0x80 )
+        self.set_nz( result & 0xFF )
+
+        if ( self.p & FLAG_D ):
+            low = ( self.a & 0x0F ) - ( value & 0x0F ) - borrow
+            if ( low < 0 ):
+                low = ( ( low - 0x06 ) & 0x0F ) - 0x10
+            decimal = ( self.a & 0xF0 ) - ( value & 0xF0 ) + low
+            if ( decimal < 0 ):
+                decimal = decimal - 0x60
+            self.a = decimal & 0xFF
+        else:
+            self.a = result & 0xFF
+
+
+    def op_AND( self, addressing_mode, address ):
+        self.a = self.set_nz( self.a & self.memory[address] )
+
+    def op_ORA( self, addressing_mode, address ):
+        self.a = self.set_nz( self.a | self.memory[address] )
+
+    def op_EOR( self, addressing_mode, address ):
+        self.a = self.set_nz( self.a ^ self.memory[address] )
+
+    def op_BIT( self, addressing_mode, address ):
+        value = self.memory[address]
+        self.p = ( self.p & ~( FLAG_N | FLAG_V | FLAG_Z ) ) | ( value & ( FLAG_N | FLAG_V ) ) | ( 0 if self.a & value else FLAG_Z )
+
+
+    def op_ASL( self, addressing_mode, address ):
+        value = self.a if address == None else self.memory[address]
+        self.set_flag( FLAG_C, value & 0x80 )
+        self.modify( addressing_mode, address, lambda value: ( value << 1 ) & 0xFF )
+
+    def op_LSR( self, addressing_mode, address ):
+        value = self.a if address == None else self.memory[address]
+        self.set_flag( FLAG_C, value & 0x01 )
+        self.modify( addressing_mode, address, lambda value: value >> 1 )
+
+    def op_ROL( self, addressing_mode, address ):
+        value = self.a if address == None else self.memory[address]
+        carry = self.p & FLAG_C
+        self.set_flag( FLAG_C, value & 0x80 )
+        self.modify( addressing_mode, address, lambda value: ( ( value << 1 ) | carry ) & 0xFF )
+
+    def op_ROR( self, addressing_mode, address ):
+        value = self.a if address == None else self.memory[address]
+        carry = self.p & FLAG_C
+        self.set_flag( FLAG_C, value & 0x01 )
+        self.modify( addressing_mode, address, lambda value: ( value >> 1 ) | ( carry << 7 ) )
+
+    def op_INC( self, addressing_mode, address ):
+        self.modify( addressing_mode, address, lambda value: ( value + 1 ) & 0xFF )
+
+    def op_DEC( self, addressing_mode, address ):
+        self.modify( addressing_mode, address, lambda value: ( value - 1 ) & 0xFF )
+
+
+    def op_CMP( self, addressing_mode, address ):
+        self.compare( self.a, address )
+
+    def op_CPX( self, addressing_mode, address ):
+        self.compare( self.x, address )
+
+    def op_CPY( self, addressing_mode, address ):
+        self.compare( self.y, address )
+
+
+    def op_LDA( self, addressing_mode, address ):
+        self.a = self.set_nz( self.memory[address] )
+
+    def op_LDX( self, addressing_mode, address ):
+        self.x = self.set_nz( self.memory[address] )
+
+    def op_LDY( self, addressing_mode, address ):
+        self.y = self.set_nz( self.memory[address] )
+
+    def op_STA( self, addressing_mode, address ):
+        self.memory[address] = self.a
+
+    def op_STX( self, addressing_mode, address ):
+        self.memory[address] = self.x
+
+    def op_STY( self, addressing_mode, address ):
+        self.memory[address] = self.y
+
+
+    def op_INX( self, addressing_mode, address ):
+        self.x = self.set_nz( ( self.x + 1 ) & 0xFF )
+
+    def op_INY( self, addressing_mode, address ):
+        self.y = self.set_nz( ( self.y + 1 ) & 0xFF )
+
+    def op_DEX( self, addressing_mode, address ):
+        self.x = self.set_nz( ( self.x - 1 ) & 0xFF )
+
+    def op_DEY( self, addressing_mode, address ):
+        self.y = self.set_nz( ( self.y - 1 ) & 0xFF )
+
+    def op_TAX( self, addressing_mode, address ):
+        self.x = self.set_nz( self.a )
+
+    def op_TAY( self, addressing_mode, address ):
+        self.y = self.set_nz( self.a )
+
+    def op_TXA( self, addressing_mode, address ):
+        self.a = self.set_nz( self.x )
+
+    def op_TYA( self, addressing_mode, address ):
+        self.a = self.set_nz( self.y )
+
+    def op_TSX( self, addressing_mode, address ):
+        self.x = self.set_nz( self.sp )
+
+    def op_TXS( self, addressing_mode, address ):
+        self.sp = self.x
+
+
+    def op_PHA( self, addressing_mode, address ):
+        self.push( self.a )
+
+    def op_PLA( self, addressing_mode, address ):
+        self.a = self.set_nz( self.pull() )
+
+    # The B flag only exists on the stack, PHP and BRK push it set
+    def op_PHP( self, addressing_mode, address ):
+        self.push( self.p | FLAG_B | FLAG_U )
+
+    def op_PLP( self, addressing_mode, address ):
+        self.p = ( self.pull() & ~FLAG_B ) | FLAG_U
+
+
+    def op_CLC( self, addressing_mode, address ):
+        self.p = self.p & ~FLAG_C
+
+    def op_SEC( self, addressing_mode, address ):
+        self.p = self.p | FLAG_C
+
+    def op_CLD( self, addressing_mode, address ):
+        self.p = self.p & ~FLAG_D
+
+    def op_SED( self, addressing_mode, address ):
+        self.p = self.p | FLAG_D
+
+    def op_CLI( self, addressing_mode, address ):
+        self.p = self.p & ~FLAG_I
+
+    def op_SEI( self, addressing_mode, address ):
+        self.p = self.p | FLAG_I
+
+    def op_CLV( self, addressing_mode, address ):
+        self.p = self.p & ~FLAG_V
+
+
+    def op_JMP( self, addressing_mode, address ):
+        self.pc = address
+
+    # The return address pushed is that of the JSR's last byte
+    def op_JSR( self, addressing_mode, address ):
+        self.push_word( ( self.pc - 1 ) & 0xFFFF )
+        self.pc = address
+
+    def op_RTS( self, addressing_mode, address ):
+        self.pc = ( self.pull_word() + 1 ) & 0xFFFF
+
+    def op_RTI( self, addressing_mode, address ):
+        self.op_PLP( addressing_mode, address )
+        self.pc = self.pull_word()
+
+    # BRK skips the byte after it and jumps through the IRQ vector at $FFFE
+    def op_BRK( self, addressing_mode, address ):
+        self.push_word( ( self.pc + 1 ) & 0xFFFF )
+        self.push( self.p | FLAG_B | FLAG_U )
+        self.p = self.p | FLAG_I
+        self.pc = self.memory[0xFFFE] | ( self.memory[0xFFFF] << 8 )
+
+    def op_NOP( self, addressing_mode, address ):
+        pass
@@ -0,0 +1,399 @@
+import itertools
+import mmap
+
+import loggy
+
+# Commodore 1541 disk images (.d64), 35 tracks of 256 byte sectors.
+#
+# Track 18 holds the BAM (18/0), a bitmap of free sectors per track plus the disk name and id, and the
+# directory (18/1 onwards), 8 entries of 32 bytes per sector. Files are chains of sectors, the first two
+# bytes of each sector link to the next one, or are 0 and the index of the last used byte in the last one.
+# Sectors are allocated like the 1541 DOS does, starting next to the directory track and stepping
+# through each track with an interleave so the drive has time to process a sector before the next.
+#
+# An image works on any writable buffer. New images are built in memory and saved with a single write,
+# open() maps an existing image so adding files only touches the sectors they change.
+class D64Image:
+
+    SECTORS_PER_TRACK = ( 21, ) * 17 + ( 19, ) * 7 + ( 18, ) * 6 + ( 17, ) * 5
+    TRACKS = 35
+    SECTOR_SIZE = 256
+    SIZE = 174848
+
+    DIRECTORY_TRACK = 18
+    INTERLEAVE = 10
+    DIRECTORY_INTERLEAVE = 3
+
+    # Bytes of data in each sector of a file, after the link to the next sector
+    DATA_SIZE = 254
+
+    # File types, closed
+    TYPE_DEL = 0x80
+    TYPE_SEQ = 0x81
+    TYPE_PRG = 0x82
+    TYPE_USR = 0x83
+    TYPE_REL = 0x84
+
+    PAD = 0xA0
+
+    # Index of the first sector of each track, the entry for track 0 is unused
+    TRACK_SECTORS = ( 0, ) + tuple( itertools.accumulate( SECTORS_PER_TRACK[:-1], initial=0 ) )
+
+
+    def __init__( self, data ):
+        if ( len(data) != self.SIZE ):
+            loggy.log( loggy.LOG_ERROR, "Not a 35 track disk image (%d bytes)", len(data) )
+            exit(1)
+
+        self._data = data
+        self._file = None
+
+
+    # A new formatted image in memory
+    @classmethod
+    def create( cls, name, disk_id ):
+        image = cls( bytearray( cls.SIZE ) )
+        image.format( name, disk_id )
+        return image
+
+
+    # Map an existing image file so it is updated in place
+    @classmethod
+    def open( cls, filename ):
+        image_file = open( filename, "r+b" )
+        image = cls( mmap.mmap( image_file.fileno(), 0 ) )
+        image._file = image_file
+        return image
+
+
+    # Write the image to a file in one go
+    def save( self, filename ):
+        with open( filename, "wb" ) as image_file:
+            image_file.write( self._data )
+
+
+    # Flush a mapped image to its file and unmap it
+    def close( self ):
+        if ( self._file != None ):
+            self._data.flush()
+            self._data.close()
+            self._file.close()
+            self._file = None
+
+
+    # Whether the image is mapped from its file by open(), rather than held in memory until save()
+    def is_open( self ):
+        return self._file != None
+
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.close()
+
+
+    # Offset of a sector in the image
+    def get_offset( self, track, sector ):
+        if ( track < 1 or track > self.TRACKS or sector < 0 or sector >= self.SECTORS_PER_TRACK[track - 1] ):
+            loggy.log( loggy.LOG_ERROR, "Invalid track %d sector %d", track, sector )
+            exit(1)
+        return ( self.TRACK_SECTORS[track] + sector ) * self.SECTOR_SIZE
+
+
+    # Wipe the image and write an empty BAM and directory
+    def format( self, name, disk_id ):
+
+        self._data[0:self.SIZE] = bytes( self.SIZE )
+
+        bam = self.get_offset( self.DIRECTORY_TRACK, 0 )
+        data = self._data
+
+        data[bam:bam + 4] = bytes([ self.DIRECTORY_TRACK, 1, 0x41, 0x00 ])
+
+        for track in range( 1, self.TRACKS + 1 ):
+            sectors = self.SECTORS_PER_TRACK[track - 1]
+            entry = bam + 4 * track
+            data[entry] = sectors
+            data[entry + 1:entry + 4] = ( ( 1 << sectors ) - 1 ).to_bytes( 3, byteorder='little' )
+
+        data[bam + 0x90:bam + 0xA0] = to_petscii( name, 16 )
+        data[bam + 0xA0:bam + 0xA2] = bytes([ self.PAD, self.PAD ])
+        data[bam + 0xA2:bam + 0xA4] = to_petscii( disk_id, 2 )
+        data[bam + 0xA4] = self.PAD
+        data[bam + 0xA5:bam + 0xA7] = b"2A"
+        data[bam + 0xA7:bam + 0xAB] = bytes([ self.PAD ] * 4)
+
+        self.allocate( self.DIRECTORY_TRACK, 0 )
+        self.allocate( self.DIRECTORY_TRACK, 1 )
+
+        directory = self.get_offset( self.DIRECTORY_TRACK, 1 )
+        data[directory + 1] = 0xFF
+
+
+    # Disk name and id
+    def get_name( self ):
+        bam = self.get_offset( self.DIRECTORY_TRACK, 0 )
+        return ( from_petscii( self._data[bam + 0x90:bam + 0xA0] ), from_petscii( self._data[bam + 0xA2:bam + 0xA4] ) )
+
+
+    #################################################
+    # BAM
+    #################################################
+
+    def is_free( self, track, sector ):
+        entry = self.get_offset( self.DIRECTORY_TRACK, 0 ) + 4 * track
+        return ( self._data[entry + 1 + ( sector >> 3 )] >> ( sector & 7 ) ) & 1 == 1
+
+
+    def allocate( self, track, sector ):
+        entry = self.get_offset( self.DIRECTORY_TRACK, 0 ) + 4 * track
+        if ( self.is_free( track, sector ) ):
+            self._data[entry + 1 + ( sector >> 3 )] &= ~( 1 << ( sector & 7 ) ) & 0xFF
+            self._data[entry] -= 1
+
+
+    def free( self, track, sector ):
+        entry = self.get_offset( self.DIRECTORY_TRACK, 0 ) + 4 * track
+        if ( not self.is_free( track, sector ) ):
+            self._data[entry + 1 + ( sector >> 3 )] |= 1 << ( sector & 7 )
+            self._data[entry] += 1
+
+
+    # Free blocks, as the directory listing shows them (the directory track isn't counted)
+    def get_free_blocks( self ):
+        bam = self.get_offset( self.DIRECTORY_TRACK, 0 )
+        return sum( self._data[bam + 4 * track] for track in range( 1, self.TRACKS + 1 ) if track != self.DIRECTORY_TRACK )
+
+
+    # First free sector of a track from sector onwards, wrapping round, None if the track is full
+    def find_free_sector( self, track, sector ):
+        sectors = self.SECTORS_PER_TRACK[track - 1]
+        for step in range( 0, sectors ):
+            candidate = ( sector + step ) % sectors
+            if ( self.is_free( track, candidate ) ):
+                return candidate
+        return None
+
+
+    # Allocate the first sector of a file on the track closest to the directory
+    def allocate_first_sector( self ):
+        for distance in range( 1, self.TRACKS ):
+            for track in ( self.DIRECTORY_TRACK - distance, self.DIRECTORY_TRACK + distance ):
+                if ( track >= 1 and track <= self.TRACKS ):
+                    sector = self.find_free_sector( track, 0 )
+                    if ( sector != None ):
+                        self.allocate( track, sector )
+                        return ( track, sector )
+
+        loggy.log( loggy.LOG_ERROR, "Disk full" )
+        exit(1)
+
+
+    # Allocate the sector to follow track/sector in a file, interleave sectors on, moving away from the
+    # directory track once a track is full
+    def allocate_next_sector( self, track, sector ):
+
+        sectors = self.SECTORS_PER_TRACK[track - 1]
+        sector = sector + self.INTERLEAVE
+        if ( sector >= sectors ):
+            sector = sector - sectors
+            if ( sector > 0 ):
+                sector = sector - 1
+
+        direction = -1 if track < self.DIRECTORY_TRACK else 1
+
+        # Away from the directory then, once that side is full, the other side
+        for attempt in range( 0, 2 ):
+            while ( track >= 1 and track <= self.TRACKS ):
+                if ( track != self.DIRECTORY_TRACK ):
+                    found = self.find_free_sector( track, sector )
+                    if ( found != None ):
+                        self.allocate( track, found )
+                        return ( track, found )
+                track = track + direction
+                sector = 0
+
+            direction = -direction
+            track = self.DIRECTORY_TRACK + direction
+
+        loggy.log( loggy.LOG_ERROR, "Disk full" )
+        exit(1)
+
+
+    #################################################
+    # Directory
+    #################################################
+
+    # Offsets of every directory entry, used or not, in directory order
+    def get_entry_offsets( self ):
+        offsets = []
+        track, sector = self.DIRECTORY_TRACK, 1
+        visited = set()
+
+        while ( track != 0 and ( track, sector ) not in visited ):
+            visited.add( ( track, sector ) )
+            offset = self.get_offset( track, sector )
+            offsets.extend( range( offset, offset + self.SECTOR_SIZE, 32 ) )
+            track, sector = self._data[offset], self._data[offset + 1]
+
+        return offsets
+
+
+    # Files on the disk as dictionaries of name, type, track, sector and blocks
+    def get_directory( self ):
+        files = []
+        for offset in self.get_entry_offsets():
+            entry = self._data[offset:offset + 32]
+            if ( entry[2] != 0 ):
+                files.append( {
+                    "name": from_petscii( entry[5:21] ),
+                    "type": entry[2],
+                    "track": entry[3],
+                    "sector": entry[4],
+                    "blocks": entry[30] | ( entry[31] << 8 )
+                } )
+        return files
+
+
+    # Offset of the directory entry of a file, None if there is no such file
+    def find_entry( self, name ):
+        petscii = to_petscii( name, 16 )
+        for offset in self.get_entry_offsets():
+            if ( self._data[offset + 2] != 0 and self._data[offset + 5:offset + 21] == petscii ):
+                return offset
+        return None
+
+
+    # Offset of a free directory entry, extending the directory when every sector is full
+    def allocate_entry( self ):
+        offsets = self.get_entry_offsets()
+
+        for offset in offsets:
+            if ( self._data[offset + 2] == 0 ):
+                return offset
+
+        # Link a new sector onto the last one
+        last = offsets[-1] - ( offsets[-1] % self.SECTOR_SIZE )
+        last_sector = last // self.SECTOR_SIZE - self.TRACK_SECTORS[self.DIRECTORY_TRACK]
+
+        sector = self.find_free_sector( self.DIRECTORY_TRACK, ( last_sector + self.DIRECTORY_INTERLEAVE ) % self.SECTORS_PER_TRACK[self.DIRECTORY_TRACK - 1] )
+        if ( sector == None ):
+            loggy.log( loggy.LOG_ERROR, "Directory full" )
+            exit(1)
+
+        self.allocate( self.DIRECTORY_TRACK, sector )
+
+        offset = self.get_offset( self.DIRECTORY_TRACK, sector )
+        self._data[offset:offset + self.SECTOR_SIZE] = bytes( self.SECTOR_SIZE )
+        self._data[offset + 1] = 0xFF
+        self._data[last] = self.DIRECTORY_TRACK
+        self._data[last + 1] = sector
+
+        return offset
+
+
+    #################################################
+    # Files
+    #################################################
+
+    # ( track, sector ) of every sector of the chain starting at track/sector
+    def get_chain( self, track, sector ):
+        chain = []
+        while ( track != 0 ):
+            if ( len(chain) > self.SIZE // self.SECTOR_SIZE ):
+                loggy.log( loggy.LOG_ERROR, "Sector chain loops" )
+                exit(1)
+            chain.append( ( track, sector ) )
+            offset = self.get_offset( track, sector )
+            track, sector = self._data[offset], self._data[offset + 1]
+        return chain
+
+
+    # Content of a file, None if there is no such file
+    def read_file( self, name ):
+        entry = self.find_entry( name )
+        if ( entry == None ):
+            return None
+
+        content = bytearray()
+        for track, sector in self.get_chain( self._data[entry + 3], self._data[entry + 4] ):
+            offset = self.get_offset( track, sector )
+            if ( self._data[offset] == 0 ):
+                content.extend( self._data[offset + 2:offset + self._data[offset + 1] + 1] )
+            else:
+                content.extend( self._data[offset + 2:offset + self.SECTOR_SIZE] )
+
+        return bytes( content )
+
+
+    # Delete a file, freeing its sectors. Returns whether there was such a file.
+    def delete_file( self, name ):
+        entry = self.find_entry( name )
+        if ( entry == None ):
+            return False
+
+        for track, sector in self.get_chain( self._data[entry + 3], self._data[entry + 4] ):
+            self.free( track, sector )
+
+        self._data[entry + 2] = 0
+
+        return True
+
+
+    # Write a file, e.g. the output of Assembler.run, replacing any file of the same name. Room is checked
+    # before the file it replaces is deleted, so that file is kept when the new one doesn't fit.
+    def write_file( self, name, content, file_type = TYPE_PRG ):
+
+        view = memoryview( content )
+        length = len(view)
+        blocks = max( 1, ( length + self.DATA_SIZE - 1 ) // self.DATA_SIZE )
+
+        free = self.get_free_blocks()
+        existing = self.find_entry( name )
+        if ( existing != None ):
+            free = free + len( self.get_chain( self._data[existing + 3], self._data[existing + 4] ) )
+
+        if ( blocks > free ):
+            loggy.log( loggy.LOG_ERROR, "Not enough room on the disk for %s (%d blocks, %d free)", name, blocks, free )
+            exit(1)
+
+        self.delete_file( name )
+
+        entry = self.allocate_entry()
+
+        first = self.allocate_first_sector()
+        track, sector = first
+
+        for block in range( 0, blocks ):
+            offset = self.get_offset( track, sector )
+            chunk = view[block * self.DATA_SIZE:( block + 1 ) * self.DATA_SIZE]
+
+            self._data[offset:offset + self.SECTOR_SIZE] = bytes( self.SECTOR_SIZE )
+            self._data[offset + 2:offset + 2 + len(chunk)] = chunk
+
+            if ( block + 1 < blocks ):
+                track, sector = self.allocate_next_sector( track, sector )
+                self._data[offset] = track
+                self._data[offset + 1] = sector
+            else:
+                self._data[offset + 1] = len(chunk) + 1
+
+        self._data[entry + 2:entry + 32] = bytes( 30 )
+        self._data[entry + 2] = file_type
+        self._data[entry + 3] = first[0]
+        self._data[entry + 4] = first[1]
+        self._data[entry + 5:entry + 21] = to_petscii( name, 16 )
+        self._data[entry + 30:entry + 32] = blocks.to_bytes( 2, byteorder='little' )
+
+        loggy.log( loggy.LOG_DIAGNOSTIC, "Wrote %s to disk at %d/%d (%d blocks)", name, first[0], first[1], blocks )
+
+
+# Upper case PETSCII for a name, padded to length with shifted spaces
+def to_petscii( text, length ):
+    encoded = text.upper().encode( "ascii", "replace" )[:length]
+    return encoded + bytes([ D64Image.PAD ] * ( length - len(encoded) ))
+
+
+def from_petscii( data ):
+    return bytes( data ).rstrip( bytes([ D64Image.PAD ]) ).decode( "ascii", "replace" )
@@ -6,21 +6,5 @@ NAME=`echo $FILE | sed -e 's/.*\///g'`
 
 echo "Writing $FILE name ($NAME)"
 
-
-if [ ! -f $OUTPUT ]; then
-	echo "No disk file, formatting $OUTPUT"
-	../Vice/tools/c1541 \
-		-format diskname,id d64 $OUTPUT
-fi
-
-if [ -f $FILE ]; then
-	../Vice/tools/c1541 \
-		-attach $OUTPUT \
-		-delete $NAME
-
-	../Vice/tools/c1541 \
-		-attach $OUTPUT \
-		-write $FILE
-else
-	echo "$FILE does not exist"
-fi
+# Formats the image if there isn't one yet and replaces any file of the same name
+python3 helpers/write_d64.py $OUTPUT $FILE
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import instruction_set
+
+# Regenerate instruction_table.py, the frozen snapshot of InstructionSet.loadInstructions()
+# that the assembler loads at startup. Run this after changing loadInstructions().
+
+instructions = instruction_set.InstructionSet()
+instructions.loadInstructions()
+
+output = "# Generated by helpers/generate_instruction_table.py from InstructionSet.loadInstructions(), do not edit\n\n"
+
+output = output + "# operator -> description\n"
+output = output + "DESCRIPTIONS = {\n"
+for operator in instructions._instructions:
+    output = output + "    " + repr(operator) + ": " + repr(instructions._instructions[operator]["description"]) + ",\n"
+output = output + "}\n\n"
+
+output = output + "# (operator, addressing mode, opcode, base cycles)\n"
+output = output + "OPCODES = (\n"
+for operator in instructions._instructions:
+    for addressing_mode, opcode in instructions._instructions[operator]["addressing_modes"].items():
+        cycles = instructions.get_cycles( operator, addressing_mode )
+        output = output + "    ( " + repr(operator) + ", " + str(addressing_mode) + ", 0x" + '{:02X}'.format(opcode) + ", " + str(cycles) + " ),\n"
+output = output + ")\n\n"
+
+output = output + "# opcode -> (operator, addressing mode, length, base cycles)\n"
+output = output + "DECODE = (\n"
+for entry in instructions._decode:
+    output = output + "    " + repr(entry) + ",\n"
+output = output + ")\n"
+
+filename = os.path.join( os.path.dirname(os.path.abspath(__file__)), "..", "instruction_table.py" )
+
+with open(filename, "w") as table_file:
+    table_file.write(output)
+
+print ( "Wrote " + os.path.abspath(filename) )
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import retroasm
+
+# Add files to a D64 disk image, replacing files of the same name, without going through c1541
+#
+#   python3 helpers/write_d64.py images/dev.d64 asm/border asm/hires
+
+if ( len(sys.argv) < 3 ):
+    print ( "Usage: write_d64.py image.d64 file [file ...]" )
+    exit(1)
+
+programs = []
+for filename in sys.argv[2:]:
+    if ( os.path.isfile(filename) ):
+        with open(filename, "rb") as program_file:
+            programs.append( ( filename, program_file.read() ) )
+    else:
+        print ( filename + " does not exist" )
+
+retroasm.write_disk( sys.argv[1], "diskname,id", programs )
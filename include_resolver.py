@@ -0,0 +1,115 @@
+import hashlib
+import os
+
+import loggy
+from assembly_parser import TokenKind
+
+# Resolves .include directives by splicing the tokens of included files into the token list.
+#
+# Each file is tokenized and classified once and cached by path. The cache is checked against the
+# file's mtime and size first and its content hash second, so touching a file doesn't re-tokenize it.
+# Token lists are never modified once cached, so the same tokens are shared by every include of a file.
+class IncludeResolver:
+
+    def __init__( self, parser, instruction_set ):
+        self._parser = parser
+        self._instruction_set = instruction_set
+
+        # path -> [ signature, digest, tokens ], the signature being ( mtime, size ) and the digest the content hash
+        self._cache = {}
+
+        self.hits = 0
+        self.misses = 0
+
+
+    # Drop every cached file
+    def clear( self ):
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+
+    # Load the classified tokens of a file, from the cache when the file hasn't changed
+    def load_tokens( self, fullpath ):
+
+        if ( not os.path.isfile(fullpath) ):
+            loggy.log( loggy.LOG_ERROR, "Unable to load include file: %s", fullpath )
+            exit(1)
+
+        stat = os.stat(fullpath)
+        signature = ( stat.st_mtime_ns, stat.st_size )
+
+        entry = self._cache.get(fullpath)
+
+        if ( entry != None and entry[0] == signature ):
+            self.hits = self.hits + 1
+            return entry[2]
+
+        with open(fullpath, "r") as source_file:
+            source = source_file.read()
+
+        digest = hashlib.sha1( source.encode() ).hexdigest()
+
+        if ( entry != None and entry[1] == digest ):
+            # Touched but not changed
+            entry[0] = signature
+            self.hits = self.hits + 1
+            return entry[2]
+
+        self.misses = self.misses + 1
+
+        tokens = self._parser.tokenize(source)
+        self._parser.classify( tokens, self._instruction_set )
+
+        self._cache[fullpath] = [ signature, digest, tokens ]
+
+        loggy.log( loggy.LOG_DIAGNOSTIC, "Tokenized %s (%d tokens)", fullpath, len(tokens) )
+
+        return tokens
+
+
+    # Path of the file named by an include's filename token
+    def get_include_path( self, token, working_directory ):
+        filename = token.text.replace("\"","")
+        return os.path.join( working_directory, filename )
+
+
+    # Return a new token list with every include resolved, nested includes are resolved relative to the
+    # same working directory. Chunks between includes are copied once so this is linear in the output size.
+    # Every included path is appended to included, when given, in the order they are included.
+    def resolve( self, tokens, working_directory, included = None, stack = () ):
+
+        resolved = []
+        start = 0
+        idx = 0
+
+        while idx < len(tokens):
+
+            if ( tokens[idx].kind == TokenKind.INCLUDE_DECL and idx + 1 < len(tokens) ):
+
+                fullpath = self.get_include_path( tokens[idx + 1], working_directory )
+
+                if ( fullpath in stack ):
+                    loggy.log( loggy.LOG_ERROR, "Include cycle: " + " -> ".join( stack + (fullpath,) ) )
+                    exit(1)
+
+                loggy.log( loggy.LOG_DIAGNOSTIC, "Including %s", fullpath )
+
+                if ( included != None ):
+                    included.append(fullpath)
+
+                resolved.extend( tokens[start:idx] )
+                resolved.extend( self.resolve( self.load_tokens(fullpath), working_directory, included, stack + (fullpath,) ) )
+
+                idx = idx + 2
+                start = idx
+            else:
+                idx = idx + 1
+
+        if ( start == 0 ):
+            # Nothing included, no need to copy
+            return tokens
+
+        resolved.extend( tokens[start:] )
+
+        return resolved
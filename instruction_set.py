@@ -2,6 +2,9 @@ import loggy
 
 class InstructionSet:
 
+    # Process wide instruction set loaded from the frozen table, see shared()
+    _shared = None
+
     addressing_mode_Implied = 0
     addressing_mode_Immediate = 1
     addressing_mode_AbsoluteX = 2
@@ -16,6 +19,21 @@ class InstructionSet:
     addressing_mode_Indexed_Indirect_X = 11
     addressing_mode_Relative = 12
 
+    # Instruction length in bytes, indexed by addressing mode
+    INSTRUCTION_LENGTHS = ( 1, 2, 3, 3, 3, 1, 2, 2, 2, 2, 3, 2, 2 )
+
+    # Cycles an instruction can take on top of its base count
+    #   page   - +1 when an indexed read crosses a page
+    #   branch - +1 when the branch is taken, +1 more when it lands on another page
+    cycle_penalty_None = 0
+    cycle_penalty_Page = 1
+    cycle_penalty_Branch = 2
+
+    # Reads that take the page crossing cycle in these addressing modes, stores and read-modify-write
+    # instructions always take it and have it in their base count
+    PAGE_PENALTY_OPERATORS = ( "ADC", "AND", "CMP", "EOR", "LDA", "LDX", "LDY", "ORA", "SBC" )
+    PAGE_PENALTY_ADDRESSING_MODES = ( addressing_mode_AbsoluteX, addressing_mode_AbsoluteY, addressing_mode_Indirect_Indexed_Y )
+
     def __init__(self):
         # Initialize
         self.initialise()
@@ -23,6 +41,14 @@ class InstructionSet:
     def initialise(self):
         self._instructions = {}
 
+        # Flat lookup tables kept alongside the instruction dictionaries
+        #   _opcodes - (operator, addressing mode) -> opcode
+        #   _cycles  - (operator, addressing mode) -> base cycle count
+        #   _decode  - opcode -> (operator, addressing mode, length, base cycles), None for unused opcodes
+        self._opcodes = {}
+        self._cycles = {}
+        self._decode = [None] * 256
+
     def addInstruction( self, operator, description ):
         if ( operator in self._instructions ):
             loggy.log ( loggy.LOG_ERROR, operator + " already exists in instruction set" )
@@ -56,51 +82,116 @@ class InstructionSet:
 
     
     # Add opcode to the language
-    def addOpcode( self, instruction, addressing_mode, opcode ):
+    def addOpcode( self, instruction, addressing_mode, opcode, cycles = 0 ):
         
         if ( instruction in self._instructions ):
+            operator = instruction
             instruction = self._instructions[ instruction ]
             
             if ( addressing_mode in instruction["addressing_modes"] ):
-                loggy.log ( loggy.LOG_ERROR,  "Duplicate addressing mode " + instruction )
+                loggy.log ( loggy.LOG_ERROR,  "Duplicate addressing mode " + operator )
+                return False
+            elif ( self._decode[opcode] != None ):
+                loggy.log ( loggy.LOG_ERROR,  "Opcode " + '{:02x}'.format(opcode) + " for " + operator + " already used by " + self._decode[opcode][0] )
                 return False
             else:
                 instruction["addressing_modes"][addressing_mode] = opcode
+
+                self._opcodes[ (operator, addressing_mode) ] = opcode
+                self._cycles[ (operator, addressing_mode) ] = cycles
+                self._decode[opcode] = ( operator, addressing_mode, self.get_instruction_length(addressing_mode), cycles )
                 return True
 
 
+    # Get the opcode for an instruction in a given addressing mode, None if there isn't one
+    def get_opcode( self, operator, addressing_mode ):
+        return self._opcodes.get( (operator, addressing_mode) )
+
+
+    # Get the base cycle count for an instruction in a given addressing mode
+    def get_cycles( self, operator, addressing_mode ):
+        return self._cycles.get( (operator, addressing_mode) )
+
+
+    # Which cycles an instruction can take on top of its base count, one of the cycle_penalty_* constants
+    def get_cycle_penalty( self, operator, addressing_mode ):
+        if ( addressing_mode == self.addressing_mode_Relative ):
+            return self.cycle_penalty_Branch
+        elif ( operator in self.PAGE_PENALTY_OPERATORS and addressing_mode in self.PAGE_PENALTY_ADDRESSING_MODES ):
+            return self.cycle_penalty_Page
+        else:
+            return self.cycle_penalty_None
+
+
+    # Decode an opcode to (operator, addressing mode, length, base cycles), None if unused
+    def decode( self, opcode ):
+        return self._decode[opcode]
+
+
+    # Disassemble machine code into (address, operator, addressing mode, operand) tuples,
+    # unused opcodes are returned with a None operator and the opcode as operand
+    def disassemble( self, data, address ):
+        instructions = []
+        idx = 0
+
+        while idx < len(data):
+            entry = self._decode[ data[idx] ]
+
+            if ( entry == None or idx + entry[2] > len(data) ):
+                instructions.append( ( address + idx, None, None, data[idx] ) )
+                idx = idx + 1
+                continue
+
+            operator, addressing_mode, length, cycles = entry
+
+            if ( length == 1 ):
+                operand = None
+            elif ( length == 2 ):
+                operand = data[idx + 1]
+            else:
+                operand = data[idx + 1] | ( data[idx + 2] << 8 )
+
+            instructions.append( ( address + idx, operator, addressing_mode, operand ) )
+            idx = idx + length
+
+        return instructions
+
+
     def get_instruction_length(self, addressing_mode):
-        instruction_length = 0
         mode = int(addressing_mode)
 
-        if ( mode == self.addressing_mode_Implied ):
-            instruction_length = 1
-        elif( mode == self.addressing_mode_Accumulator):
-            instruction_length = 1
-        elif( mode == self.addressing_mode_Indexed_Indirect_X ):
-            instruction_length = 2
-        elif( mode == self.addressing_mode_Indirect_Indexed_Y ):
-            instruction_length = 2
-        elif( mode == self.addressing_mode_Immediate ):
-            instruction_length = 2
-        elif( mode == self.addressing_mode_Relative ):
-            instruction_length = 2
-        elif( mode == self.addressing_mode_ZeroPageX ):
-            instruction_length = 2
-        elif( mode == self.addressing_mode_ZeroPageY ):
-            instruction_length = 2
-        elif( mode == self.addressing_mode_ZeroPage ):
-            instruction_length = 2
-        elif( mode == self.addressing_mode_AbsoluteX ):
-            instruction_length = 3
-        elif( mode == self.addressing_mode_AbsoluteY ):
-            instruction_length = 3
-        elif( mode == self.addressing_mode_Absolute ):
-            instruction_length = 3
-        elif( mode == self.addressing_mode_Indirect ):
-            instruction_length = 3
-
-        return instruction_length
+        if ( 0 <= mode < len(self.INSTRUCTION_LENGTHS) ):
+            return self.INSTRUCTION_LENGTHS[mode]
+        else:
+            return 0
+
+    # Get the process wide instruction set, loaded once from the frozen table and never modified
+    @classmethod
+    def shared( cls ):
+        if ( cls._shared == None ):
+            instructions = cls()
+            instructions.loadFrozen()
+            cls._shared = instructions
+
+        return cls._shared
+
+
+    # Load the instruction set from instruction_table.py, the generated snapshot of loadInstructions().
+    # This skips the hundreds of addInstruction/addOpcode calls and their checks.
+    def loadFrozen(self):
+        import instruction_table
+
+        self._instructions = {}
+        for operator, description in instruction_table.DESCRIPTIONS.items():
+            self._instructions[operator] = { "operator": operator, "description": description, "addressing_modes": {} }
+
+        for operator, addressing_mode, opcode, cycles in instruction_table.OPCODES:
+            self._instructions[operator]["addressing_modes"][addressing_mode] = opcode
+            self._opcodes[ (operator, addressing_mode) ] = opcode
+            self._cycles[ (operator, addressing_mode) ] = cycles
+
+        self._decode = list( instruction_table.DECODE )
+
 
     def loadInstructions(self):
 
@@ -162,224 +253,224 @@ class InstructionSet:
         self.addInstruction( "TYA","Transfer Index Y to Accumulator")
 
         # ADC
-        self.addOpcode( "ADC", self.addressing_mode_Immediate, 0x69)
-        self.addOpcode( "ADC", self.addressing_mode_ZeroPage, 0x65)
-        self.addOpcode( "ADC",self.addressing_mode_ZeroPageX, 0x75)
-        self.addOpcode( "ADC",self.addressing_mode_Absolute, 0x60)
-        self.addOpcode( "ADC",self.addressing_mode_AbsoluteX, 0x70)
-        self.addOpcode( "ADC",self.addressing_mode_AbsoluteY, 0x79)
-        self.addOpcode( "ADC",self.addressing_mode_Indexed_Indirect_X, 0x61)
-        self.addOpcode( "ADC",self.addressing_mode_Indirect_Indexed_Y, 0x71)
+        self.addOpcode( "ADC", self.addressing_mode_Immediate, 0x69, 2 )
+        self.addOpcode( "ADC", self.addressing_mode_ZeroPage, 0x65, 3 )
+        self.addOpcode( "ADC", self.addressing_mode_ZeroPageX, 0x75, 4 )
+        self.addOpcode( "ADC", self.addressing_mode_Absolute, 0x6D, 4 )
+        self.addOpcode( "ADC", self.addressing_mode_AbsoluteX, 0x7D, 4 )
+        self.addOpcode( "ADC", self.addressing_mode_AbsoluteY, 0x79, 4 )
+        self.addOpcode( "ADC", self.addressing_mode_Indexed_Indirect_X, 0x61, 6 )
+        self.addOpcode( "ADC", self.addressing_mode_Indirect_Indexed_Y, 0x71, 5 )
 
         # AND
-        self.addOpcode( "AND",self.addressing_mode_Immediate, 0x29)
-        self.addOpcode( "AND",self.addressing_mode_ZeroPage, 0x25)
-        self.addOpcode( "AND",self.addressing_mode_ZeroPageX, 0x35)
-        self.addOpcode( "AND",self.addressing_mode_Absolute, 0x2D)
-        self.addOpcode( "AND",self.addressing_mode_AbsoluteX, 0x3D)
-        self.addOpcode( "AND",self.addressing_mode_AbsoluteY, 0x39)
-        self.addOpcode( "AND",self.addressing_mode_Indexed_Indirect_X, 0x21)
-        self.addOpcode( "AND",self.addressing_mode_Indirect_Indexed_Y, 0x31)
+        self.addOpcode( "AND", self.addressing_mode_Immediate, 0x29, 2 )
+        self.addOpcode( "AND", self.addressing_mode_ZeroPage, 0x25, 3 )
+        self.addOpcode( "AND", self.addressing_mode_ZeroPageX, 0x35, 4 )
+        self.addOpcode( "AND", self.addressing_mode_Absolute, 0x2D, 4 )
+        self.addOpcode( "AND", self.addressing_mode_AbsoluteX, 0x3D, 4 )
+        self.addOpcode( "AND", self.addressing_mode_AbsoluteY, 0x39, 4 )
+        self.addOpcode( "AND", self.addressing_mode_Indexed_Indirect_X, 0x21, 6 )
+        self.addOpcode( "AND", self.addressing_mode_Indirect_Indexed_Y, 0x31, 5 )
 
         # ASL
-        self.addOpcode( "ASL",self.addressing_mode_Accumulator, 0x0A)
-        self.addOpcode( "ASL",self.addressing_mode_ZeroPage, 0x06)
-        self.addOpcode( "ASL",self.addressing_mode_ZeroPageX, 0x16)
-        self.addOpcode( "ASL",self.addressing_mode_Absolute, 0x0E)
-        self.addOpcode( "ASL",self.addressing_mode_AbsoluteX, 0x1E)
+        self.addOpcode( "ASL", self.addressing_mode_Accumulator, 0x0A, 2 )
+        self.addOpcode( "ASL", self.addressing_mode_ZeroPage, 0x06, 5 )
+        self.addOpcode( "ASL", self.addressing_mode_ZeroPageX, 0x16, 6 )
+        self.addOpcode( "ASL", self.addressing_mode_Absolute, 0x0E, 6 )
+        self.addOpcode( "ASL", self.addressing_mode_AbsoluteX, 0x1E, 7 )
 
         # Branching
-        self.addOpcode( "BCC",self.addressing_mode_Relative, 0x90)
-        self.addOpcode( "BCS",self.addressing_mode_Relative, 0xB0)
-        self.addOpcode( "BEQ",self.addressing_mode_Relative, 0xF0)
-        self.addOpcode( "BMI",self.addressing_mode_Relative, 0x30)
-        self.addOpcode( "BNE",self.addressing_mode_Relative, 0xD0)
-        self.addOpcode( "BPL",self.addressing_mode_Relative, 0x10)
-        self.addOpcode( "BVC",self.addressing_mode_Relative, 0x50)
-        self.addOpcode( "BVS",self.addressing_mode_Relative, 0x70)
+        self.addOpcode( "BCC", self.addressing_mode_Relative, 0x90, 2 )
+        self.addOpcode( "BCS", self.addressing_mode_Relative, 0xB0, 2 )
+        self.addOpcode( "BEQ", self.addressing_mode_Relative, 0xF0, 2 )
+        self.addOpcode( "BMI", self.addressing_mode_Relative, 0x30, 2 )
+        self.addOpcode( "BNE", self.addressing_mode_Relative, 0xD0, 2 )
+        self.addOpcode( "BPL", self.addressing_mode_Relative, 0x10, 2 )
+        self.addOpcode( "BVC", self.addressing_mode_Relative, 0x50, 2 )
+        self.addOpcode( "BVS", self.addressing_mode_Relative, 0x70, 2 )
 
         # BIT
-        self.addOpcode( "BIT",self.addressing_mode_ZeroPage, 0x24)
-        self.addOpcode( "BIT",self.addressing_mode_Absolute, 0x2C)
+        self.addOpcode( "BIT", self.addressing_mode_ZeroPage, 0x24, 3 )
+        self.addOpcode( "BIT", self.addressing_mode_Absolute, 0x2C, 4 )
 
         # BRK
-        self.addOpcode( "BRK",self.addressing_mode_Implied, 0x00)
+        self.addOpcode( "BRK", self.addressing_mode_Implied, 0x00, 7 )
 
         # Clear flags
-        self.addOpcode( "CLC",self.addressing_mode_Implied, 0x18)
-        self.addOpcode( "CLD",self.addressing_mode_Implied, 0xD8)
-        self.addOpcode( "CLI",self.addressing_mode_Implied, 0x58)
-        self.addOpcode( "CLV",self.addressing_mode_Implied, 0xB8)
+        self.addOpcode( "CLC", self.addressing_mode_Implied, 0x18, 2 )
+        self.addOpcode( "CLD", self.addressing_mode_Implied, 0xD8, 2 )
+        self.addOpcode( "CLI", self.addressing_mode_Implied, 0x58, 2 )
+        self.addOpcode( "CLV", self.addressing_mode_Implied, 0xB8, 2 )
 
         # CMP
-        self.addOpcode( "CMP",self.addressing_mode_Immediate, 0xC9)
-        self.addOpcode( "CMP",self.addressing_mode_ZeroPage, 0xC5)
-        self.addOpcode( "CMP",self.addressing_mode_ZeroPageX, 0xD5)
-        self.addOpcode( "CMP",self.addressing_mode_Absolute, 0xCD)
-        self.addOpcode( "CMP",self.addressing_mode_AbsoluteX, 0xDD)
-        self.addOpcode( "CMP",self.addressing_mode_AbsoluteY, 0xD9)
-        self.addOpcode( "CMP",self.addressing_mode_Indexed_Indirect_X, 0xC1)
-        self.addOpcode( "CMP",self.addressing_mode_Indirect_Indexed_Y, 0xD1)
+        self.addOpcode( "CMP", self.addressing_mode_Immediate, 0xC9, 2 )
+        self.addOpcode( "CMP", self.addressing_mode_ZeroPage, 0xC5, 3 )
+        self.addOpcode( "CMP", self.addressing_mode_ZeroPageX, 0xD5, 4 )
+        self.addOpcode( "CMP", self.addressing_mode_Absolute, 0xCD, 4 )
+        self.addOpcode( "CMP", self.addressing_mode_AbsoluteX, 0xDD, 4 )
+        self.addOpcode( "CMP", self.addressing_mode_AbsoluteY, 0xD9, 4 )
+        self.addOpcode( "CMP", self.addressing_mode_Indexed_Indirect_X, 0xC1, 6 )
+        self.addOpcode( "CMP", self.addressing_mode_Indirect_Indexed_Y, 0xD1, 5 )
 
         # CPX
-        self.addOpcode( "CPX",self.addressing_mode_Immediate, 0xE0)
-        self.addOpcode( "CPX",self.addressing_mode_ZeroPage, 0xE4)
-        self.addOpcode( "CPX",self.addressing_mode_Absolute, 0xEC)
+        self.addOpcode( "CPX", self.addressing_mode_Immediate, 0xE0, 2 )
+        self.addOpcode( "CPX", self.addressing_mode_ZeroPage, 0xE4, 3 )
+        self.addOpcode( "CPX", self.addressing_mode_Absolute, 0xEC, 4 )
 
         # CPY
-        self.addOpcode( "CPY",self.addressing_mode_Immediate, 0xC0)
-        self.addOpcode( "CPY",self.addressing_mode_ZeroPage, 0xC4)
-        self.addOpcode( "CPY",self.addressing_mode_Absolute, 0xCC)
+        self.addOpcode( "CPY", self.addressing_mode_Immediate, 0xC0, 2 )
+        self.addOpcode( "CPY", self.addressing_mode_ZeroPage, 0xC4, 3 )
+        self.addOpcode( "CPY", self.addressing_mode_Absolute, 0xCC, 4 )
 
         # DEC
-        self.addOpcode( "DEC",self.addressing_mode_ZeroPage, 0xC6)
-        self.addOpcode( "DEC",self.addressing_mode_ZeroPageX, 0xD6)
-        self.addOpcode( "DEC",self.addressing_mode_Absolute, 0xCE)
-        self.addOpcode( "DEC",self.addressing_mode_AbsoluteX, 0xDE)
+        self.addOpcode( "DEC", self.addressing_mode_ZeroPage, 0xC6, 5 )
+        self.addOpcode( "DEC", self.addressing_mode_ZeroPageX, 0xD6, 6 )
+        self.addOpcode( "DEC", self.addressing_mode_Absolute, 0xCE, 6 )
+        self.addOpcode( "DEC", self.addressing_mode_AbsoluteX, 0xDE, 7 )
 
         # DEX
-        self.addOpcode( "DEX",self.addressing_mode_Implied, 0xCA)
+        self.addOpcode( "DEX", self.addressing_mode_Implied, 0xCA, 2 )
 
         # DEY
-        self.addOpcode( "DEY",self.addressing_mode_Implied, 0x88)
+        self.addOpcode( "DEY", self.addressing_mode_Implied, 0x88, 2 )
 
         # EOR
-        self.addOpcode( "EOR",self.addressing_mode_Immediate, 0x49)
-        self.addOpcode( "EOR",self.addressing_mode_ZeroPage, 0x45)
-        self.addOpcode( "EOR",self.addressing_mode_ZeroPageX, 0x55)
-        self.addOpcode( "EOR",self.addressing_mode_Absolute, 0x40)
-        self.addOpcode( "EOR",self.addressing_mode_AbsoluteX, 0x50)
-        self.addOpcode( "EOR",self.addressing_mode_AbsoluteY, 0x59)
-        self.addOpcode( "EOR",self.addressing_mode_Indexed_Indirect_X, 0x41)
-        self.addOpcode( "EOR",self.addressing_mode_Indirect_Indexed_Y, 0x51)
+        self.addOpcode( "EOR", self.addressing_mode_Immediate, 0x49, 2 )
+        self.addOpcode( "EOR", self.addressing_mode_ZeroPage, 0x45, 3 )
+        self.addOpcode( "EOR", self.addressing_mode_ZeroPageX, 0x55, 4 )
+        self.addOpcode( "EOR", self.addressing_mode_Absolute, 0x4D, 4 )
+        self.addOpcode( "EOR", self.addressing_mode_AbsoluteX, 0x5D, 4 )
+        self.addOpcode( "EOR", self.addressing_mode_AbsoluteY, 0x59, 4 )
+        self.addOpcode( "EOR", self.addressing_mode_Indexed_Indirect_X, 0x41, 6 )
+        self.addOpcode( "EOR", self.addressing_mode_Indirect_Indexed_Y, 0x51, 5 )
 
         # INC
-        self.addOpcode( "INC",self.addressing_mode_ZeroPage, 0xE6)
-        self.addOpcode( "INC",self.addressing_mode_ZeroPageX, 0xF6)
-        self.addOpcode( "INC",self.addressing_mode_Absolute, 0xEE)
-        self.addOpcode( "INC",self.addressing_mode_AbsoluteX, 0xFE)
-        self.addOpcode( "INX",self.addressing_mode_Implied, 0xE8)
-        self.addOpcode( "INY",self.addressing_mode_Implied, 0xC8)
+        self.addOpcode( "INC", self.addressing_mode_ZeroPage, 0xE6, 5 )
+        self.addOpcode( "INC", self.addressing_mode_ZeroPageX, 0xF6, 6 )
+        self.addOpcode( "INC", self.addressing_mode_Absolute, 0xEE, 6 )
+        self.addOpcode( "INC", self.addressing_mode_AbsoluteX, 0xFE, 7 )
+        self.addOpcode( "INX", self.addressing_mode_Implied, 0xE8, 2 )
+        self.addOpcode( "INY", self.addressing_mode_Implied, 0xC8, 2 )
 
         # JMP
-        self.addOpcode( "JMP",self.addressing_mode_Absolute, 0x4C)
-        self.addOpcode( "JMP",self.addressing_mode_Indirect, 0x6C)
+        self.addOpcode( "JMP", self.addressing_mode_Absolute, 0x4C, 3 )
+        self.addOpcode( "JMP", self.addressing_mode_Indirect, 0x6C, 5 )
 
         # JSR
-        self.addOpcode( "JSR",self.addressing_mode_Absolute, 0x20)
+        self.addOpcode( "JSR", self.addressing_mode_Absolute, 0x20, 6 )
 
         # LDA
-        self.addOpcode( "LDA",self.addressing_mode_Immediate, 0xA9)
-        self.addOpcode( "LDA",self.addressing_mode_ZeroPage, 0xA5)
-        self.addOpcode( "LDA",self.addressing_mode_ZeroPageX, 0xB5)
-        self.addOpcode( "LDA",self.addressing_mode_Absolute, 0xAD)
-        self.addOpcode( "LDA",self.addressing_mode_AbsoluteX, 0xBD)
-        self.addOpcode( "LDA",self.addressing_mode_AbsoluteY, 0xB9)
-        self.addOpcode( "LDA",self.addressing_mode_Indexed_Indirect_X, 0xA1)
-        self.addOpcode( "LDA",self.addressing_mode_Indirect_Indexed_Y, 0xB1)
+        self.addOpcode( "LDA", self.addressing_mode_Immediate, 0xA9, 2 )
+        self.addOpcode( "LDA", self.addressing_mode_ZeroPage, 0xA5, 3 )
+        self.addOpcode( "LDA", self.addressing_mode_ZeroPageX, 0xB5, 4 )
+        self.addOpcode( "LDA", self.addressing_mode_Absolute, 0xAD, 4 )
+        self.addOpcode( "LDA", self.addressing_mode_AbsoluteX, 0xBD, 4 )
+        self.addOpcode( "LDA", self.addressing_mode_AbsoluteY, 0xB9, 4 )
+        self.addOpcode( "LDA", self.addressing_mode_Indexed_Indirect_X, 0xA1, 6 )
+        self.addOpcode( "LDA", self.addressing_mode_Indirect_Indexed_Y, 0xB1, 5 )
 
         # LDX
-        self.addOpcode( "LDX",self.addressing_mode_Immediate, 0xA2)
-        self.addOpcode( "LDX",self.addressing_mode_ZeroPage, 0xA6)
-        self.addOpcode( "LDX",self.addressing_mode_ZeroPageY, 0xB6)
-        self.addOpcode( "LDX",self.addressing_mode_Absolute, 0xAE)
-        self.addOpcode( "LDX",self.addressing_mode_AbsoluteY, 0xBE)
+        self.addOpcode( "LDX", self.addressing_mode_Immediate, 0xA2, 2 )
+        self.addOpcode( "LDX", self.addressing_mode_ZeroPage, 0xA6, 3 )
+        self.addOpcode( "LDX", self.addressing_mode_ZeroPageY, 0xB6, 4 )
+        self.addOpcode( "LDX", self.addressing_mode_Absolute, 0xAE, 4 )
+        self.addOpcode( "LDX", self.addressing_mode_AbsoluteY, 0xBE, 4 )
 
         # LDY
-        self.addOpcode( "LDY",self.addressing_mode_Immediate, 0xA0)
-        self.addOpcode( "LDY",self.addressing_mode_ZeroPage, 0xA4)
-        self.addOpcode( "LDY",self.addressing_mode_ZeroPageX, 0xB4)
-        self.addOpcode( "LDY",self.addressing_mode_Absolute, 0xAC)
-        self.addOpcode( "LDY",self.addressing_mode_AbsoluteX, 0xBC)
+        self.addOpcode( "LDY", self.addressing_mode_Immediate, 0xA0, 2 )
+        self.addOpcode( "LDY", self.addressing_mode_ZeroPage, 0xA4, 3 )
+        self.addOpcode( "LDY", self.addressing_mode_ZeroPageX, 0xB4, 4 )
+        self.addOpcode( "LDY", self.addressing_mode_Absolute, 0xAC, 4 )
+        self.addOpcode( "LDY", self.addressing_mode_AbsoluteX, 0xBC, 4 )
 
         # LSR
-        self.addOpcode( "LSR",self.addressing_mode_Accumulator, 0x4A)
-        self.addOpcode( "LSR",self.addressing_mode_ZeroPage, 0x46)
-        self.addOpcode( "LSR",self.addressing_mode_ZeroPageX, 0x56)
-        self.addOpcode( "LSR",self.addressing_mode_Absolute, 0x4E)
-        self.addOpcode( "LSR",self.addressing_mode_AbsoluteX, 0x5E)
+        self.addOpcode( "LSR", self.addressing_mode_Accumulator, 0x4A, 2 )
+        self.addOpcode( "LSR", self.addressing_mode_ZeroPage, 0x46, 5 )
+        self.addOpcode( "LSR", self.addressing_mode_ZeroPageX, 0x56, 6 )
+        self.addOpcode( "LSR", self.addressing_mode_Absolute, 0x4E, 6 )
+        self.addOpcode( "LSR", self.addressing_mode_AbsoluteX, 0x5E, 7 )
 
         # NOP
-        self.addOpcode( "NOP",self.addressing_mode_Implied, 0xEA)
+        self.addOpcode( "NOP", self.addressing_mode_Implied, 0xEA, 2 )
 
         # ORA
-        self.addOpcode( "ORA",self.addressing_mode_Immediate, 0x09)
-        self.addOpcode( "ORA",self.addressing_mode_ZeroPage, 0x05)
-        self.addOpcode( "ORA",self.addressing_mode_ZeroPageX, 0x15)
-        self.addOpcode( "ORA",self.addressing_mode_Absolute, 0x0D)
-        self.addOpcode( "ORA",self.addressing_mode_AbsoluteX, 0x10)
-        self.addOpcode( "ORA",self.addressing_mode_AbsoluteY, 0x19)
-        self.addOpcode( "ORA",self.addressing_mode_Indexed_Indirect_X, 0x01)
-        self.addOpcode( "ORA",self.addressing_mode_Indirect_Indexed_Y, 0x11)
+        self.addOpcode( "ORA", self.addressing_mode_Immediate, 0x09, 2 )
+        self.addOpcode( "ORA", self.addressing_mode_ZeroPage, 0x05, 3 )
+        self.addOpcode( "ORA", self.addressing_mode_ZeroPageX, 0x15, 4 )
+        self.addOpcode( "ORA", self.addressing_mode_Absolute, 0x0D, 4 )
+        self.addOpcode( "ORA", self.addressing_mode_AbsoluteX, 0x1D, 4 )
+        self.addOpcode( "ORA", self.addressing_mode_AbsoluteY, 0x19, 4 )
+        self.addOpcode( "ORA", self.addressing_mode_Indexed_Indirect_X, 0x01, 6 )
+        self.addOpcode( "ORA", self.addressing_mode_Indirect_Indexed_Y, 0x11, 5 )
 
         # Push/Pop
-        self.addOpcode( "PHA",self.addressing_mode_Implied, 0x48)
-        self.addOpcode( "PHP",self.addressing_mode_Implied, 0x08)
-        self.addOpcode( "PLA",self.addressing_mode_Implied, 0x68)
-        self.addOpcode( "PLP",self.addressing_mode_Implied, 0x28)
+        self.addOpcode( "PHA", self.addressing_mode_Implied, 0x48, 3 )
+        self.addOpcode( "PHP", self.addressing_mode_Implied, 0x08, 3 )
+        self.addOpcode( "PLA", self.addressing_mode_Implied, 0x68, 4 )
+        self.addOpcode( "PLP", self.addressing_mode_Implied, 0x28, 4 )
 
         # ROL
-        self.addOpcode( "ROL",self.addressing_mode_Accumulator, 0x2A)
-        self.addOpcode( "ROL",self.addressing_mode_ZeroPage, 0x26)
-        self.addOpcode( "ROL",self.addressing_mode_ZeroPageX, 0x36)
-        self.addOpcode( "ROL",self.addressing_mode_Absolute, 0x2E)
-        self.addOpcode( "ROL",self.addressing_mode_AbsoluteX, 0x3E)
+        self.addOpcode( "ROL", self.addressing_mode_Accumulator, 0x2A, 2 )
+        self.addOpcode( "ROL", self.addressing_mode_ZeroPage, 0x26, 5 )
+        self.addOpcode( "ROL", self.addressing_mode_ZeroPageX, 0x36, 6 )
+        self.addOpcode( "ROL", self.addressing_mode_Absolute, 0x2E, 6 )
+        self.addOpcode( "ROL", self.addressing_mode_AbsoluteX, 0x3E, 7 )
 
         # ROR
-        self.addOpcode( "ROR",self.addressing_mode_Accumulator, 0x6A)
-        self.addOpcode( "ROR",self.addressing_mode_ZeroPage, 0x66)
-        self.addOpcode( "ROR",self.addressing_mode_ZeroPageX, 0x76)
-        self.addOpcode( "ROR",self.addressing_mode_Absolute, 0x6E)
-        self.addOpcode( "ROR",self.addressing_mode_AbsoluteX, 0x7E)
+        self.addOpcode( "ROR", self.addressing_mode_Accumulator, 0x6A, 2 )
+        self.addOpcode( "ROR", self.addressing_mode_ZeroPage, 0x66, 5 )
+        self.addOpcode( "ROR", self.addressing_mode_ZeroPageX, 0x76, 6 )
+        self.addOpcode( "ROR", self.addressing_mode_Absolute, 0x6E, 6 )
+        self.addOpcode( "ROR", self.addressing_mode_AbsoluteX, 0x7E, 7 )
 
         # RTI
-        self.addOpcode( "RTI",self.addressing_mode_Implied, 0x4D)
+        self.addOpcode( "RTI", self.addressing_mode_Implied, 0x40, 6 )
 
         # RTS
-        self.addOpcode( "RTS",self.addressing_mode_Implied, 0x60)
+        self.addOpcode( "RTS", self.addressing_mode_Implied, 0x60, 6 )
 
         # SBC
-        self.addOpcode( "SBC",self.addressing_mode_Immediate, 0xE9)
-        self.addOpcode( "SBC",self.addressing_mode_ZeroPage, 0xE5)
-        self.addOpcode( "SBC",self.addressing_mode_ZeroPageX, 0xF5)
-        self.addOpcode( "SBC",self.addressing_mode_Absolute, 0xED)
-        self.addOpcode( "SBC",self.addressing_mode_AbsoluteX, 0xFD)
-        self.addOpcode( "SBC",self.addressing_mode_AbsoluteY, 0xF9)
-        self.addOpcode( "SBC",self.addressing_mode_Indexed_Indirect_X, 0xE1)
-        self.addOpcode( "SBC",self.addressing_mode_Indirect_Indexed_Y, 0xF1)
+        self.addOpcode( "SBC", self.addressing_mode_Immediate, 0xE9, 2 )
+        self.addOpcode( "SBC", self.addressing_mode_ZeroPage, 0xE5, 3 )
+        self.addOpcode( "SBC", self.addressing_mode_ZeroPageX, 0xF5, 4 )
+        self.addOpcode( "SBC", self.addressing_mode_Absolute, 0xED, 4 )
+        self.addOpcode( "SBC", self.addressing_mode_AbsoluteX, 0xFD, 4 )
+        self.addOpcode( "SBC", self.addressing_mode_AbsoluteY, 0xF9, 4 )
+        self.addOpcode( "SBC", self.addressing_mode_Indexed_Indirect_X, 0xE1, 6 )
+        self.addOpcode( "SBC", self.addressing_mode_Indirect_Indexed_Y, 0xF1, 5 )
 
         # SEC
-        self.addOpcode( "SEC",self.addressing_mode_Implied, 0x38)
+        self.addOpcode( "SEC", self.addressing_mode_Implied, 0x38, 2 )
 
         # SED
-        self.addOpcode( "SED",self.addressing_mode_Implied, 0xF8)
+        self.addOpcode( "SED", self.addressing_mode_Implied, 0xF8, 2 )
 
         # SEI
-        self.addOpcode( "SEI",self.addressing_mode_Implied, 0x78)
+        self.addOpcode( "SEI", self.addressing_mode_Implied, 0x78, 2 )
 
         # STA
-        self.addOpcode( "STA",self.addressing_mode_ZeroPage, 0x85)
-        self.addOpcode( "STA",self.addressing_mode_ZeroPageX, 0x95)
-        self.addOpcode( "STA",self.addressing_mode_Absolute, 0x8D)
-        self.addOpcode( "STA",self.addressing_mode_AbsoluteX, 0x9D)
-        self.addOpcode( "STA",self.addressing_mode_AbsoluteY, 0x99)
-        self.addOpcode( "STA",self.addressing_mode_Indexed_Indirect_X, 0x81)
-        self.addOpcode( "STA",self.addressing_mode_Indirect_Indexed_Y, 0x91)
+        self.addOpcode( "STA", self.addressing_mode_ZeroPage, 0x85, 3 )
+        self.addOpcode( "STA", self.addressing_mode_ZeroPageX, 0x95, 4 )
+        self.addOpcode( "STA", self.addressing_mode_Absolute, 0x8D, 4 )
+        self.addOpcode( "STA", self.addressing_mode_AbsoluteX, 0x9D, 5 )
+        self.addOpcode( "STA", self.addressing_mode_AbsoluteY, 0x99, 5 )
+        self.addOpcode( "STA", self.addressing_mode_Indexed_Indirect_X, 0x81, 6 )
+        self.addOpcode( "STA", self.addressing_mode_Indirect_Indexed_Y, 0x91, 6 )
 
         # STX
-        self.addOpcode( "STX",self.addressing_mode_ZeroPage, 0x86)
-        self.addOpcode( "STX",self.addressing_mode_ZeroPageY, 0x96)
-        self.addOpcode( "STX",self.addressing_mode_Absolute, 0x8E)
+        self.addOpcode( "STX", self.addressing_mode_ZeroPage, 0x86, 3 )
+        self.addOpcode( "STX", self.addressing_mode_ZeroPageY, 0x96, 4 )
+        self.addOpcode( "STX", self.addressing_mode_Absolute, 0x8E, 4 )
 
         # STY
-        self.addOpcode( "STY",self.addressing_mode_ZeroPage, 0x84)
-        self.addOpcode( "STY",self.addressing_mode_ZeroPageX, 0x94)
-        self.addOpcode( "STY",self.addressing_mode_Absolute, 0x8C)
+        self.addOpcode( "STY", self.addressing_mode_ZeroPage, 0x84, 3 )
+        self.addOpcode( "STY", self.addressing_mode_ZeroPageX, 0x94, 4 )
+        self.addOpcode( "STY", self.addressing_mode_Absolute, 0x8C, 4 )
 
         # Transfer
-        self.addOpcode( "TAX",self.addressing_mode_Implied, 0xAA)
-        self.addOpcode( "TAY",self.addressing_mode_Implied, 0xA8)
-        self.addOpcode( "TSX",self.addressing_mode_Implied, 0xBA)
-        self.addOpcode( "TXA",self.addressing_mode_Implied, 0x8A)
-        self.addOpcode( "TXS",self.addressing_mode_Implied, 0x9A)
-        self.addOpcode( "TYA",self.addressing_mode_Implied, 0x98)
\ No newline at end of file
+        self.addOpcode( "TAX", self.addressing_mode_Implied, 0xAA, 2 )
+        self.addOpcode( "TAY", self.addressing_mode_Implied, 0xA8, 2 )
+        self.addOpcode( "TSX", self.addressing_mode_Implied, 0xBA, 2 )
+        self.addOpcode( "TXA", self.addressing_mode_Implied, 0x8A, 2 )
+        self.addOpcode( "TXS", self.addressing_mode_Implied, 0x9A, 2 )
+        self.addOpcode( "TYA", self.addressing_mode_Implied, 0x98, 2 )
\ No newline at end of file
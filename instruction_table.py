@@ -0,0 +1,476 @@
+# Generated by helpers/generate_instruction_table.py from InstructionSet.loadInstructions(), do not edit
+
+# operator -> description
+DESCRIPTIONS = {
+    'ADC': 'Add Memory to Accumulator with Carry',
+    'AND': "'AND' Memory with Accumulator",
+    'ASL': 'Shift Left One Bit (Memory or Accumulator)',
+    'BCC': 'Branch on Carry Clear',
+    'BCS': 'Branch on Carry Set',
+    'BEQ': 'Branch on Result Zero',
+    'BIT': 'Test Bits in Memory with Accumulator',
+    'BMI': 'Branch on Result Minus',
+    'BNE': 'Branch on Result not Zero',
+    'BPL': 'Branch on Result Plus',
+    'BRK': 'Force Break',
+    'BVC': 'Branch on Overflow Clear',
+    'BVS': 'Branch on Overflow Set',
+    'CLC': 'Clear Carry Flag',
+    'CLD': 'Clear Decimal Mode',
+    'CLI': 'Clear interrupt Disable Bit',
+    'CLV': 'Clear Overflow Flag',
+    'CMP': 'Compare Memory and Accumulator',
+    'CPX': 'Compare Memory and Index X',
+    'CPY': 'Compare Memory and Index Y',
+    'DEC': 'Decrement Memory by One',
+    'DEX': 'Decrement Index X by One',
+    'DEY': 'Decrement Index Y by One',
+    'EOR': "'Exclusive-Or' Memory with Accumulator",
+    'INC': 'Increment Memory by One',
+    'INX': 'Increment Index X by One',
+    'INY': 'Increment Index Y by One',
+    'JMP': 'Jump to New Location',
+    'JSR': 'Jump to New Location Saving Return Address',
+    'LDA': 'Load Accumulator with Memory',
+    'LDX': 'Load Index X with Memory',
+    'LDY': 'Load Index Y with Memory',
+    'LSR': 'Shift Right One Bit (Memory or Accumulator) ',
+    'NOP': 'No Operation',
+    'ORA': "'OR' Memory with Accumulator",
+    'PHA': 'Push Accumulator on Stack',
+    'PHP': 'Push Processor Status on Stack',
+    'PLA': 'Pull Accumulator from Stack',
+    'PLP': 'Pull Processor Status from Stack',
+    'ROL': 'Rotate One Bit Left (Memory or Accumulator)',
+    'ROR': 'Rotate One Bit Right (Memory or Accumulator)',
+    'RTI': 'Return from Interrupt',
+    'RTS': 'Return from Subroutine',
+    'SBC': 'Subtract Memory from Accumulator with Borrow',
+    'SEC': 'Set Carry Flag',
+    'SED': 'Set Decimal Mode',
+    'SEI': 'Set Interrupt Disable Status',
+    'STA': 'Store Accumulator in Memory ',
+    'STX': 'Store Index X in Memory',
+    'STY': 'Store Index Y in Memory',
+    'TAX': 'Transfer Accumulator to Index X',
+    'TAY': 'Transfer Accumulator to Index Y',
+    'TSX': 'Transfer Stack Pointer to Index X',
+    'TXA': 'Transfer Index X to Accumulator',
+    'TXS': 'Transfer Index X to Stack Pointer',
+    'TYA': 'Transfer Index Y to Accumulator',
+}
+
+# (operator, addressing mode, opcode, base cycles)
+OPCODES = (
+    ( 'ADC', 1, 0x69, 2 ),
+    ( 'ADC', 8, 0x65, 3 ),
+    ( 'ADC', 6, 0x75, 4 ),
+    ( 'ADC', 4, 0x6D, 4 ),
+    ( 'ADC', 2, 0x7D, 4 ),
+    ( 'ADC', 3, 0x79, 4 ),
+    ( 'ADC', 11, 0x61, 6 ),
+    ( 'ADC', 9, 0x71, 5 ),
+    ( 'AND', 1, 0x29, 2 ),
+    ( 'AND', 8, 0x25, 3 ),
+    ( 'AND', 6, 0x35, 4 ),
+    ( 'AND', 4, 0x2D, 4 ),
+    ( 'AND', 2, 0x3D, 4 ),
+    ( 'AND', 3, 0x39, 4 ),
+    ( 'AND', 11, 0x21, 6 ),
+    ( 'AND', 9, 0x31, 5 ),
+    ( 'ASL', 5, 0x0A, 2 ),
+    ( 'ASL', 8, 0x06, 5 ),
+    ( 'ASL', 6, 0x16, 6 ),
+    ( 'ASL', 4, 0x0E, 6 ),
+    ( 'ASL', 2, 0x1E, 7 ),
+    ( 'BCC', 12, 0x90, 2 ),
+    ( 'BCS', 12, 0xB0, 2 ),
+    ( 'BEQ', 12, 0xF0, 2 ),
+    ( 'BIT', 8, 0x24, 3 ),
+    ( 'BIT', 4, 0x2C, 4 ),
+    ( 'BMI', 12, 0x30, 2 ),
+    ( 'BNE', 12, 0xD0, 2 ),
+    ( 'BPL', 12, 0x10, 2 ),
+    ( 'BRK', 0, 0x00, 7 ),
+    ( 'BVC', 12, 0x50, 2 ),
+    ( 'BVS', 12, 0x70, 2 ),
+    ( 'CLC', 0, 0x18, 2 ),
+    ( 'CLD', 0, 0xD8, 2 ),
+    ( 'CLI', 0, 0x58, 2 ),
+    ( 'CLV', 0, 0xB8, 2 ),
+    ( 'CMP', 1, 0xC9, 2 ),
+    ( 'CMP', 8, 0xC5, 3 ),
+    ( 'CMP', 6, 0xD5, 4 ),
+    ( 'CMP', 4, 0xCD, 4 ),
+    ( 'CMP', 2, 0xDD, 4 ),
+    ( 'CMP', 3, 0xD9, 4 ),
+    ( 'CMP', 11, 0xC1, 6 ),
+    ( 'CMP', 9, 0xD1, 5 ),
+    ( 'CPX', 1, 0xE0, 2 ),
+    ( 'CPX', 8, 0xE4, 3 ),
+    ( 'CPX', 4, 0xEC, 4 ),
+    ( 'CPY', 1, 0xC0, 2 ),
+    ( 'CPY', 8, 0xC4, 3 ),
+    ( 'CPY', 4, 0xCC, 4 ),
+    ( 'DEC', 8, 0xC6, 5 ),
+    ( 'DEC', 6, 0xD6, 6 ),
+    ( 'DEC', 4, 0xCE, 6 ),
+    ( 'DEC', 2, 0xDE, 7 ),
+    ( 'DEX', 0, 0xCA, 2 ),
+    ( 'DEY', 0, 0x88, 2 ),
+    ( 'EOR', 1, 0x49, 2 ),
+    ( 'EOR', 8, 0x45, 3 ),
+    ( 'EOR', 6, 0x55, 4 ),
+    ( 'EOR', 4, 0x4D, 4 ),
+    ( 'EOR', 2, 0x5D, 4 ),
+    ( 'EOR', 3, 0x59, 4 ),
+    ( 'EOR', 11, 0x41, 6 ),
+    ( 'EOR', 9, 0x51, 5 ),
+    ( 'INC', 8, 0xE6, 5 ),
+    ( 'INC', 6, 0xF6, 6 ),
+    ( 'INC', 4, 0xEE, 6 ),
+    ( 'INC', 2, 0xFE, 7 ),
+    ( 'INX', 0, 0xE8, 2 ),
+    ( 'INY', 0, 0xC8, 2 ),
+    ( 'JMP', 4, 0x4C, 3 ),
+    ( 'JMP', 10, 0x6C, 5 ),
+    ( 'JSR', 4, 0x20, 6 ),
+    ( 'LDA', 1, 0xA9, 2 ),
+    ( 'LDA', 8, 0xA5, 3 ),
+    ( 'LDA', 6, 0xB5, 4 ),
+    ( 'LDA', 4, 0xAD, 4 ),
+    ( 'LDA', 2, 0xBD, 4 ),
+    ( 'LDA', 3, 0xB9, 4 ),
+    ( 'LDA', 11, 0xA1, 6 ),
+    ( 'LDA', 9, 0xB1, 5 ),
+    ( 'LDX', 1, 0xA2, 2 ),
+    ( 'LDX', 8, 0xA6, 3 ),
+    ( 'LDX', 7, 0xB6, 4 ),
+    ( 'LDX', 4, 0xAE, 4 ),
+    ( 'LDX', 3, 0xBE, 4 ),
+    ( 'LDY', 1, 0xA0, 2 ),
+    ( 'LDY', 8, 0xA4, 3 ),
+    ( 'LDY', 6, 0xB4, 4 ),
+    ( 'LDY', 4, 0xAC, 4 ),
+    ( 'LDY', 2, 0xBC, 4 ),
+    ( 'LSR', 5, 0x4A, 2 ),
+    ( 'LSR', 8, 0x46, 5 ),
+    ( 'LSR', 6, 0x56, 6 ),
+    ( 'LSR', 4, 0x4E, 6 ),
+    ( 'LSR', 2, 0x5E, 7 ),
+    ( 'NOP', 0, 0xEA, 2 ),
+    ( 'ORA', 1, 0x09, 2 ),
+    ( 'ORA', 8, 0x05, 3 ),
+    ( 'ORA', 6, 0x15, 4 ),
+    ( 'ORA', 4, 0x0D, 4 ),
+    ( 'ORA', 2, 0x1D, 4 ),
+    ( 'ORA', 3, 0x19, 4 ),
+    ( 'ORA', 11, 0x01, 6 ),
+    ( 'ORA', 9, 0x11, 5 ),
+    ( 'PHA', 0, 0x48, 3 ),
+    ( 'PHP', 0, 0x08, 3 ),
+    ( 'PLA', 0, 0x68, 4 ),
+    ( 'PLP', 0, 0x28, 4 ),
+    ( 'ROL', 5, 0x2A, 2 ),
+    ( 'ROL', 8, 0x26, 5 ),
+    ( 'ROL', 6, 0x36, 6 ),
+    ( 'ROL', 4, 0x2E, 6 ),
+    ( 'ROL', 2, 0x3E, 7 ),
+    ( 'ROR', 5, 0x6A, 2 ),
+    ( 'ROR', 8, 0x66, 5 ),
+    ( 'ROR', 6, 0x76, 6 ),
+    ( 'ROR', 4, 0x6E, 6 ),
+    ( 'ROR', 2, 0x7E, 7 ),
+    ( 'RTI', 0, 0x40, 6 ),
+    ( 'RTS', 0, 0x60, 6 ),
+    ( 'SBC', 1, 0xE9, 2 ),
+    ( 'SBC', 8, 0xE5, 3 ),
+    ( 'SBC', 6, 0xF5, 4 ),
+    ( 'SBC', 4, 0xED, 4 ),
+    ( 'SBC', 2, 0xFD, 4 ),
+    ( 'SBC', 3, 0xF9, 4 ),
+    ( 'SBC', 11, 0xE1, 6 ),
+    ( 'SBC', 9, 0xF1, 5 ),
+    ( 'SEC', 0, 0x38, 2 ),
+    ( 'SED', 0, 0xF8, 2 ),
+    ( 'SEI', 0, 0x78, 2 ),
+    ( 'STA', 8, 0x85, 3 ),
+    ( 'STA', 6, 0x95, 4 ),
+    ( 'STA', 4, 0x8D, 4 ),
+    ( 'STA', 2, 0x9D, 5 ),
+    ( 'STA', 3, 0x99, 5 ),
+    ( 'STA', 11, 0x81, 6 ),
+    ( 'STA', 9, 0x91, 6 ),
+    ( 'STX', 8, 0x86, 3 ),
+    ( 'STX', 7, 0x96, 4 ),
+    ( 'STX', 4, 0x8E, 4 ),
+    ( 'STY', 8, 0x84, 3 ),
+    ( 'STY', 6, 0x94, 4 ),
+    ( 'STY', 4, 0x8C, 4 ),
+    ( 'TAX', 0, 0xAA, 2 ),
+    ( 'TAY', 0, 0xA8, 2 ),
+    ( 'TSX', 0, 0xBA, 2 ),
+    ( 'TXA', 0, 0x8A, 2 ),
+    ( 'TXS', 0, 0x9A, 2 ),
+    ( 'TYA', 0, 0x98, 2 ),
+)
+
+# opcode -> (operator, addressing mode, length, base cycles)
+DECODE = (
+    ('BRK', 0, 1, 7),
+    ('ORA', 11, 2, 6),
+    None,
+    None,
+    None,
+    ('ORA', 8, 2, 3),
+    ('ASL', 8, 2, 5),
+    None,
+    ('PHP', 0, 1, 3),
+    ('ORA', 1, 2, 2),
+    ('ASL', 5, 1, 2),
+    None,
+    None,
+    ('ORA', 4, 3, 4),
+    ('ASL', 4, 3, 6),
+    None,
+    ('BPL', 12, 2, 2),
+    ('ORA', 9, 2, 5),
+    None,
+    None,
+    None,
+    ('ORA', 6, 2, 4),
+    ('ASL', 6, 2, 6),
+    None,
+    ('CLC', 0, 1, 2),
+    ('ORA', 3, 3, 4),
+    None,
+    None,
+    None,
+    ('ORA', 2, 3, 4),
+    ('ASL', 2, 3, 7),
+    None,
+    ('JSR', 4, 3, 6),
+    ('AND', 11, 2, 6),
+    None,
+    None,
+    ('BIT', 8, 2, 3),
+    ('AND', 8, 2, 3),
+    ('ROL', 8, 2, 5),
+    None,
+    ('PLP', 0, 1, 4),
+    ('AND', 1, 2, 2),
+    ('ROL', 5, 1, 2),
+    None,
+    ('BIT', 4, 3, 4),
+    ('AND', 4, 3, 4),
+    ('ROL', 4, 3, 6),
+    None,
+    ('BMI', 12, 2, 2),
+    ('AND', 9, 2, 5),
+    None,
+    None,
+    None,
+    ('AND', 6, 2, 4),
+    ('ROL', 6, 2, 6),
+    None,
+    ('SEC', 0, 1, 2),
+    ('AND', 3, 3, 4),
+    None,
+    None,
+    None,
+    ('AND', 2, 3, 4),
+    ('ROL', 2, 3, 7),
+    None,
+    ('RTI', 0, 1, 6),
+    ('EOR', 11, 2, 6),
+    None,
+    None,
+    None,
+    ('EOR', 8, 2, 3),
+    ('LSR', 8, 2, 5),
+    None,
+    ('PHA', 0, 1, 3),
+    ('EOR', 1, 2, 2),
+    ('LSR', 5, 1, 2),
+    None,
+    ('JMP', 4, 3, 3),
+    ('EOR', 4, 3, 4),
+    ('LSR', 4, 3, 6),
+    None,
+    ('BVC', 12, 2, 2),
+    ('EOR', 9, 2, 5),
+    None,
+    None,
+    None,
+    ('EOR', 6, 2, 4),
+    ('LSR', 6, 2, 6),
+    None,
+    ('CLI', 0, 1, 2),
+    ('EOR', 3, 3, 4),
+    None,
+    None,
+    None,
+    ('EOR', 2, 3, 4),
+    ('LSR', 2, 3, 7),
+    None,
+    ('RTS', 0, 1, 6),
+    ('ADC', 11, 2, 6),
+    None,
+    None,
+    None,
+    ('ADC', 8, 2, 3),
+    ('ROR', 8, 2, 5),
+    None,
+    ('PLA', 0, 1, 4),
+    ('ADC', 1, 2, 2),
+    ('ROR', 5, 1, 2),
+    None,
+    ('JMP', 10, 3, 5),
+    ('ADC', 4, 3, 4),
+    ('ROR', 4, 3, 6),
+    None,
+    ('BVS', 12, 2, 2),
+    ('ADC', 9, 2, 5),
+    None,
+    None,
+    None,
+    ('ADC', 6, 2, 4),
+    ('ROR', 6, 2, 6),
+    None,
+    ('SEI', 0, 1, 2),
+    ('ADC', 3, 3, 4),
+    None,
+    None,
+    None,
+    ('ADC', 2, 3, 4),
+    ('ROR', 2, 3, 7),
+    None,
+    None,
+    ('STA', 11, 2, 6),
+    None,
+    None,
+    ('STY', 8, 2, 3),
+    ('STA', 8, 2, 3),
+    ('STX', 8, 2, 3),
+    None,
+    ('DEY', 0, 1, 2),
+    None,
+    ('TXA', 0, 1, 2),
+    None,
+    ('STY', 4, 3, 4),
+    ('STA', 4, 3, 4),
+    ('STX', 4, 3, 4),
+    None,
+    ('BCC', 12, 2, 2),
+    ('STA', 9, 2, 6),
+    None,
+    None,
+    ('STY', 6, 2, 4),
+    ('STA', 6, 2, 4),
+    ('STX', 7, 2, 4),
+    None,
+    ('TYA', 0, 1, 2),
+    ('STA', 3, 3, 5),
+    ('TXS', 0, 1, 2),
+    None,
+    None,
+    ('STA', 2, 3, 5),
+    None,
+    None,
+    ('LDY', 1, 2, 2),
+    ('LDA', 11, 2, 6),
+    ('LDX', 1, 2, 2),
+    None,
+    ('LDY', 8, 2, 3),
+    ('LDA', 8, 2, 3),
+    ('LDX', 8, 2, 3),
+    None,
+    ('TAY', 0, 1, 2),
+    ('LDA', 1, 2, 2),
+    ('TAX', 0, 1, 2),
+    None,
+    ('LDY', 4, 3, 4),
+    ('LDA', 4, 3, 4),
+    ('LDX', 4, 3, 4),
+    None,
+    ('BCS', 12, 2, 2),
+    ('LDA', 9, 2, 5),
+    None,
+    None,
+    ('LDY', 6, 2, 4),
+    ('LDA', 6, 2, 4),
+    ('LDX', 7, 2, 4),
+    None,
+    ('CLV', 0, 1, 2),
+    ('LDA', 3, 3, 4),
+    ('TSX', 0, 1, 2),
+    None,
+    ('LDY', 2, 3, 4),
+    ('LDA', 2, 3, 4),
+    ('LDX', 3, 3, 4),
+    None,
+    ('CPY', 1, 2, 2),
+    ('CMP', 11, 2, 6),
+    None,
+    None,
+    ('CPY', 8, 2, 3),
+    ('CMP', 8, 2, 3),
+    ('DEC', 8, 2, 5),
+    None,
+    ('INY', 0, 1, 2),
+    ('CMP', 1, 2, 2),
+    ('DEX', 0, 1, 2),
+    None,
+    ('CPY', 4, 3, 4),
+    ('CMP', 4, 3, 4),
+    ('DEC', 4, 3, 6),
+    None,
+    ('BNE', 12, 2, 2),
+    ('CMP', 9, 2, 5),
+    None,
+    None,
+    None,
+    ('CMP', 6, 2, 4),
+    ('DEC', 6, 2, 6),
+    None,
+    ('CLD', 0, 1, 2),
+    ('CMP', 3, 3, 4),
+    None,
+    None,
+    None,
+    ('CMP', 2, 3, 4),
+    ('DEC', 2, 3, 7),
+    None,
+    ('CPX', 1, 2, 2),
+    ('SBC', 11, 2, 6),
+    None,
+    None,
+    ('CPX', 8, 2, 3),
+    ('SBC', 8, 2, 3),
+    ('INC', 8, 2, 5),
+    None,
+    ('INX', 0, 1, 2),
+    ('SBC', 1, 2, 2),
+    ('NOP', 0, 1, 2),
+    None,
+    ('CPX', 4, 3, 4),
+    ('SBC', 4, 3, 4),
+    ('INC', 4, 3, 6),
+    None,
+    ('BEQ', 12, 2, 2),
+    ('SBC', 9, 2, 5),
+    None,
+    None,
+    None,
+    ('SBC', 6, 2, 4),
+    ('INC', 6, 2, 6),
+    None,
+    ('SED', 0, 1, 2),
+    ('SBC', 3, 3, 4),
+    None,
+    None,
+    None,
+    ('SBC', 2, 3, 4),
+    ('INC', 2, 3, 7),
+    None,
+)
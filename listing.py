@@ -0,0 +1,158 @@
+from assembly_ir import NodeKind
+from instruction_set import InstructionSet
+
+# Listings are formatted from the assembled IR only when one is wanted, the passes themselves build no text.
+#
+#   $C000  A9 65                         LDA #$65
+#   $C002  D0 FC                         BNE $fc
+#
+# Label and variable operands are listed as they resolved, a branch as its offset and < > as the byte
+# taken, so the text can be checked against the machine code.
+#
+# Given the instruction set, rows also show the size and base cycles of every instruction, marked as in
+# the usual opcode tables, and the listing ends with the totals of every block of code between labels
+#
+#   $C000      3  4*  BD 00 D0                      LDA $d000,X      * +1 when crossing a page
+#   $C003      2  2** D0 FB                         BNE $fb         ** +1 when taken, +1 more to another page
+
+PENALTY_MARKS = {
+    InstructionSet.cycle_penalty_None: "",
+    InstructionSet.cycle_penalty_Page: "*",
+    InstructionSet.cycle_penalty_Branch: "**"
+}
+
+
+# Nodes padding up to an alignment or the next page, listed when they padded anything
+PADDING_KINDS = ( NodeKind.ALIGN, NodeKind.KEEP_IN_PAGE )
+
+
+# Base cycles of an instruction node and which extra cycles it can take
+def get_cycles( node, instructions ):
+    operator = node.instruction["operator"]
+    return instructions.get_cycles( operator, node.addressing_mode ), instructions.get_cycle_penalty( operator, node.addressing_mode )
+
+
+# Text of an instruction as assembled, i.e. 'BNE $fc' for 'BNE loop'
+def format_instruction( node ):
+
+    if ( node.symbol == None ):
+        return node.text
+
+    if ( node.addressing_mode == InstructionSet.addressing_mode_Relative ):
+        operand = '${:02x}'.format( node.operand )
+    elif ( node.addressing_mode == InstructionSet.addressing_mode_Immediate ):
+        operand = '#${:02x}'.format( node.operand )
+    elif ( node.size == 2 ):
+        operand = '${:02x}'.format( node.operand )
+    else:
+        operand = '${:04x}'.format( node.operand )
+
+    if ( node.index != None ):
+        operand = operand + "," + node.index
+
+    return node.text.partition(" ")[0] + " " + operand
+
+
+# Listing row of an instruction, data or padding node, with its size and cycles when given the instruction set
+def format_row( node, instructions = None ):
+
+    if ( node.kind in PADDING_KINDS ):
+        machine_code = '{:02X} x {}'.format( node.data[0], node.size )
+    elif ( node.kind == NodeKind.DATA ):
+        machine_code = " ".join( '{:02X}'.format(b) for b in node.data )
+    elif ( node.size == 1 ):
+        machine_code = '{:02X}       '.format( node.opcode )
+    elif ( node.size == 2 ):
+        machine_code = '{:02X} {:02X}    '.format( node.opcode, node.operand & 0xFF )
+    else:
+        machine_code = '{:02X} {:02X} {:02X} '.format( node.opcode, node.operand & 0xFF, node.operand >> 8 )
+
+    row = '${:04X}  '.format( node.address )
+
+    if ( instructions != None ):
+        cycles = ""
+        if ( node.kind == NodeKind.INSTRUCTION ):
+            base, penalty = get_cycles( node, instructions )
+            cycles = str(base) + PENALTY_MARKS[penalty]
+        row = row + '{:>5}  {:<4}'.format( node.size, cycles )
+
+    text = format_instruction( node ) if node.kind == NodeKind.INSTRUCTION else node.text
+
+    # Long data rows push the text along rather than running into it
+    return row + machine_code.ljust(29) + " " + text + " "
+
+
+# ( label, address, bytes, base cycles, instructions that can take a page crossing cycle, branches ) of every
+# block of code, blocks start at each label. Code before the first label is a block without a label, blocks
+# that emit nothing are left out.
+def block_totals( ir, instructions ):
+
+    blocks = []
+    block = [ None, None, 0, 0, 0, 0 ]
+
+    for node in ir:
+        if ( node.kind == NodeKind.LABEL ):
+            if ( block[2] > 0 ):
+                blocks.append( tuple(block) )
+            block = [ node.symbol, None, 0, 0, 0, 0 ]
+
+        elif ( node.kind == NodeKind.INSTRUCTION or node.kind == NodeKind.DATA or ( node.kind in PADDING_KINDS and node.size > 0 ) ):
+            if ( block[1] == None ):
+                block[1] = node.address
+            block[2] = block[2] + node.size
+
+            if ( node.kind == NodeKind.INSTRUCTION ):
+                base, penalty = get_cycles( node, instructions )
+                block[3] = block[3] + base
+                if ( penalty == InstructionSet.cycle_penalty_Page ):
+                    block[4] = block[4] + 1
+                elif ( penalty == InstructionSet.cycle_penalty_Branch ):
+                    block[5] = block[5] + 1
+
+    if ( block[2] > 0 ):
+        blocks.append( tuple(block) )
+
+    return blocks
+
+
+# Rows of the per label totals, cycles are those of running each instruction once without any extra cycles
+def format_totals( blocks ):
+    yield ";"
+    yield "; Totals per label: bytes, base cycles, instructions that can take a page crossing cycle (*) and branches (**)"
+
+    for label, address, size, cycles, page, branches in blocks:
+        yield '; ${:04X}  {:<24}{:>6} bytes{:>8} cycles{:>5} *{:>5} **'.format( address, label or "", size, cycles, page, branches )
+
+
+# Rows of every node that emitted bytes, in address order. Given the instruction set the rows show
+# the size and cycles of instructions and the totals per label follow.
+def listing_rows( ir, instructions = None ):
+    for node in ir:
+        if ( node.kind == NodeKind.INSTRUCTION or node.kind == NodeKind.DATA or ( node.kind in PADDING_KINDS and node.size > 0 ) ):
+            yield format_row( node, instructions )
+
+    if ( instructions != None ):
+        yield from format_totals( block_totals( ir, instructions ) )
+
+
+# Streams listing rows to a file through a large write buffer
+class ListingWriter:
+
+    def __init__( self, filename, buffer_size = 64 * 1024 ):
+        self._file = open( filename, "w", buffering=buffer_size )
+        self.rows = 0
+
+    def write_rows( self, rows ):
+        for row in rows:
+            self._file.write( row )
+            self._file.write( "\n" )
+            self.rows = self.rows + 1
+
+    def close( self ):
+        self._file.close()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.close()
@@ -1,3 +1,5 @@
+import sys
+
 # Modes
 MODE_PRESCAN = 0
 MODE_ASSEMBLE = 1
@@ -9,7 +11,90 @@ LOG_WARN = 1
 LOG_INFO = 2
 LOG_DIAGNOSTIC = 3
 
-def log( level, msg ):
-    ind = [ "[!] ", "[?] ", "[+] ", "[@] " ]
-    if ( level <= LOG_LEVEL ):
-        print ( ind[level] + msg )
\ No newline at end of file
+INDICATORS = [ "[!] ", "[?] ", "[+] ", "[@] " ]
+
+
+# Writes messages to a stream, stdout unless told otherwise
+class StreamSink:
+
+    def __init__( self, stream = None ):
+        self._stream = stream
+
+    def __call__( self, level, msg ):
+        stream = self._stream
+        if ( stream == None ):
+            # Looked up on every call so a redirected stdout is honoured
+            stream = sys.stdout
+        stream.write( INDICATORS[level] + msg + "\n" )
+
+    def close( self ):
+        pass
+
+
+# Streams messages to a file, line buffered so a trace survives a crash
+class FileSink( StreamSink ):
+
+    def __init__( self, filename, mode = "w" ):
+        StreamSink.__init__( self, open( filename, mode, buffering=1 ) )
+
+    def close( self ):
+        self._stream.close()
+
+
+# Forwards messages to a logger of the standard logging module
+class LoggingSink:
+
+    def __init__( self, name = "retroasm" ):
+        import logging
+
+        self._logger = logging.getLogger( name )
+        self._levels = [ logging.ERROR, logging.WARNING, logging.INFO, logging.DEBUG ]
+
+    def __call__( self, level, msg ):
+        self._logger.log( self._levels[level], msg )
+
+    def close( self ):
+        pass
+
+
+# ( sink, highest level it takes or None for everything LOG_LEVEL lets through )
+_sinks = [ ( StreamSink(), None ) ]
+
+
+# Send messages to this sink as well, up to level when given
+def add_sink( sink, level = None ):
+    _sinks.append( ( sink, level ) )
+
+
+# Stop sending messages to a sink, closing it
+def remove_sink( sink ):
+    global _sinks
+    _sinks = [ entry for entry in _sinks if entry[0] is not sink ]
+    sink.close()
+
+
+# Send messages to this sink only
+def set_sink( sink, level = None ):
+    global _sinks
+    for entry in _sinks:
+        if ( entry[0] is not sink ):
+            entry[0].close()
+    _sinks = [ ( sink, level ) ]
+
+
+# Whether messages of a level are logged, check this before building an expensive message
+def enabled( level ):
+    return level <= LOG_LEVEL
+
+
+# Log a message, any args are %-formatted into it only if the level is enabled
+def log( level, msg, *args ):
+    if ( level > LOG_LEVEL ):
+        return
+
+    if ( args ):
+        msg = msg % args
+
+    for sink, sink_level in _sinks:
+        if ( sink_level == None or level <= sink_level ):
+            sink( level, msg )
@@ -0,0 +1,69 @@
+import loggy
+
+# The 64KB address space as one preallocated buffer. The assembler writes straight into it through a
+# memoryview and records every contiguous range it wrote as a segment, the output is then cut out of
+# the buffer without copying. Segments overlapping earlier ones are reported, the later write wins.
+class MemoryImage:
+
+    SIZE = 0x10000
+
+    def __init__( self ):
+        self._buffer = bytearray( self.SIZE )
+        self.memory = memoryview( self._buffer )
+
+        # ( start, end ) of every segment in the order they were written, end is exclusive
+        self.segments = []
+
+        # ( start, end ) of every range written more than once
+        self.overlaps = []
+
+
+    # Record that start up to end has been written
+    def add_segment( self, start, end ):
+
+        if ( end <= start ):
+            return
+
+        for other_start, other_end in self.segments:
+            overlap_start = max( start, other_start )
+            overlap_end = min( end, other_end )
+
+            if ( overlap_start < overlap_end ):
+                self.overlaps.append( ( overlap_start, overlap_end ) )
+                loggy.log( loggy.LOG_WARN, "Segment $%04X-$%04X overwrites $%04X-$%04X of segment $%04X-$%04X",
+                            start, end - 1, overlap_start, overlap_end - 1, other_start, other_end - 1 )
+
+        self.segments.append( ( start, end ) )
+
+
+    # Lowest and highest (exclusive) address written, None when nothing was
+    def get_range( self ):
+        if ( len(self.segments) == 0 ):
+            return None
+        return ( min( segment[0] for segment in self.segments ), max( segment[1] for segment in self.segments ) )
+
+
+    # Every segment in address order as ( start, memoryview of its bytes )
+    def get_segments( self ):
+        return [ ( start, self.memory[start:end] ) for start, end in sorted( self.segments ) ]
+
+
+    # Everything from the lowest to the highest address written, gaps between segments are zero
+    def get_data( self ):
+        written = self.get_range()
+        if ( written == None ):
+            return self.memory[0:0]
+        return self.memory[written[0]:written[1]]
+
+
+    # The whole image as a single PRG, loading at the lowest address written or at address when nothing was
+    def get_prg( self, address ):
+        written = self.get_range()
+        if ( written != None ):
+            address = written[0]
+        return prg_header( address ) + self.get_data()
+
+
+# Two byte little endian load address starting every PRG
+def prg_header( address ):
+    return bytearray( address.to_bytes(2, byteorder='little') )
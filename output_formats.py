@@ -0,0 +1,136 @@
+import os
+
+import memory_image
+
+# Containers the assembled programs can be written in. Every writer takes a list of entries,
+# ( name, load address, data ), where data is any buffer, e.g. a memoryview of the memory image.
+# The container is put together as a list of buffers around the data, without copying it, and
+# written with a single system call.
+#
+#   prg - one file per entry, the two byte load address followed by the data
+#   raw - one file per entry, just the data
+#   t64 - a single tape archive holding every entry
+
+
+# Most buffers a single writev() call takes
+IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr( os, "sysconf" ) and "SC_IOV_MAX" in os.sysconf_names else 1024
+
+
+# Write buffers to a file in one writev() call where the platform has it, returns the bytes written
+def write_buffers( filename, buffers ):
+
+    descriptor = os.open( filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666 )
+
+    try:
+        if ( hasattr( os, "writev" ) ):
+            views = [ memoryview(buffer).cast("B") for buffer in buffers if len(buffer) > 0 ]
+            while ( len(views) > 0 ):
+                written = os.writev( descriptor, views[:IOV_MAX] )
+
+                # Partial writes are allowed, carry on from where it stopped
+                while ( len(views) > 0 and written >= len(views[0]) ):
+                    written = written - len(views[0])
+                    views.pop(0)
+                if ( written > 0 ):
+                    views[0] = views[0][written:]
+        else:
+            data = memoryview( b"".join( buffers ) )
+            while ( len(data) > 0 ):
+                data = data[os.write( descriptor, data ):]
+    finally:
+        os.close( descriptor )
+
+    return sum( len(buffer) for buffer in buffers )
+
+
+# Name of the file holding an entry, split entries are told apart by address
+def get_entry_filename( filename, address, split ):
+    if ( not split ):
+        return filename
+    root, extension = os.path.splitext( filename )
+    return root + "_" + '{:04x}'.format(address) + extension
+
+
+class PrgWriter:
+
+    EXTENSION = ""
+
+    # Returns ( filename, bytes written ) of every file written, several entries or split go in a file each
+    def write( self, filename, entries, split = False ):
+        written = []
+        for name, address, data in entries:
+            entry_filename = get_entry_filename( filename, address, split or len(entries) > 1 )
+            written.append( ( entry_filename, write_buffers( entry_filename, [ memory_image.prg_header( address ), data ] ) ) )
+        return written
+
+
+class RawWriter:
+
+    EXTENSION = ".bin"
+
+    def write( self, filename, entries, split = False ):
+        written = []
+        for name, address, data in entries:
+            entry_filename = get_entry_filename( filename, address, split or len(entries) > 1 )
+            written.append( ( entry_filename, write_buffers( entry_filename, [ data ] ) ) )
+        return written
+
+
+# T64 tape archive: a 64 byte header, a 32 byte directory entry per file and then the data of every file
+class T64Writer:
+
+    EXTENSION = ".t64"
+
+    SIGNATURE = b"C64S tape image file"
+    VERSION = 0x0101
+
+    # C64 file type of a PRG in the directory
+    FILE_TYPE_PRG = 0x82
+
+    # Every entry goes in the one archive, split or not
+    def write( self, filename, entries, split = False, tape_name = None ):
+
+        if ( tape_name == None ):
+            tape_name = os.path.splitext( os.path.basename( filename ) )[0]
+
+        header = bytearray( self.SIGNATURE.ljust( 32, b"\0" ) )
+        header += self.VERSION.to_bytes( 2, byteorder='little' )
+        header += len(entries).to_bytes( 2, byteorder='little' )
+        header += len(entries).to_bytes( 2, byteorder='little' )
+        header += bytes(2)
+        header += to_tape_name( tape_name, 24 )
+
+        offset = len(header) + 32 * len(entries)
+
+        for name, address, data in entries:
+            header += bytes([ 1, self.FILE_TYPE_PRG ])
+            header += address.to_bytes( 2, byteorder='little' )
+            header += ( ( address + len(data) ) & 0xFFFF ).to_bytes( 2, byteorder='little' )
+            header += bytes(2)
+            header += offset.to_bytes( 4, byteorder='little' )
+            header += bytes(4)
+            header += to_tape_name( name, 16 )
+            offset = offset + len(data)
+
+        return [ ( filename, write_buffers( filename, [ header ] + [ data for name, address, data in entries ] ) ) ]
+
+
+# Upper case name padded with spaces, as tape directories hold them
+def to_tape_name( name, length ):
+    return name.upper().encode( "ascii", "replace" )[:length].ljust( length, b" " )
+
+
+# Output format name -> writer, register_format() adds more
+FORMATS = {
+    "prg": PrgWriter(),
+    "raw": RawWriter(),
+    "t64": T64Writer()
+}
+
+
+def register_format( name, writer ):
+    FORMATS[name] = writer
+
+
+def get_writer( name ):
+    return FORMATS.get( name )
@@ -1,45 +1,299 @@
 import assembler
+import assembly_cache
+import listing
+import memory_image
+import output_formats
+import d64
 import re
 import os
 import argparse
+import time
+import glob
+import concurrent.futures
+import json
 import loggy
 
-asm64 = assembler.Assembler()
-
 # Parse the command line
 def parse_command_line():
     # Create the parser
     parser = argparse.ArgumentParser(description="Assembler")
     
     # Add a filename argument
-    parser.add_argument('filename', help='Input assembly file')
+    parser.add_argument('filename', nargs='*', help='Input assembly file(s), wildcards are expanded')
+    parser.add_argument('-list',    help='File listing input assembly files, one per line')
+    parser.add_argument('-jobs',    help='Number of worker processes when assembling several files (default one per core)')
     parser.add_argument('-base',    help='Base address e.g. 0xC000')
-    parser.add_argument('-output',  help='Filename of assembled output')
+    parser.add_argument('-output',  help='Filename of assembled output, or directory when assembling several files')
     parser.add_argument('-log',     help='Log Level, Diagnostic = 3, Info = 2, Warnings = 1, Errors = 0')
+    parser.add_argument('-logfile', help='Write the log to this file instead of the console')
     parser.add_argument('-nowrite', help='Do not write output')
+    parser.add_argument('-segments', action='store_true', help='Write one program per .org segment (<output>_<address>) instead of a single padded one')
+    parser.add_argument('-format',  help='Output format, prg, t64 (tape archive) or raw (no load address) (default prg)')
+    parser.add_argument('-d64',     help='Add the output to this D64 disk image, creating it if needed')
+    parser.add_argument('-diskname', help='Name and id of a new D64 disk image (default diskname,id)')
+    parser.add_argument('-listing', help='Write a listing to this file, or directory when assembling several files')
+    parser.add_argument('-cycles',  action='store_true', help='Show the size and cycles of every instruction in the listing and totals per label')
+    parser.add_argument('-cache',   help='Directory of the assembly cache, reuses output when nothing has changed')
+    parser.add_argument('-cachesize', help='Assembly cache size limit in MB, least recently used entries are evicted (default 64)')
+    parser.add_argument('--watch',  action='store_true', help='Keep running and reassemble whenever the file or its includes change')
+    parser.add_argument('-interval', help='Polling interval for --watch in ms (default 250)')
+    parser.add_argument('--profile', action='store_true', help='Print timings of every phase and counters of the run as JSON')
+    parser.add_argument('-cprofile', help='Write cProfile stats of the run to this file, for pstats or snakeviz')
 
     # Parse the arguments
     args = parser.parse_args()
 
+    if ( len(args.filename) == 0 and args.list == None ):
+        parser.error("an input file or -list is required")
+
     # Return the filename
     return args
 
 
 # generate an output filename
-def generate_output_filename( filename ):
+def generate_output_filename( filename, output_format = "prg" ):
     matches = re.findall("\..*$", filename)
     if ( len(matches)>0 ):
-        return filename.replace(matches[0], "" )
-    else:
-        return filename
+        filename = filename.replace(matches[0], "" )
+    return filename + output_formats.get_writer( output_format ).EXTENSION
 
 
 # Write output to file
 def write_binary_output( bytes, filename ):
-    
-    with open(filename, "wb") as binary_file:
-        binary_file.write( bytes )
-        
+    output_formats.write_buffers( filename, [ bytes ] )
+
+
+# Programs of an assembly run as ( name, load address, memoryview of the bytes ), the padded program
+# or one per segment. Names are the base name of the output, segments add their address.
+def get_programs( context, output_filename, split_segments = False ):
+
+    if ( not split_segments ):
+        programs = [ context.get_program() ]
+    else:
+        programs = context.get_segments()
+
+    name = generate_output_filename( os.path.basename( output_filename ) )
+    return [ ( output_formats.get_entry_filename( name, address, split_segments ), address, data ) for address, data in programs ]
+
+
+# Write programs in an output format, returns ( filename, bytes ) of every file written
+def write_program( programs, output_filename, output_format = "prg", split_segments = False ):
+    return output_formats.get_writer( output_format ).write( output_filename, programs, split_segments )
+
+
+# Programs as ( name, PRG bytes ), as they go on a disk image
+def get_prg_files( programs ):
+    return [ ( name, memory_image.prg_header( address ) + data ) for name, address, data in programs ]
+
+
+# Add programs, ( filename, bytes ), to a D64 disk image under their base names replacing any of the same
+# name. An existing image is updated in place, a new one is built in memory and written in one go.
+def write_disk( disk_filename, disk_name, programs ):
+
+    if ( os.path.isfile( disk_filename ) ):
+        image = d64.D64Image.open( disk_filename )
+    else:
+        name, disk_id = ( ( disk_name or "diskname,id" ).split(",") + [ "00" ] )[:2]
+        image = d64.D64Image.create( name, disk_id )
+
+    for filename, data in programs:
+        image.write_file( os.path.basename(filename), data )
+
+    loggy.log ( loggy.LOG_INFO, "Writing " + str(len(programs)) + " file(s) to " + disk_filename + ", " + str( image.get_free_blocks() ) + " blocks free" )
+
+    if ( not image.is_open() ):
+        image.save( disk_filename )
+    else:
+        image.close()
+
+
+# Write the listing of an assembly run to file, with cycles the size and cycles of every instruction and totals per label
+def write_listing( context, filename, cycles = False ):
+
+    with listing.ListingWriter( filename ) as writer:
+        writer.write_rows( context.listing_rows( cycles ) )
+
+
+# Timings and counters of a profiled run as JSON
+def get_profile( context, filename ):
+    profile = context.get_stats().to_dict()
+    profile["file"] = filename
+    return json.dumps( profile, indent=4 )
+
+
+# Modification times of the files a program was assembled from
+def get_modification_times( files ):
+    times = {}
+    for path in files:
+        try:
+            times[path] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            times[path] = None
+    return times
+
+
+# Reassemble whenever the source or anything it includes changes, until interrupted.
+# The assembler stays warm so unchanged files are not re-tokenized.
+def watch( asm64, filename, base_address, output_filename, interval, listing_filename = None, split_segments = False, disk_filename = None, disk_name = None, output_format = "prg", cycles = False ):
+
+    loggy.log ( loggy.LOG_WARN, "Watching " + filename + ", Ctrl+C to stop" )
+
+    times = {}
+
+    try:
+        while True:
+            if ( get_modification_times( times.keys() ) != times or len(times) == 0 ):
+
+                start_time = time.perf_counter()
+
+                try:
+                    context = asm64.run_file_context( filename, base_address )
+                    programs = get_programs( context, output_filename, split_segments )
+                    size = sum( written for name, written in write_program( programs, output_filename, output_format, split_segments ) )
+
+                    if ( disk_filename != None ):
+                        write_disk( disk_filename, disk_name, get_prg_files( programs ) )
+
+                    if ( listing_filename != None ):
+                        write_listing( context, listing_filename, cycles )
+
+                    elapsed = ( time.perf_counter() - start_time ) * 1000
+                    loggy.log ( loggy.LOG_INFO, "Assembled " + output_filename + " (" + str(size) + " bytes) in " + '{:.1f}'.format(elapsed) + "ms" )
+                except SystemExit:
+                    loggy.log ( loggy.LOG_WARN, "Assembly failed, waiting for changes" )
+
+                times = get_modification_times( asm64.get_source_files(filename) )
+
+            time.sleep( interval / 1000 )
+    except KeyboardInterrupt:
+        pass
+
+
+# Input files named on the command line and in the list file, wildcards expanded and duplicates dropped
+def expand_inputs( filenames, list_filename = None ):
+
+    patterns = list(filenames)
+
+    if ( list_filename != None ):
+        with open(list_filename, "r") as list_file:
+            for line in list_file:
+                line = line.strip()
+                if ( line != "" and not line.startswith("#") ):
+                    patterns.append( line )
+
+    inputs = []
+    for pattern in patterns:
+        matches = sorted( glob.glob(pattern) ) if glob.has_magic(pattern) else [ pattern ]
+
+        if ( len(matches) == 0 ):
+            loggy.log ( loggy.LOG_WARN, "No files match " + pattern )
+
+        for filename in matches:
+            if ( filename not in inputs ):
+                inputs.append( filename )
+
+    return inputs
+
+
+# Each batch worker process keeps one warm assembler for every file it is given
+_worker_assembler = None
+
+def init_worker( log_level, cache_directory, cache_size, log_filename = None ):
+    global _worker_assembler
+
+    loggy.LOG_LEVEL = log_level
+
+    if ( log_filename != None ):
+        loggy.set_sink( loggy.FileSink( log_filename, "a" ) )
+
+    _worker_assembler = assembler.Assembler()
+
+    if ( cache_directory != None ):
+        _worker_assembler.set_cache( assembly_cache.AssemblyCache( cache_directory, assembler.Assembler.VERSION, cache_size ) )
+
+
+# Assemble and write one file of a batch, returns ( filename, output filename, bytes written, ms, error, files written,
+# ( name, PRG bytes ) of the programs when keep_programs is set so the caller can put them on a disk )
+def assemble_file( filename, base_address, output_filename, listing_filename = None, split_segments = False, output_format = "prg", keep_programs = False, cycles = False ):
+
+    if ( _worker_assembler == None ):
+        init_worker( loggy.LOG_LEVEL, None, 0 )
+
+    start_time = time.perf_counter()
+
+    try:
+        source = _worker_assembler.load_source( filename )
+        context = _worker_assembler.run_context( source, base_address, os.path.dirname(os.path.abspath(filename)) )
+        programs = get_programs( context, output_filename, split_segments )
+        files = write_program( programs, output_filename, output_format, split_segments )
+
+        if ( listing_filename != None ):
+            write_listing( context, listing_filename, cycles )
+
+        error = None
+        size = sum( written for name, written in files )
+        written = [ name for name, written in files ]
+        prg_files = [ ( name, bytes(data) ) for name, data in get_prg_files( programs ) ] if keep_programs else []
+    except SystemExit:
+        error = "assembly failed"
+        size = 0
+        written = []
+        prg_files = []
+    except Exception as e:
+        error = str(e)
+        size = 0
+        written = []
+        prg_files = []
+
+    return ( filename, output_filename, size, ( time.perf_counter() - start_time ) * 1000, error, written, prg_files )
+
+
+# Assemble many files across a pool of worker processes, a failing file doesn't stop the rest.
+# Returns the number of files that failed.
+def batch( filenames, base_address, output_directory, jobs, cache_directory, cache_size, log_filename = None, listing_directory = None, split_segments = False, disk_filename = None, disk_name = None, output_format = "prg", cycles = False ):
+
+    start_time = time.perf_counter()
+    results = []
+
+    with concurrent.futures.ProcessPoolExecutor( max_workers=jobs, initializer=init_worker, initargs=( loggy.LOG_LEVEL, cache_directory, cache_size, log_filename ) ) as executor:
+
+        futures = []
+        for filename in filenames:
+            output_filename = generate_output_filename( filename, output_format )
+            if ( output_directory != None ):
+                output_filename = os.path.join( output_directory, os.path.basename(output_filename) )
+
+            listing_filename = None
+            if ( listing_directory != None ):
+                listing_filename = os.path.join( listing_directory, os.path.basename( generate_output_filename(filename) ) + ".lst" )
+
+            futures.append( executor.submit( assemble_file, filename, base_address, output_filename, listing_filename, split_segments, output_format, disk_filename != None, cycles ) )
+
+        for future in concurrent.futures.as_completed( futures ):
+            result = future.result()
+            results.append( result )
+
+            filename, output_filename, size, elapsed, error, written, programs = result
+            if ( error == None ):
+                loggy.log ( loggy.LOG_INFO, "Assembled " + output_filename + " (" + str(size) + " bytes) in " + '{:.1f}'.format(elapsed) + "ms" )
+            else:
+                loggy.log ( loggy.LOG_ERROR, "Failed " + filename + ": " + error )
+
+    failures = [ result for result in results if result[4] != None ]
+
+    # The workers only write their own files, everything goes on the disk in one pass at the end
+    if ( disk_filename != None ):
+        write_disk( disk_filename, disk_name, [ program for result in results for program in result[6] ] )
+
+    loggy.log ( loggy.LOG_WARN, "*** Summary ***" )
+    for filename, output_filename, size, elapsed, error, written, programs in sorted( results, key=lambda result: -result[3] ):
+        status = "ok" if error == None else "FAILED"
+        loggy.log ( loggy.LOG_WARN, '{:>9.1f}ms  '.format(elapsed) + '{:<7}'.format(status) + filename )
+
+    loggy.log ( loggy.LOG_WARN, str(len(results) - len(failures)) + " assembled, " + str(len(failures)) + " failed in " + '{:.1f}'.format( ( time.perf_counter() - start_time ) * 1000 ) + "ms" )
+
+    return len(failures)
+
 
 def start( ):
 
@@ -51,24 +305,128 @@ def start( ):
     if ( "log" in args and args.log != None ):
         loggy.LOG_LEVEL = int( args.log )
         loggy.log ( loggy.LOG_DIAGNOSTIC, "Setting log level to " + str(args.log) )
+    if ( args.logfile != None ):
+        # Truncate once and append from then on so batch workers can share the file
+        open( args.logfile, "w" ).close()
+        loggy.set_sink( loggy.FileSink( args.logfile, "a" ) )
     if ( "base" in args and args.base != None ):
         base_address = int(args.base, 16)
         loggy.log ( loggy.LOG_DIAGNOSTIC, "Setting base address to " + str(args.base) )
+
+    filenames = expand_inputs( args.filename, args.list )
+
+    if ( len(filenames) == 0 ):
+        loggy.log ( loggy.LOG_ERROR, "No input files" )
+        exit(1)
+
+    cache_size = 64
+    if ( args.cachesize != None ):
+        cache_size = int( args.cachesize )
+
+    output_format = "prg"
+    if ( args.format != None ):
+        output_format = args.format.lower()
+        if ( output_formats.get_writer( output_format ) == None ):
+            loggy.log ( loggy.LOG_ERROR, "Unknown output format " + args.format + ", expected one of " + ", ".join( output_formats.FORMATS ) )
+            exit(1)
+
+    # Runs restored from the assembly cache have no IR to count cycles from
+    if ( args.cycles and args.cache != None ):
+        loggy.log ( loggy.LOG_ERROR, "-cycles doesn't work with -cache" )
+        exit(1)
+
+    # Several inputs are assembled in a pool of worker processes, -output names the directory to write them to
+    if ( len(filenames) > 1 or args.list != None ):
+
+        if ( args.watch or args.profile or args.cprofile != None ):
+            loggy.log ( loggy.LOG_ERROR, "--watch and profiling take a single input file" )
+            exit(1)
+
+        jobs = None
+        if ( args.jobs != None ):
+            jobs = int( args.jobs )
+
+        if ( args.output != None ):
+            os.makedirs( args.output, exist_ok=True )
+        if ( args.listing != None ):
+            os.makedirs( args.listing, exist_ok=True )
+
+        failures = batch( filenames, base_address, args.output, jobs, args.cache, cache_size * 1024 * 1024, args.logfile, args.listing, args.segments, args.d64, args.diskname, output_format, args.cycles )
+
+        if ( failures > 0 ):
+            exit(1)
+        return
+
+    args.filename = filenames[0]
+
     if ( "output" in args and args.output != None ):
         output_filename = str(args.output)
         loggy.log ( loggy.LOG_DIAGNOSTIC, "Setting output filename to " + str(args.output) )
     else:
-        output_filename = generate_output_filename(args.filename)
+        output_filename = generate_output_filename( args.filename, output_format )
     if ( "nowrite" in args ):
         write_enabled = False
 
+    # Only build the assembler once we know there is work to do
+    asm64 = assembler.Assembler()
+
+    cache = None
+    if ( "cache" in args and args.cache != None ):
+        cache = assembly_cache.AssemblyCache( args.cache, assembler.Assembler.VERSION, cache_size * 1024 * 1024 )
+        asm64.set_cache( cache )
+        loggy.log ( loggy.LOG_DIAGNOSTIC, "Using assembly cache " + str(args.cache) )
+
+    if ( args.watch ):
+        if ( args.profile or args.cprofile != None ):
+            loggy.log ( loggy.LOG_ERROR, "Profiling doesn't work with --watch" )
+            exit(1)
+
+        interval = 250
+        if ( args.interval != None ):
+            interval = int( args.interval )
+        watch( asm64, args.filename, base_address, output_filename, interval, args.listing, args.segments, args.d64, args.diskname, output_format, args.cycles )
+        return
+
+    asm64.set_profile( args.profile )
+
+    profiler = None
+    if ( args.cprofile != None ):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
     # input file
     source = asm64.load_source(args.filename)
 
     if ( source != None ):
-        assembly_output = asm64.run(source, base_address)
+        context = asm64.run_context(source, base_address)
+        stats = context.get_stats()
+
+        if ( stats != None ):
+            stats.start( "write" )
 
         loggy.log ( loggy.LOG_INFO, "Writing to " + output_filename )
-        write_binary_output( assembly_output, output_filename )
+        programs = get_programs( context, output_filename, args.segments )
+        write_program( programs, output_filename, output_format, args.segments )
+
+        if ( args.d64 != None ):
+            write_disk( args.d64, args.diskname, get_prg_files( programs ) )
+
+        if ( args.listing != None ):
+            loggy.log ( loggy.LOG_INFO, "Writing listing to " + args.listing )
+            write_listing( context, args.listing, args.cycles )
+
+        if ( stats != None ):
+            stats.stop( "write" )
+            print ( get_profile( context, args.filename ) )
+
+    if ( profiler != None ):
+        profiler.disable()
+        profiler.dump_stats( args.cprofile )
+        loggy.log ( loggy.LOG_INFO, "cProfile stats written to " + args.cprofile )
+
+    if ( cache != None ):
+        loggy.log ( loggy.LOG_INFO, "Assembly cache " + str( cache.stats() ) )
 
-start()
\ No newline at end of file
+if __name__ == "__main__":
+    start()
\ No newline at end of file
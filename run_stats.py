@@ -0,0 +1,49 @@
+import time
+
+# Where the time of an assembly run went. Collected only when profiling is switched on with
+# Assembler.set_profile(), otherwise contexts have no RunStats and the passes skip every timer
+# and counter after a single None check.
+#
+#   phases   - name -> [ wall ms, cpu ms ], a phase run more than once adds up
+#   counters - name -> count
+class RunStats:
+
+    def __init__( self ):
+        self.phases = {}
+        self.counters = {}
+
+        # name -> ( wall, cpu ) start times of phases running now
+        self._started = {}
+
+
+    def start( self, name ):
+        self._started[name] = ( time.perf_counter(), time.process_time() )
+
+
+    def stop( self, name ):
+        wall, cpu = self._started.pop( name )
+
+        phase = self.phases.get( name )
+        if ( phase == None ):
+            phase = self.phases[name] = [ 0.0, 0.0 ]
+
+        phase[0] = phase[0] + ( time.perf_counter() - wall ) * 1000
+        phase[1] = phase[1] + ( time.process_time() - cpu ) * 1000
+
+
+    def count( self, name, amount = 1 ):
+        self.counters[name] = self.counters.get( name, 0 ) + amount
+
+
+    # Wall and cpu ms of a phase, zero if it never ran
+    def get_phase( self, name ):
+        return tuple( self.phases.get( name, ( 0.0, 0.0 ) ) )
+
+
+    # Everything as plain dicts, ready for json.dumps()
+    def to_dict( self ):
+        return {
+            "phases": { name: { "wall_ms": round( wall, 3 ), "cpu_ms": round( cpu, 3 ) } for name, ( wall, cpu ) in self.phases.items() },
+            "total_wall_ms": round( sum( wall for wall, cpu in self.phases.values() ), 3 ),
+            "counters": dict( self.counters )
+        }
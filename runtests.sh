@@ -29,3 +29,39 @@ python3 tests/assembly_parser_unit.py
 echo "Testing Assembler"
 python3 tests/assembler_unit.py
 
+echo "Testing Include Resolver"
+python3 tests/include_resolver_unit.py
+
+echo "Testing Assembly Cache"
+python3 tests/assembly_cache_unit.py
+
+
+echo "Testing Command Line"
+python3 tests/retroasm_unit.py
+
+echo "Testing Logging"
+python3 tests/loggy_unit.py
+
+echo "Testing Listing"
+python3 tests/listing_unit.py
+
+echo "Testing Memory Image"
+python3 tests/memory_image_unit.py
+
+echo "Testing D64"
+python3 tests/d64_unit.py
+
+echo "Testing Output Formats"
+python3 tests/output_formats_unit.py
+
+echo "Testing Run Stats"
+python3 tests/run_stats_unit.py
+
+echo "Testing Symbol Table"
+python3 tests/symbol_table_unit.py
+
+echo "Testing Table Generators"
+python3 tests/table_generators_unit.py
+
+echo "Testing 6510 Emulator"
+python3 tests/cpu6510_unit.py
@@ -0,0 +1,58 @@
+from assembly_parser import TokenKind
+
+# Labels and variables are held as ints with the kind of value they are, so resolving a reference
+# is a dict lookup and < > are bit operations rather than formatting and re-parsing hex strings.
+
+class SymbolKind:
+    ADDRESS = 0     # label, assembled as a zero page address when it is in the zero page, absolute otherwise
+    BYTE = 1        # 8 bit value, assembled as a zero page address
+    IMMEDIATE = 2   # #$xx constant
+    WORD = 3        # 16 bit value written as $xxxx, always assembled as an absolute (or relative) address
+
+    names = ( "ADDRESS", "BYTE", "IMMEDIATE", "WORD" )
+
+    # Operand token kind a symbol of each kind is assembled as
+    TOKEN_KINDS = ( TokenKind.ABSOLUTE, TokenKind.ZEROPAGE, TokenKind.IMMEDIATE, TokenKind.ABSOLUTE )
+
+    # Symbol kind of a variable declared with a value token of each kind
+    FROM_TOKEN_KINDS = {
+        TokenKind.ABSOLUTE: WORD,
+        TokenKind.ZEROPAGE: BYTE,
+        TokenKind.IMMEDIATE: IMMEDIATE
+    }
+
+
+# Value of a symbol as it would be written in the source, i.e. '$c000', '$fb' or '#$f8'
+def format_symbol( kind, value ):
+    if ( kind == SymbolKind.ADDRESS or kind == SymbolKind.WORD ):
+        return '${:04x}'.format( value )
+    elif ( kind == SymbolKind.BYTE ):
+        return '${:02x}'.format( value )
+    else:
+        return '#${:02x}'.format( value )
+
+
+# name -> ( kind, value ), a dict so the passes look symbols up directly
+class SymbolTable( dict ):
+
+    def define( self, name, kind, value ):
+        self[name] = ( kind, value )
+
+
+    # Every symbol in one go as name -> [ kind, value ], plain enough for json
+    def export( self ):
+        return { name: [ kind, value ] for name, ( kind, value ) in self.items() }
+
+
+    # Symbols as source text, name -> '$c000'
+    def export_text( self ):
+        return { name: format_symbol( kind, value ) for name, ( kind, value ) in self.items() }
+
+
+    # Table of symbols exported with export()
+    @staticmethod
+    def load( exported ):
+        table = SymbolTable()
+        for name, ( kind, value ) in exported.items():
+            table[name] = ( kind, value )
+        return table
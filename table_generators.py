@@ -0,0 +1,155 @@
+import ast
+import functools
+import math
+import re
+from array import array
+
+# NumPy is optional, tables are computed one value at a time without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Lookup tables computed by the assembler, for the .table and .fill directives
+#
+#   .table sine 360 127 128           ; generator, length, amplitude, offset
+#   .table linear $100 255 0
+#   .table "128 + 64 * sin( i * ( 4 * pi / n ) )" 256
+#   .fill 256 $20                     ; length, value
+#
+# Every generator is an expression of the index i, the length n, the amplitude and the offset, the value
+# of each entry is truncated to an int and has to fit in a byte. An expression is evaluated for the whole
+# table at once with NumPy when it is installed.
+
+GENERATORS = {
+    "sine": "offset + amplitude * sin( i * ( 2 * pi / n ) )",
+    "cosine": "offset + amplitude * cos( i * ( 2 * pi / n ) )",
+    "linear": "offset + amplitude * i / n"
+}
+
+# Functions an expression may call, by name, as they are computed with and without NumPy
+FUNCTIONS = ( "sin", "cos", "tan", "sqrt", "exp", "log", "floor", "ceil", "abs" )
+
+NAMES = ( "i", "n", "amplitude", "offset", "pi", "e" )
+
+# Syntax an expression may use, anything else such as attributes or subscripts is rejected
+EXPRESSION_NODES = ( ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Constant, ast.Load,
+                     ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd )
+
+MAX_LENGTH = 0x10000
+
+# Arguments are separated by whitespace or commas, an expression is quoted
+ARGUMENT_REGEX = re.compile( r'"[^"]*"|[^\s,]+' )
+
+
+# A number argument, $ for hex otherwise decimal, i.e. '$FF', '127' or '0.5'
+def parse_number( text ):
+    try:
+        if ( text[:1] == "$" ):
+            return int( text[1:], 16 )
+        number = float( text )
+        return int( number ) if number.is_integer() else number
+    except ValueError:
+        raise ValueError( "Not a number: " + text )
+
+
+def parse_length( text ):
+    length = parse_number( text )
+    if ( not isinstance( length, int ) or length < 1 or length > MAX_LENGTH ):
+        raise ValueError( "Table length must be 1 to %d: %s" % ( MAX_LENGTH, text ) )
+    return length
+
+
+# Bytes of a .table directive's arguments: generator or "expression", length, [amplitude, [offset]]
+def table( arguments ):
+    arguments = ARGUMENT_REGEX.findall( arguments )
+    if ( len(arguments) < 2 or len(arguments) > 4 ):
+        raise ValueError( "Expected .table generator length [amplitude [offset]]" )
+
+    generator = arguments[0]
+    if ( generator[:1] == '"' ):
+        expression = generator[1:-1]
+    elif ( generator.lower() in GENERATORS ):
+        expression = GENERATORS[generator.lower()]
+    else:
+        raise ValueError( "Unknown table generator %s, expected one of %s or a quoted expression" % ( generator, ", ".join( GENERATORS ) ) )
+
+    numbers = [ parse_number( argument ) for argument in arguments[2:] ]
+    amplitude = numbers[0] if len(numbers) > 0 else 1
+    offset = numbers[1] if len(numbers) > 1 else 0
+
+    return generate( expression, parse_length( arguments[1] ), amplitude, offset )
+
+
+# Bytes of a .fill directive's arguments: length, [value]
+def fill( arguments ):
+    arguments = ARGUMENT_REGEX.findall( arguments )
+    if ( len(arguments) < 1 or len(arguments) > 2 ):
+        raise ValueError( "Expected .fill length [value]" )
+
+    value = parse_number( arguments[1] ) if len(arguments) > 1 else 0
+    if ( not isinstance( value, int ) or value < 0 or value > 0xFF ):
+        raise ValueError( "Fill value must be a byte: " + arguments[1] )
+
+    return bytes( [ value ] ) * parse_length( arguments[0] )
+
+
+# Compile an expression after checking it only does arithmetic, $ hex constants are allowed
+def compile_expression( expression ):
+    try:
+        tree = ast.parse( re.sub( r"\$([0-9a-fA-F]+)", r"0x\1", expression ), mode="eval" )
+    except SyntaxError:
+        raise ValueError( "Invalid expression: " + expression )
+
+    for node in ast.walk( tree ):
+        if ( not isinstance( node, EXPRESSION_NODES ) ):
+            raise ValueError( "Expressions may only use numbers, arithmetic, %s and %s: %s" % ( ", ".join( NAMES ), ", ".join( FUNCTIONS ), expression ) )
+        elif ( isinstance( node, ast.Name ) and node.id not in NAMES and node.id not in FUNCTIONS ):
+            raise ValueError( "Unknown name %s in expression: %s" % ( node.id, expression ) )
+        elif ( isinstance( node, ast.Call ) and ( not isinstance( node.func, ast.Name ) or node.func.id not in FUNCTIONS or len(node.keywords) > 0 ) ):
+            raise ValueError( "Only %s may be called in expression: %s" % ( ", ".join( FUNCTIONS ), expression ) )
+        elif ( isinstance( node, ast.Constant ) and not isinstance( node.value, ( int, float ) ) ):
+            raise ValueError( "Only numbers may be used in expression: " + expression )
+
+    return compile( tree, "<table>", "eval" )
+
+
+# Table of length bytes, tables are immutable so the same parameters are only ever computed once
+@functools.lru_cache( maxsize=256 )
+def generate( expression, length, amplitude, offset ):
+
+    code = compile_expression( expression )
+    namespace = { "__builtins__": {}, "n": length, "amplitude": amplitude, "offset": offset, "pi": math.pi, "e": math.e }
+
+    if ( numpy != None ):
+        namespace.update( { name: getattr( numpy, name ) for name in FUNCTIONS } )
+        namespace["i"] = numpy.arange( length, dtype=numpy.float64 )
+
+        # Calling a function wrongly or not calling it at all is a TypeError, or gives an array of objects
+        try:
+            with numpy.errstate( all="ignore" ):
+                values = numpy.broadcast_to( eval( code, namespace ), ( length, ) )
+        except ( ArithmeticError, TypeError, ValueError ):
+            raise ValueError( "Table values must be bytes: " + expression )
+
+        if ( values.dtype.kind not in "iuf" ):
+            raise ValueError( "Table values must be bytes: " + expression )
+
+        values = numpy.trunc( values )
+        if ( not numpy.all( numpy.isfinite( values ) ) or values.min() < 0 or values.max() > 0xFF ):
+            raise ValueError( "Table values must be bytes: " + expression )
+
+        return values.astype( numpy.uint8 ).tobytes()
+
+    namespace.update( { name: getattr( math, name ) for name in FUNCTIONS if name != "abs" } )
+    namespace["abs"] = abs
+
+    values = array( "B" )
+    try:
+        for index in range( 0, length ):
+            namespace["i"] = index
+            values.append( int( eval( code, namespace ) ) )
+    except ( ArithmeticError, OverflowError, TypeError, ValueError ):
+        raise ValueError( "Table values must be bytes: " + expression )
+
+    return values.tobytes()
@@ -1,12 +1,19 @@
 import unittest
 import sys
 import os
+import concurrent.futures
+import io
+import tempfile
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import main modules
 import assembler
 import instruction_set
+import loggy
+from assembly_ir import NodeKind
+from symbol_table import SymbolKind
+from assembly_parser import TokenKind
 
 asm64 = assembler.Assembler()
 
@@ -18,22 +25,20 @@ class AssemblerTests( unittest.TestCase ):
 
 
     def test_parse_implied_instruction(self):
-        
-        asm64.reset()
+
+        context = asm64.create_context()
 
         self._instruction_set.loadInstructions()
 
         current_instruction = self._instruction_set.getInstruction("RTS")
         self.assertIsNotNone(current_instruction)
         
-        asm64.parse_implied_instruction( current_instruction )
+        context.parse_implied_instruction( current_instruction )
 
-        self.assertTrue( len(asm64._assembly_output) == 1 )
-        self.assertEqual( asm64._assembly_output[0], 96 )
+        self.assertEqual( context._memory[0xC000], 96 )
         
         # Teardown
         self._instruction_set.initialise()
-        asm64.reset()
 
 
     def test_set_working_directory(self):
@@ -46,123 +51,209 @@ class AssemblerTests( unittest.TestCase ):
 
 
     def test_parse_label_declaration(self):
-        self._address = "$c000"
-        asm64.reset()
 
-        asm64.parse_label_declaration("loop:")
+        context = asm64.create_context()
 
-        self.assertTrue( "loop:" in asm64._labels )
-        
-        self.assertTrue( asm64._labels["loop:" ] != None )
-        self.assertTrue( asm64._labels["loop:" ] == "$c000" )
+        context.parse_label_declaration("loop:")
 
-        asm64.reset()
+        self.assertTrue( "loop:" in context._labels )
+        
+        self.assertTrue( context._labels["loop:" ] != None )
+        self.assertTrue( context._labels["loop:" ] == ( SymbolKind.ADDRESS, 0xC000 ) )
 
 
     def test_parse_variable_declaration(self):
 
-        asm64.reset()
-
-        asm64.parse_variable_declaration( "foo", "5" )
+        context = asm64.create_context()
 
-        self.assertTrue( "foo" in asm64._labels )
-        self.assertTrue( asm64._labels["foo" ] == "5" )
+        context.parse_variable_declaration( "foo", SymbolKind.BYTE, 0xFB )
 
-        asm64.reset()
+        self.assertTrue( "foo" in context._labels )
+        self.assertTrue( context._labels["foo" ] == ( SymbolKind.BYTE, 0xFB ) )
 
 
     def test_parse_label_reference(self):
 
-        self._address = "$c000"
-        asm64.reset()
+        context = asm64.create_context()
 
-        asm64.parse_label_declaration("loop:")
-
-        val = asm64.parse_label_reference("loop", asm64.MODE_PRESCAN )
-
-
-    def test_parse_org_directive(self):
+        context.parse_label_declaration("loop:")
 
-        matches = ['.org', '$d000']
+        val = context.parse_label_reference("loop", asm64.MODE_PRESCAN )
+        self.assertEqual( val, ( SymbolKind.ADDRESS, 0xC000 ) )
 
-        idx = asm64.parse_org_directive(matches, 0)
+        # < and > take the low and high byte as an immediate
+        context.parse_variable_declaration( "screen", SymbolKind.ADDRESS, 0x0400 )
+        self.assertEqual( context.parse_label_reference("<screen", asm64.MODE_ASSEMBLE ), ( SymbolKind.IMMEDIATE, 0x00 ) )
+        self.assertEqual( context.parse_label_reference(">screen", asm64.MODE_ASSEMBLE ), ( SymbolKind.IMMEDIATE, 0x04 ) )
 
-        self.assertEqual(asm64._base_address, 0xD000)
+        # Forward references are placeholders in the prescan
+        self.assertEqual( context.parse_label_reference("later", asm64.MODE_PRESCAN ), ( SymbolKind.ADDRESS, 0xC000 ) )
+        self.assertEqual( context.parse_label_reference(">later", asm64.MODE_PRESCAN ), ( SymbolKind.IMMEDIATE, 0 ) )
 
 
-    def test_parse_include_directive(self):
-        # this sets the working directory
-        asm64.set_working_directory( os.path.dirname(os.path.abspath("fixtures/included.asm")) )
+    def test_parse_org_directive(self):
 
-        matches = ['RTS', '.include', '\"included.asm\"', 'RTS']
+        context = asm64.create_context()
 
-        idx = asm64.parse_include_directive(matches, 1)
+        matches = asm64._parser.tokenize('.org $d000')
 
-        expected = ['RTS', 'inc:', 'LDA', '#$65', 'RTS', 'RTS']
+        ir = []
+        idx = context.parse_org_directive(matches, 0, ir)
 
-        self.assertEqual(matches,expected)
+        self.assertEqual(idx, 1)
+        self.assertEqual(ir[0].kind, NodeKind.ORG)
+        self.assertEqual(ir[0].address, 0xD000)
 
 
     def test_parse_relative_address(self):
 
-        val = asm64.parse_relative_address( "$C010", 0xC000, asm64.MODE_ASSEMBLE )
+        context = asm64.create_context()
+
+        val = context.parse_relative_address( ( SymbolKind.ADDRESS, 0xC010 ), 0xC000, asm64.MODE_ASSEMBLE )
 
-        self.assertEqual(val, '$0e')
+        self.assertEqual(val, 0x0e)
 
 
     def test_parse_wordstring(self):
 
-        matches = [".word", "$DEAD", "$beef", "RTS" ]
-        
-        self._address = "$c000"
-        asm64.reset()
+        context = asm64.create_context()
+
+        matches = asm64._parser.tokenize(".word $DEAD $beef RTS")
         
-        val = asm64.parse_wordstring(0xC000, matches, 0, asm64.MODE_ASSEMBLE )
+        ir = []
+        val = context.parse_wordstring(matches, 0, ir )
 
         expected = bytearray([0xDE, 0xAD, 0xBE, 0xEF])
 
-        self.assertEqual(len(expected), len(asm64._assembly_output) )
-        self.assertEqual(expected, asm64._assembly_output )
-
-        asm64.reset()
+        # The values are part of the .word token
+        self.assertEqual(val, 0)
+        self.assertEqual(len(expected), ir[0].size )
+        self.assertEqual(expected, ir[0].data )
 
 
     def test_parse_bytestring(self):
 
-        matches = [".byte", "$DE", "$AD", "$be", "$ef", "RTS" ]
-        
-        self._address = "$c000"
-        asm64.reset()
+        context = asm64.create_context()
+
+        matches = asm64._parser.tokenize(".byte $DE $AD $be $ef RTS")
         
-        val = asm64.parse_bytestring(0xC000, matches, 0, asm64.MODE_ASSEMBLE )
+        ir = []
+        val = context.parse_bytestring(matches, 0, ir )
 
         expected = bytearray([0xDE, 0xAD, 0xBE, 0xEF])
 
-        self.assertEqual(len(expected), len(asm64._assembly_output) )
-        self.assertEqual(expected, asm64._assembly_output )
-        
-        asm64.reset()
+        # The values are part of the .byte token
+        self.assertEqual(val, 0)
+        self.assertEqual(len(expected), ir[0].size )
+        self.assertEqual(expected, ir[0].data )
+
+
+    def test_parse_bytestring_runs(self):
+        asm64 = assembler.Assembler()
+        context = asm64.create_context( 0xC000 )
+
+        # Each line is a node of its own, bare values on the next line still continue the run
+        output = context.run( ".byte $01, $02 $03\n.byte $04\n $05 $C006\n.word $0708 $090A\n.byte $20,X" )
+
+        self.assertEqual( output, bytearray([0x00, 0xC0, 0x01, 0x02, 0x03, 0x04, 0x05, 0xC0, 0x07, 0x08, 0x09, 0x0A, 0x20]) )
+        self.assertEqual( [ row.split("  ")[-1].strip() for row in context.get_listing() ], [ "$01 $02 $03", "$04 $05 $C006", "$0708 $090A", "$20,X" ] )
+
+
+    def test_parse_generated_data(self):
+        context = asm64.create_context( 0xC000 )
+
+        output = context.run( "table:\n .table linear 4 8 ; ramp\n .fill 2 $EA\n LDA table\n" )
+
+        self.assertEqual( output, bytearray([0x00, 0xC0, 0x00, 0x02, 0x04, 0x06, 0xEA, 0xEA, 0xAD, 0x00, 0xC0]) )
+        self.assertEqual( context.get_listing()[0], "$C000  00 02 04 06                   .table linear 4 8 " )
+
+        # The generated tables are the same as the ones helpers/sine.py writes
+        self.assertEqual( asm64.run( ".table sine 360 127 128", 0xC000 ), asm64.run( asm64.load_source( "asm/sine.asm" ), 0xC000 ) )
+
+        # Bad tables are reported as assembly errors
+        for source in ( '.table "sin" 4', '.table "sin( 1, 2 )" 4', ".fill 4 $100" ):
+            with self.assertRaises(SystemExit):
+                asm64.create_context().run( source )
 
 
     def test_parse_string(self):
-        matches = [".string",  "\"Dead Beef\"", "LDA"]
-        
-        self._address = "$c000"
-        asm64.reset()
 
-        val = asm64.parse_string(0xC000, matches, 0, asm64.MODE_ASSEMBLE )
+        context = asm64.create_context()
+
+        matches = asm64._parser.tokenize(".string \"Dead Beef\" LDA")
+
+        ir = []
+        val = context.parse_string(matches, 0, ir )
 
         expected = bytearray([68, 101, 97, 100, 32, 66, 101, 101, 102, 0])
         
-        self.assertEqual(len(expected), len(asm64._assembly_output) )
-        self.assertEqual(expected, asm64._assembly_output )
+        self.assertEqual(len(expected), ir[0].size )
+        self.assertEqual(expected, ir[0].data )
+
+
+    def test_build_ir(self):
+
+        context = asm64.create_context()
+
+        matches = asm64._parser.tokenize("loop:\n LDA #$65\n BNE loop\n .byte $AA $55")
+        asm64._parser.classify( matches, asm64._instruction_set )
+
+        ir = context.build_ir( matches )
+
+        self.assertEqual( [ node.kind for node in ir ], [ NodeKind.LABEL, NodeKind.INSTRUCTION, NodeKind.INSTRUCTION, NodeKind.DATA ] )
+
+        # Literal operands are resolved when the IR is built, references wait for the passes
+        self.assertEqual( ir[1].operand, 0x65 )
+        self.assertEqual( ir[1].size, 2 )
+        self.assertEqual( ir[2].symbol, "loop" )
+        self.assertEqual( ir[3].data, bytearray([0xAA, 0x55]) )
+
+        context.assemble( ir, asm64.MODE_PRESCAN )
+
+        self.assertEqual( [ node.address for node in ir ], [ 0xC000, 0xC000, 0xC002, 0xC004 ] )
+
+        output = context.assemble( ir, asm64.MODE_ASSEMBLE )
+
+        self.assertEqual( output, bytearray([0xA9, 0x65, 0xD0, 0xFC, 0xAA, 0x55]) )
+
+
+    def test_assembler_segments(self):
+
+        context = asm64.create_context()
+        output = context.run( "LDA #$01\n RTS\n .org $c010\n .byte $AA $55\n .org $c004\n INX" )
+
+        # One padded PRG from the lowest address written
+        self.assertEqual( output, bytearray([0x00, 0xc0, 0xa9, 0x01, 0x60, 0x00, 0xe8]) + bytearray(11) + bytearray([0xaa, 0x55]) )
+
+        segments = [ ( start, bytes(data) ) for start, data in context.get_segments() ]
+        self.assertEqual( segments, [ ( 0xC000, bytes([0xa9, 0x01, 0x60]) ), ( 0xC004, bytes([0xe8]) ), ( 0xC010, bytes([0xaa, 0x55]) ) ] )
+        self.assertEqual( context._image.overlaps, [] )
+
+
+    def test_assembler_segment_overlap(self):
+
+        context = asm64.create_context()
+        output = context.run( "LDA #$01\n RTS\n .org $c001\n INX" )
+
+        self.assertEqual( output, bytearray([0x00, 0xc0, 0xa9, 0xe8, 0x60]) )
+        self.assertEqual( context._image.overlaps, [ ( 0xC001, 0xC002 ) ] )
+
+
+    def test_assembler_past_end_of_memory(self):
+
+        context = asm64.create_context( 0xFFFF )
+
+        with self.assertRaises(SystemExit):
+            context.run( "LDA #$01" )
 
 
     def test_set_base_address(self):
 
-        asm64.set_base_address(0xD000)
+        context = asm64.create_context()
 
-        self.assertEqual(asm64._base_address, 0xD000)
+        context.set_base_address(0xD000)
+
+        self.assertEqual(context._base_address, 0xD000)
 
 
     def test_load_source(self):
@@ -177,8 +268,6 @@ class AssemblerTests( unittest.TestCase ):
     # INTEGRATION
 
     def test_assembler_output_BORDER(self):
-        
-        asm64.reset()
 
         source = asm64.load_source("fixtures/border.asm")
         expected = bytearray([0x00, 0xc0, 0xa2, 0x00, 0x8e, 0x20, 0xd0, 0xe8, 0xe0, 0x10, 0xd0, 0xf8, 0xa2, 0x00, 0x4c, 0x02, 0xc0, 0x60 ])
@@ -187,12 +276,8 @@ class AssemblerTests( unittest.TestCase ):
         self.assertEqual(len(expected), len(actual), "BORDER.ASM: Expected byte array length not same as fixture")
         self.assertEqual(expected, actual, "BORDER.ASM: Expected byte array does not match fixture")
 
-        asm64.reset()
-
 
     def test_assembler_output_LABELS(self):
-        
-        asm64.reset()
 
         source = asm64.load_source("fixtures/labels.asm")
         expected = bytearray([0x00, 0xc0, 0xad, 0x00, 0xc0, 0xa2, 0xf8, 0xa9, 0x15, 0xa9, 0xc0, 0x8e, 0x00, 0xc0, 
@@ -203,13 +288,9 @@ class AssemblerTests( unittest.TestCase ):
         
         self.assertEqual(len(expected), len(actual), "LABELS.ASM: Expected byte array length not same as fixture")
         self.assertEqual(expected, actual, "LABELS.ASM: Expected byte array does not match fixture")
-        
-        asm64.reset()
 
 
     def test_assembler_output_HIRES(self):
-        
-        asm64.reset()
 
         source = asm64.load_source("fixtures/hires.asm")
 
@@ -222,12 +303,8 @@ class AssemblerTests( unittest.TestCase ):
         self.assertEqual(len(expected), len(actual), "HIRES.ASM: Expected byte array length not same as fixture")
         self.assertEqual(expected, actual, "HIRES.ASM: Expected byte array does not match fixture")       
 
-        asm64.reset()
-
 
     def test_assembler_output_INCLUDE(self):
-        
-        asm64.reset()
 
         source = asm64.load_source("fixtures/include.asm")
 
@@ -237,14 +314,255 @@ class AssemblerTests( unittest.TestCase ):
         self.assertEqual(len(expected), len(actual), "INCLUDE.ASM: Expected byte array length not same as fixture")
         self.assertEqual(expected, actual, "INCLUDE.ASM: Expected byte array does not match fixture")       
 
-        asm64.reset()
 
+    def test_run_file(self):
+
+        warm = assembler.Assembler()
+
+        source = asm64.load_source("fixtures/include.asm")
+        expected = asm64.run(source, 0xC000 )
+
+        actual = warm.run_file("fixtures/include.asm", 0xC000 )
+        self.assertEqual(expected, actual)
+
+        # Second run reuses the tokens of both files
+        misses = warm._include_resolver.misses
+        actual = warm.run_file("fixtures/include.asm", 0xC000 )
+        self.assertEqual(expected, actual)
+        self.assertEqual(warm._include_resolver.misses, misses)
+
+        files = warm.get_source_files("fixtures/include.asm")
+        self.assertEqual( [ os.path.basename(path) for path in files ], [ "include.asm", "included.asm" ] )
+
+
+    def test_run_file_layout_hint(self):
+
+        warm = assembler.Assembler()
+        warm.set_profile( True )
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join( directory, "hint.asm" )
+
+            with open( filename, "w" ) as source_file:
+                source_file.write( "LDA far\n LDA near\n NOP\n NOP\n near:\n NOP\n far:\n RTS" )
+
+            expected = asm64.run( asm64.load_source( filename ), 0x00F9 )
+
+            context = warm.run_file_context( filename, 0x00F9 )
+            self.assertEqual( context._output, expected )
+            self.assertEqual( context.get_stats().counters["layout_passes"], 3 )
+
+            # Forward references are sized as the last run laid them out, one lay out is enough
+            context = warm.run_file_context( filename, 0x00F9 )
+            self.assertEqual( context._output, expected )
+            self.assertEqual( context.get_stats().counters["layout_passes"], 1 )
+
+            # far moved into the zero page, the hint would make LDA far longer than it has to be
+            with open( filename, "w" ) as source_file:
+                source_file.write( "LDA far\n far:\n RTS" )
+
+            context = warm.run_file_context( filename, 0x00F9 )
+            self.assertEqual( context._output, bytearray([0xF9, 0x00, 0xA5, 0xFB, 0x60]) )
+            self.assertEqual( context.get_stats().counters["layout_hint_misses"], 1 )
+
+
+    def test_run_concurrent(self):
+
+        shared = assembler.Assembler()
+
+        jobs = []
+        for filename in [ "fixtures/border.asm", "fixtures/labels.asm", "fixtures/hires.asm", "fixtures/include.asm" ]:
+            source = asm64.load_source(filename)
+            jobs.append( ( source, asm64.run(source, 0xC000), os.path.dirname(os.path.abspath(filename)) ) )
+
+        # One assembler serving every run at once, each must match the output of a run on its own
+        with concurrent.futures.ThreadPoolExecutor( max_workers=8 ) as executor:
+            futures = [ ( executor.submit( shared.run, source, 0xC000, directory ), expected ) for source, expected, directory in jobs * 8 ]
+
+            for future, expected in futures:
+                self.assertEqual( future.result(), expected )
+
+
+    def test_zero_page(self):
+
+        # Labels and byte variables in the zero page take the shorter zero page form, forward references included
+        output = asm64.create_context( 0x0010 ).run( "LDA PTR\n STA buffer\n JMP buffer\n PTR = $FB\n .org $0020\n buffer:\n .byte $00" )
+        self.assertEqual( output, bytearray([0x10, 0x00, 0xA5, 0xFB, 0x85, 0x20, 0x4C, 0x20, 0x00]) + bytearray( 0x20 - 0x17 ) + bytearray([0x00]) )
+
+        # A variable written with four digits keeps its width, indexed or not
+        output = asm64.create_context( 0x0010 ).run( "LDA PTR\n LDA PTR,X\n STA buffer\n PTR = $00FB\n .org $0020\n buffer:\n .byte $00" )
+        self.assertEqual( output, bytearray([0x10, 0x00, 0xAD, 0xFB, 0x00, 0xBD, 0xFB, 0x00, 0x85, 0x20]) + bytearray( 0x20 - 0x18 ) + bytearray([0x00]) )
+
+
+    def test_resolve_fixpoint(self):
+
+        # far turns out not to be in the zero page, widening LDA far moves near too
+        context = asm64.create_context( 0x00F8 )
+        output = context.run( "LDA far\n LDA near\n near:\n NOP\n NOP\n NOP\n NOP\n far:\n RTS" )
+
+        self.assertEqual( output, bytearray([0xF8, 0x00, 0xAD, 0x01, 0x01, 0xA5, 0xFD, 0xEA, 0xEA, 0xEA, 0xEA, 0x60]) )
+
+        # Widening LDA far pushes near out of the zero page, which widens LDA near in turn
+        profiled = assembler.Assembler()
+        profiled.set_profile( True )
+        context = profiled.create_context( 0x00F9 )
+        output = context.run( "LDA far\n LDA near\n NOP\n NOP\n near:\n NOP\n far:\n RTS" )
+
+        self.assertEqual( output, bytearray([0xF9, 0x00, 0xAD, 0x02, 0x01, 0xAD, 0x01, 0x01, 0xEA, 0xEA, 0xEA, 0x60]) )
+        self.assertEqual( context._labels.export_text(), { "near": "$0101", "far": "$0102" } )
+        self.assertEqual( context.get_stats().counters["layout_passes"], 3 )
+
+
+    def test_indexed_labels(self):
+
+        # Labels and variables take the zero page indexed form where the instruction has one, LDA has no $xx,Y
+        output = asm64.create_context().run( "LDA table,X\n STA table,Y\n LDA zp,X\n LDX zp,Y\n LDA zp,Y\n zp = $FB\n table:\n .byte $00" )
+        self.assertEqual( output, bytearray([0x00, 0xC0, 0xBD, 0x0D, 0xC0, 0x99, 0x0D, 0xC0, 0xB5, 0xFB, 0xB6, 0xFB, 0xB9, 0xFB, 0x00, 0x00]) )
+
+        # A forward reference assumed to be in the zero page is widened to absolute indexed
+        context = asm64.create_context( 0x00FE )
+        output = context.run( "LDA table,X\n table:\n .byte $00" )
+        self.assertEqual( output, bytearray([0xFE, 0x00, 0xBD, 0x01, 0x01, 0x00]) )
+
+        with self.assertRaises(SystemExit):
+            asm64.create_context().run( "COL = #$05\n LDA COL,X" )
+
+
+    def test_align(self):
+
+        output = asm64.create_context().run( "RTS\n .align $04\n RTS\n .page\n .byte $AA" )
+        self.assertEqual( output[2:8], bytearray([0x60, 0xEA, 0xEA, 0xEA, 0x60, 0xEA]) )
+        self.assertEqual( len(output), 2 + 0x101 )
+        self.assertEqual( output[-1], 0xAA )
+
+        # Already aligned, no padding
+        self.assertEqual( asm64.create_context().run( ".page\n RTS\n .align 1\n RTS" ), bytearray([0x00, 0xC0, 0x60, 0x60]) )
+
+        for source in ( ".align $03", ".align", ".align $10000", ".align foo" ):
+            with self.assertRaises(SystemExit):
+                asm64.create_context().run( source )
+
+
+    def test_keep_in_page(self):
+
+        # Fits in the page, stays where it is
+        context = asm64.create_context( 0xC0F0 )
+        context.run( ".keeppage\n loop:\n DEX\n BNE loop\n .endkeeppage\n RTS" )
+        self.assertEqual( context._labels.export_text(), { "loop": "$c0f0" } )
+
+        # Would cross into $C100, moved there
+        context = asm64.create_context( 0xC0FE )
+        output = context.run( ".keeppage\n loop:\n DEX\n BNE loop\n .endkeeppage\n RTS" )
+        self.assertEqual( output, bytearray([0xFE, 0xC0, 0xEA, 0xEA, 0xCA, 0xD0, 0xFD, 0x60]) )
+        self.assertEqual( context._labels.export_text(), { "loop": "$c100" } )
+
+        # Only found to cross a page once far is widened, laying out again has to start from the block
+        context = asm64.create_context( 0x00F8 )
+        output = context.run( ".keeppage\n LDA far\n NOP\n NOP\n NOP\n NOP\n NOP\n NOP\n .endkeeppage\n far:\n RTS" )
+        self.assertEqual( output, bytearray([0xF8, 0x00]) + bytearray([0xEA]) * 8 + bytearray([0xAD, 0x09, 0x01]) + bytearray([0xEA]) * 6 + bytearray([0x60]) )
+        self.assertEqual( context._labels.export_text(), { "far": "$0109" } )
+
+        for source in ( ".keeppage\n RTS", ".endkeeppage", ".keeppage\n .keeppage", ".keeppage\n .page\n .endkeeppage",
+                        ".keeppage\n .org $C100\n .endkeeppage", ".keeppage\n .fill 257\n .endkeeppage" ):
+            with self.assertRaises(SystemExit):
+                asm64.create_context().run( source )
+
+
+    def test_page_crossings(self):
+
+        stream = io.StringIO()
+        loggy.set_sink( loggy.StreamSink( stream ) )
+
+        try:
+            profiled = assembler.Assembler()
+            profiled.set_profile( True )
+
+            # Reads of table, which straddles $C100, and the branch over it cross a page. Stores always
+            # take the extra cycle and literal addresses aren't known to be tables.
+            context = profiled.create_context( 0xC0F2 )
+            context.run( "LDA table,X\n STA table,X\n LDA $C0FF,X\n BEQ done\n table:\n .byte $01 $02 $03 $04\n done:\n RTS" )
+
+            self.assertEqual( stream.getvalue().splitlines(), [
+                "[?] LDA table,X on line 1 reads table at $C0FD-$C100 across a page boundary, +1 cycle when the index crosses it",
+                "[?] BEQ done on line 4 at $C0FB branches to done at $C101 on another page, +1 cycle when taken"
+            ] )
+            self.assertEqual( context.get_stats().counters["page_crossings"], 2 )
+
+            # Kept in a page, nothing crosses
+            stream.truncate( 0 )
+            context = profiled.create_context( 0xC0F8 )
+            context.run( ".keeppage\n loop:\n LDA table,X\n INX\n BNE loop\n .endkeeppage\n .page\n table:\n .byte $01 $02" )
+
+            self.assertEqual( stream.getvalue(), "" )
+            self.assertEqual( context.get_stats().counters["page_crossings"], 0 )
+        finally:
+            loggy.set_sink( loggy.StreamSink() )
+
+
+    def test_duplicate_labels(self):
+
+        # Caught on the first lay out, laying out again only moves labels
+        for source in ( "loop:\n INX\n loop:\n RTS", "FOO = $FB\n FOO:\n LDA FOO", "FOO:\n LDA FOO\n FOO = $FB" ):
+            with self.assertRaises(SystemExit):
+                asm64.create_context().run( source )
+
+
+    def test_operand_table(self):
+
+        table = assembler.AssemblyContext.get_operand_table( asm64._instruction_set )
+        modes = instruction_set.InstructionSet
+
+        self.assertEqual( table[ ( "LDA", TokenKind.IMMEDIATE ) ], ( modes.addressing_mode_Immediate, 0xA9, 2 ) )
+        self.assertEqual( table[ ( "STA", TokenKind.ABSOLUTE_X ) ], ( modes.addressing_mode_AbsoluteX, 0x9D, 3 ) )
+
+        # $xx is zero page, or relative for a branch
+        self.assertEqual( table[ ( "LDA", TokenKind.ZEROPAGE ) ], ( modes.addressing_mode_ZeroPage, 0xA5, 2 ) )
+        self.assertEqual( table[ ( "BNE", TokenKind.ZEROPAGE ) ], ( modes.addressing_mode_Relative, 0xD0, 2 ) )
+
+        self.assertNotIn( ( "JMP", TokenKind.IMMEDIATE ), table )
+
+        # Built once and shared
+        self.assertIs( assembler.AssemblyContext.get_operand_table( asm64._instruction_set ), table )
+
+
+    def test_variables(self):
+
+        context = asm64.create_context()
+        output = context.run( "PTR = $FB\n COL = #$05\n SCREEN = $0400\n LDA PTR\n LDX COL\n STA SCREEN\n LDY <SCREEN\n LDY >SCREEN" )
+
+        self.assertEqual( output, bytearray([0x00, 0xC0, 0xA5, 0xFB, 0xA2, 0x05, 0x8D, 0x00, 0x04, 0xA0, 0x00, 0xA0, 0x04]) )
+        self.assertEqual( context._labels.export_text(), { "PTR": "$fb", "COL": "#$05", "SCREEN": "$0400" } )
+
+
+    def test_profile(self):
+
+        profiled = assembler.Assembler()
+        self.assertIsNone( profiled.run_context( "RTS", 0xC000 ).get_stats() )
+
+        profiled.set_profile( True )
+        source = profiled.load_source( "fixtures/include.asm" )
+        stats = profiled.run_context( source, 0xC000 ).get_stats()
+
+        self.assertEqual( list( stats.phases ), [ "tokenize", "preassemble", "build_ir", "prescan", "assemble" ] )
+        self.assertEqual( stats.counters["include_cache_misses"], 1 )
+        self.assertEqual( stats.counters["bytes_emitted"], 10 )
+        self.assertEqual( stats.counters["label_lookups"], 2 )
+        self.assertEqual( stats.counters["layout_passes"], 1 )
+
+        # Tokens of the source and of everything it includes
+        self.assertLess( stats.counters["source_tokens"], stats.counters["tokens"] )
+
+        # The included file's tokens come from the cache the second time
+        self.assertEqual( profiled.run_context( source, 0xC000 ).get_stats().counters["include_cache_hits"], 1 )
 
 
     def test_calculate_relative_offset(self):
-        offset = asm64.calculate_relative_offset(0xC010, 0xC020)
+
+        context = asm64.create_context()
+
+        offset = context.calculate_relative_offset(0xC010, 0xC020)
         self.assertEqual(offset, 14, "Testing forward relative offset")
-        offset = asm64.calculate_relative_offset(0xC020, 0xC010)
+        offset = context.calculate_relative_offset(0xC020, 0xC010)
         self.assertEqual(offset, 238, "Testing backward relative offset")
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import assembler
+import assembly_cache
+
+class AssemblyCacheTests( unittest.TestCase ):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._cache_directory = os.path.join( self._directory.name, "cache" )
+        self._cache = assembly_cache.AssemblyCache( self._cache_directory, "test" )
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def write(self, filename, source):
+        with open( os.path.join(self._directory.name, filename), "w" ) as source_file:
+            source_file.write(source)
+
+
+    def test_lookup_store(self):
+        self.assertIsNone( self._cache.lookup( "RTS", 0xC000, self._directory.name ) )
+
+        self._cache.store( "RTS", 0xC000, self._directory.name, [], bytearray([0x00, 0xC0, 0x60]), { "foo": "$c000" }, [ "$C000  60" ], [ ( 0xC000, 0xC001 ) ] )
+
+        output, labels, listing, segments = self._cache.lookup( "RTS", 0xC000, self._directory.name )
+        self.assertEqual( output, bytearray([0x00, 0xC0, 0x60]) )
+        self.assertEqual( labels, { "foo": "$c000" } )
+        self.assertEqual( listing, [ "$C000  60" ] )
+        self.assertEqual( segments, [ ( 0xC000, 0xC001 ) ] )
+
+        # Base address and version are part of the key
+        self.assertIsNone( self._cache.lookup( "RTS", 0xD000, self._directory.name ) )
+        self.assertIsNone( assembly_cache.AssemblyCache( self._cache_directory, "other" ).lookup( "RTS", 0xC000, self._directory.name ) )
+
+        self.assertEqual( self._cache.hits, 1 )
+        self.assertEqual( self._cache.misses, 2 )
+        self.assertEqual( self._cache.stats()["entries"], 1 )
+        self.assertEqual( self._cache.stats()["manifests"], 1 )
+
+
+    def test_include_change(self):
+        self.write( "inc.asm", "RTS" )
+        included = [ os.path.join( self._directory.name, "inc.asm" ) ]
+
+        self._cache.store( "main", 0xC000, self._directory.name, included, bytearray([0x60]), {}, [] )
+        self.assertIsNotNone( self._cache.lookup( "main", 0xC000, self._directory.name ) )
+
+        self.write( "inc.asm", "INX" )
+        self.assertIsNone( self._cache.lookup( "main", 0xC000, self._directory.name ) )
+
+
+    def test_evict(self):
+        cache = assembly_cache.AssemblyCache( self._cache_directory, "test", 600 )
+
+        cache.store( "first", 0xC000, self._directory.name, [], bytearray(200), {}, [] )
+
+        # Make the first entry and its manifest the least recently used
+        for used, directory in enumerate( ( "manifests", "entries" ) ):
+            for filename in os.listdir( os.path.join( self._cache_directory, directory ) ):
+                os.utime( os.path.join( self._cache_directory, directory, filename ), ( used, used ) )
+
+        cache.store( "second", 0xC000, self._directory.name, [], bytearray(200), {}, [] )
+        cache.store( "third", 0xC000, self._directory.name, [], bytearray(200), {}, [] )
+
+        self.assertEqual( cache.evictions, 1 )
+        self.assertIsNone( cache.lookup( "first", 0xC000, self._directory.name ) )
+        self.assertIsNotNone( cache.lookup( "third", 0xC000, self._directory.name ) )
+
+        # Manifests count towards the size and go with the entries
+        stats = cache.stats()
+        self.assertEqual( ( stats["entries"], stats["manifests"] ), ( 2, 2 ) )
+        self.assertLessEqual( stats["bytes"], 600 )
+
+
+    def test_evict_manifests(self):
+        cache = assembly_cache.AssemblyCache( self._cache_directory, "test", 300 )
+
+        # Every different source leaves a manifest, old ones are evicted once they don't fit either
+        for index in range( 40 ):
+            cache.store( "source " + str(index), 0xC000, self._directory.name, [], bytearray(1), {}, [] )
+
+        stats = cache.stats()
+        self.assertLessEqual( stats["bytes"], 300 )
+        self.assertLess( stats["manifests"], 40 )
+        self.assertIsNotNone( cache.lookup( "source 39", 0xC000, self._directory.name ) )
+
+
+    def test_assembler_cache(self):
+        asm64 = assembler.Assembler()
+        asm64.set_cache( self._cache )
+
+        source = asm64.load_source("fixtures/include.asm")
+
+        expected = asm64.run_context( source, 0xC000 )
+        actual = asm64.run_context( source, 0xC000 )
+
+        self.assertEqual( expected._output, actual._output )
+        self.assertEqual( expected._labels, actual._labels )
+        self.assertEqual( [ ( start, bytes(data) ) for start, data in expected.get_segments() ], [ ( start, bytes(data) ) for start, data in actual.get_segments() ] )
+        self.assertEqual( self._cache.hits, 1 )
+        self.assertEqual( self._cache.stores, 1 )
+
+
+if __name__ == '__main__':
+        unittest.main()
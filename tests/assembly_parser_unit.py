@@ -5,6 +5,7 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import assembly_parser
+import instruction_set
 
 parser = assembly_parser.AssemblyParser()
 
@@ -18,6 +19,66 @@ class Parse6510Tests( unittest.TestCase ):
         self.assertEqual( matches[0], 'LDA' )
 
 
+    def test_parse6510_tokenize(self):
+        tokens = parser.tokenize( 'loop:\n    LDA #$65\n    STA $D020,X ; border\n    BNE loop' )
+
+        kinds = [ token.kind for token in tokens ]
+        expected = [ assembly_parser.TokenKind.LABEL_DECL, assembly_parser.TokenKind.LABEL, assembly_parser.TokenKind.IMMEDIATE,
+                     assembly_parser.TokenKind.LABEL, assembly_parser.TokenKind.ABSOLUTE_X, assembly_parser.TokenKind.COMMENT,
+                     assembly_parser.TokenKind.LABEL, assembly_parser.TokenKind.LABEL ]
+        self.assertEqual( kinds, expected )
+
+        self.assertEqual( tokens[2].text, '#$65' )
+        self.assertEqual( tokens[2].value, 0x65 )
+        self.assertEqual( tokens[4].value, 0xD020 )
+        self.assertEqual( tokens[0].value, None )
+
+        self.assertEqual( [ token.line for token in tokens ], [1, 2, 2, 3, 3, 3, 4, 4] )
+
+
+    def test_parse6510_tokenize_matches_parse(self):
+        source = '.org $C000\nFOO = #$20\n.byte $AA, $55\n.string "Hi"\nLDA ($FB),Y\nJMP ($C000)'
+        self.assertEqual( [ token.text for token in parser.tokenize(source) ], parser.parse(source) )
+
+
+    def test_parse6510_classify(self):
+        instructions = instruction_set.InstructionSet()
+        instructions.loadInstructions()
+
+        tokens = parser.tokenize( 'loop:\n    INX\n    JMP loop\n    .byte $AA' )
+        parser.classify( tokens, instructions )
+
+        kinds = [ token.kind for token in tokens ]
+        expected = [ assembly_parser.TokenKind.LABEL_DECL, assembly_parser.TokenKind.INSTRUCTION, assembly_parser.TokenKind.INSTRUCTION,
+                     assembly_parser.TokenKind.LABEL, assembly_parser.TokenKind.BYTESTRING_DECL ]
+        self.assertEqual( kinds, expected )
+
+
+    def test_parse6510_tokenize_runs(self):
+        tokens = parser.tokenize( '.byte $AA, $55 $0f\n.word $DEAD $beef\n.byte $20,X $C000 $01\nRTS' )
+
+        self.assertEqual( tokens[0].text, '.byte $AA, $55 $0f' )
+        self.assertEqual( tokens[0].value, bytes([0xAA, 0x55, 0x0F]) )
+        self.assertEqual( tokens[1].value, bytes([0xDE, 0xAD, 0xBE, 0xEF]) )
+
+        # Values that are operands end a run and are tokens of their own
+        self.assertEqual( [ token.text for token in tokens[2:] ], [ '.byte ', '$20,X', '$C000', '$01', 'RTS' ] )
+        self.assertEqual( tokens[2].value, None )
+        self.assertEqual( [ token.line for token in tokens ], [1, 2, 3, 3, 3, 3, 4] )
+
+
+    def test_parse6510_tokenize_alignment(self):
+        tokens = parser.tokenize( '.align $100 ; table\n.page\n.keeppage\nLDA table,X\nLDX zp,Y\n.endkeeppage' )
+
+        kinds = assembly_parser.TokenKind
+        self.assertEqual( [ token.kind for token in tokens ], [ kinds.ALIGN_DIRECTIVE, kinds.COMMENT, kinds.PAGE_DIRECTIVE, kinds.KEEP_PAGE_DIRECTIVE,
+                                                                kinds.LABEL, kinds.LABEL, kinds.LABEL, kinds.LABEL, kinds.END_KEEP_PAGE_DIRECTIVE ] )
+        self.assertEqual( tokens[0].text, '.align $100' )
+
+        # An indexed label is a single token
+        self.assertEqual( [ token.text for token in tokens[4:8] ], [ 'LDA', 'table,X', 'LDX', 'zp,Y' ] )
+
+
     def test_parse6510_matches_addressing_mode_immediate(self):
         for am in range(1,12):
             val = parser.matches_addressing_mode("#$65", am )
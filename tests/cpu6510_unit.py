@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import assembler
+import cpu6510
+
+asm64 = assembler.Assembler()
+
+class CPU6510Tests( unittest.TestCase ):
+
+    # Assemble source at base and load it into a new cpu
+    def load(self, source, base = 0xC000):
+        cpu = cpu6510.CPU6510()
+        self.assertEqual( cpu.load_prg( asm64.run( source, base ) ), base )
+        return cpu
+
+
+    def test_loop(self):
+        cpu = self.load( "LDX #$00\n loop:\n INX\n CPX #$03\n BNE loop\n RTS" )
+
+        # LDX 2, INX 2 + CPX 2 + BNE 3 taken twice and 2 not taken, RTS 6
+        self.assertEqual( cpu.call( 0xC000 ), 2 + 7 + 7 + 6 + 6 )
+        self.assertEqual( cpu.x, 3 )
+        self.assertEqual( cpu.instructions, 11 )
+
+
+    def test_page_crossing(self):
+        cpu = self.load( "LDX #$01\n LDA $C0FF,X\n RTS" )
+        self.assertEqual( cpu.call( 0xC000 ), 2 + 5 + 6 )
+
+        # Stores always take the extra cycle
+        cpu = self.load( "LDX #$01\n STA $C0FF,X\n RTS" )
+        self.assertEqual( cpu.call( 0xC000 ), 2 + 5 + 6 )
+
+        cpu = self.load( "LDX #$00\n LDA $C0FF,X\n RTS" )
+        self.assertEqual( cpu.call( 0xC000 ), 2 + 4 + 6 )
+
+        # ($FB),Y from $C0FF
+        cpu = self.load( "LDA #$FF\n STA $FB\n LDA #$C0\n STA $FC\n LDY #$01\n LDA ($FB),Y\n RTS" )
+        self.assertEqual( cpu.call( 0xC000 ), 2 + 3 + 2 + 3 + 2 + 6 + 6 )
+
+
+    def test_branch_page_crossing(self):
+        # The BNE at $C0FC branches back from $C0FE to $C0FB, a page crossing branch to $C100 takes 4
+        cpu = self.load( "LDX #$02\n loop:\n DEX\n BNE loop\n RTS", 0xC0F8 )
+        self.assertEqual( cpu.call( 0xC0F8 ), 2 + 2 + 3 + 2 + 2 + 6 )
+
+        cpu = self.load( "SEC\n BCS next\n NOP\n NOP\n next:\n RTS", 0xC0FB )
+        self.assertEqual( cpu.call( 0xC0FB ), 2 + 4 + 6 )
+
+
+    def test_subroutines(self):
+        cpu = self.load( "JSR sub\n LDA $FB\n RTS\n sub:\n LDA #$42\n PHA\n PLA\n STA $FB\n RTS" )
+
+        self.assertEqual( cpu.call( 0xC000 ), 6 + 2 + 3 + 4 + 3 + 6 + 3 + 6 )
+        self.assertEqual( cpu.a, 0x42 )
+        self.assertEqual( cpu.sp, 0xFF )
+
+
+    def test_stub(self):
+        cpu = self.load( "JSR $FFD2\n RTS" )
+        cpu.stub( 0xFFD2 )
+        self.assertEqual( cpu.call( 0xC000 ), 6 + 6 + 6 )
+
+
+    def test_arithmetic(self):
+        cpu = self.load( "CLC\n LDA #$7F\n ADC #$01\n RTS" )
+        cpu.call( 0xC000 )
+        self.assertEqual( cpu.a, 0x80 )
+        self.assertEqual( cpu.p & ( cpu6510.FLAG_V | cpu6510.FLAG_N | cpu6510.FLAG_C ), cpu6510.FLAG_V | cpu6510.FLAG_N )
+
+        cpu = self.load( "SEC\n LDA #$00\n SBC #$01\n RTS" )
+        cpu.call( 0xC000 )
+        self.assertEqual( cpu.a, 0xFF )
+        self.assertEqual( cpu.p & cpu6510.FLAG_C, 0 )
+
+        # Decimal mode, 19 + 28 = 47 and 47 - 28 = 19
+        cpu = self.load( "SED\n CLC\n LDA #$19\n ADC #$28\n STA $FB\n SEC\n SBC #$28\n RTS" )
+        cpu.call( 0xC000 )
+        self.assertEqual( cpu.memory[0xFB], 0x47 )
+        self.assertEqual( cpu.a, 0x19 )
+
+        cpu = self.load( "SED\n SEC\n LDA #$99\n ADC #$00\n RTS" )
+        cpu.call( 0xC000 )
+        self.assertEqual( cpu.a, 0x00 )
+        self.assertEqual( cpu.p & cpu6510.FLAG_C, cpu6510.FLAG_C )
+
+
+    def test_shifts(self):
+        # LDA #$81, ASL A, STA $FB, ROR $FB, LDA #$01, LSR A, ROL A, RTS
+        cpu = cpu6510.CPU6510()
+        cpu.load( bytes([0xA9, 0x81, 0x0A, 0x85, 0xFB, 0x66, 0xFB, 0xA9, 0x01, 0x4A, 0x2A, 0x60]), 0xC000 )
+
+        self.assertEqual( cpu.call( 0xC000 ), 2 + 2 + 3 + 5 + 2 + 2 + 2 + 6 )
+
+        # $81 << 1 = $02 carry set, ROR -> $81 carry clear, $01 >> 1 = $00 carry set, ROL -> $01
+        self.assertEqual( cpu.memory[0xFB], 0x81 )
+        self.assertEqual( cpu.a, 0x01 )
+
+
+    def test_jmp_indirect(self):
+        # The high byte of a pointer at $C1FF comes from $C100
+        cpu = self.load( "JMP ($C1FF)" )
+        cpu.load( bytes([0x10]), 0xC100 )
+        cpu.load( bytes([0x20]), 0xC1FF )
+        cpu.load( bytes([0x60]), 0x1020 )
+
+        self.assertEqual( cpu.call( 0xC000 ), 5 + 6 )
+
+
+    def test_errors(self):
+        cpu = self.load( "loop:\n JMP loop" )
+        with self.assertRaises( cpu6510.CPUError ):
+            cpu.call( 0xC000, 1000 )
+
+        cpu = self.load( ".byte $02" )
+        with self.assertRaises( cpu6510.CPUError ):
+            cpu.call( 0xC000 )
+
+
+if __name__ == '__main__':
+        unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import d64
+
+# Known good image, formatted and written by c1541
+KNOWN_GOOD = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'images', 'dev.d64'))
+
+def load( filename ):
+    with open( filename, "rb" ) as image_file:
+        return d64.D64Image( bytearray( image_file.read() ) )
+
+
+class D64Tests( unittest.TestCase ):
+
+    def test_read_known_good(self):
+        image = load( KNOWN_GOOD )
+
+        self.assertEqual( image.get_name(), ( "DISKNAME", "ID" ) )
+        self.assertEqual( image.get_directory(), [ { "name": "TOOLKIT64", "type": d64.D64Image.TYPE_PRG, "track": 17, "sector": 0, "blocks": 1 } ] )
+        self.assertEqual( image.get_free_blocks(), 663 )
+
+        program = image.read_file( "toolkit64" )
+        self.assertEqual( len(program), 141 )
+        self.assertEqual( program[0:2], bytes([0x00, 0xC0]) )
+
+
+    def test_build_matches_known_good(self):
+        program = load( KNOWN_GOOD ).read_file( "toolkit64" )
+
+        image = d64.D64Image.create( "diskname", "id" )
+        image.write_file( "toolkit64", program )
+
+        with open( KNOWN_GOOD, "rb" ) as image_file:
+            self.assertEqual( bytes( image._data ), image_file.read() )
+
+
+    def test_format(self):
+        image = d64.D64Image.create( "diskname", "id" )
+
+        self.assertEqual( image.get_directory(), [] )
+        self.assertEqual( image.get_free_blocks(), 664 )
+        self.assertFalse( image.is_free( 18, 0 ) )
+        self.assertFalse( image.is_free( 18, 1 ) )
+        self.assertTrue( image.is_free( 18, 2 ) )
+
+
+    def test_sector_chain_interleave(self):
+        image = d64.D64Image.create( "diskname", "id" )
+        program = bytes( range(256) ) * 3
+
+        image.write_file( "big", program )
+
+        entry = image.get_directory()[0]
+        self.assertEqual( entry["blocks"], 4 )
+        self.assertEqual( image.get_chain( entry["track"], entry["sector"] ), [ ( 17, 0 ), ( 17, 10 ), ( 17, 20 ), ( 17, 8 ) ] )
+        self.assertEqual( image.read_file( "big" ), program )
+        self.assertEqual( image.get_free_blocks(), 660 )
+
+
+    def test_replace_and_delete(self):
+        image = d64.D64Image.create( "diskname", "id" )
+
+        image.write_file( "prog", bytes(600) )
+        image.write_file( "prog", bytes([0x00, 0xC0, 0x60]) )
+
+        self.assertEqual( len( image.get_directory() ), 1 )
+        self.assertEqual( image.read_file( "prog" ), bytes([0x00, 0xC0, 0x60]) )
+        self.assertEqual( image.get_free_blocks(), 663 )
+
+        self.assertTrue( image.delete_file( "prog" ) )
+        self.assertFalse( image.delete_file( "prog" ) )
+        self.assertIsNone( image.read_file( "prog" ) )
+        self.assertEqual( image.get_free_blocks(), 664 )
+
+
+    def test_directory_grows(self):
+        image = d64.D64Image.create( "diskname", "id" )
+
+        for idx in range( 0, 9 ):
+            image.write_file( "file" + str(idx), bytes([idx]) )
+
+        self.assertEqual( [ entry["name"] for entry in image.get_directory() ], [ "FILE" + str(idx) for idx in range( 0, 9 ) ] )
+
+        # The ninth entry goes in a new directory sector, three sectors on
+        self.assertEqual( image.get_chain( 18, 1 ), [ ( 18, 1 ), ( 18, 4 ) ] )
+        self.assertEqual( image.read_file( "file8" ), bytes([8]) )
+
+
+    def test_disk_full(self):
+        image = d64.D64Image.create( "diskname", "id" )
+
+        with self.assertRaises(SystemExit):
+            image.write_file( "huge", bytes( 665 * 254 ) )
+
+        # A file that doesn't fit leaves the one it would replace alone, one that fits once it is gone replaces it
+        image.write_file( "prog", bytes( 600 * 254 ) )
+        with self.assertRaises(SystemExit):
+            image.write_file( "prog", bytes( 665 * 254 ) )
+        self.assertEqual( image.read_file( "prog" ), bytes( 600 * 254 ) )
+
+        image.write_file( "prog", bytes( 664 * 254 ) )
+        self.assertEqual( image.get_free_blocks(), 0 )
+
+
+    def test_open_updates_in_place(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join( directory, "dev.d64" )
+            shutil.copyfile( KNOWN_GOOD, filename )
+
+            with d64.D64Image.open( filename ) as image:
+                self.assertTrue( image.is_open() )
+                image.write_file( "border", bytes([0x00, 0xC0, 0x60]) )
+
+            self.assertFalse( image.is_open() )
+            self.assertFalse( d64.D64Image.create( "diskname", "id" ).is_open() )
+
+            image = load( filename )
+            self.assertEqual( [ entry["name"] for entry in image.get_directory() ], [ "TOOLKIT64", "BORDER" ] )
+            self.assertEqual( image.read_file( "border" ), bytes([0x00, 0xC0, 0x60]) )
+            self.assertEqual( os.path.getsize( filename ), d64.D64Image.SIZE )
+
+
+if __name__ == '__main__':
+        unittest.main()
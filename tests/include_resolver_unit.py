@@ -0,0 +1,100 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import assembly_parser
+import include_resolver
+import instruction_set
+
+parser = assembly_parser.AssemblyParser()
+
+class IncludeResolverTests( unittest.TestCase ):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._resolver = include_resolver.IncludeResolver( parser, instruction_set.InstructionSet.shared() )
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def write(self, filename, source):
+        with open( os.path.join(self._directory.name, filename), "w" ) as source_file:
+            source_file.write(source)
+
+
+    def test_resolve_nested(self):
+        self.write( "outer.asm", "outer:\n .include \"inner.asm\"\n RTS" )
+        self.write( "inner.asm", "inner:\n INX" )
+
+        tokens = parser.tokenize( 'JMP go\n .include "outer.asm"\ngo: .include "inner.asm"\n RTS' )
+
+        included = []
+        resolved = self._resolver.resolve( tokens, self._directory.name, included )
+
+        expected = [ 'JMP', 'go', 'outer:', 'inner:', 'INX', 'RTS', 'go:', 'inner:', 'INX', 'RTS' ]
+        self.assertEqual( [ token.text for token in resolved ], expected )
+
+        self.assertEqual( [ os.path.basename(path) for path in included ], [ "outer.asm", "inner.asm", "inner.asm" ] )
+
+
+    def test_resolve_fixture(self):
+        directory = os.path.abspath( os.path.join( os.path.dirname(__file__), '..', 'fixtures' ) )
+
+        # The directive and its filename are replaced by the included file's tokens
+        tokens = parser.tokenize( 'RTS .include "included.asm" RTS' )
+        resolved = self._resolver.resolve( tokens, directory, [] )
+
+        self.assertEqual( [ token.text for token in resolved ], [ 'RTS', 'inc:', 'LDA', '#$65', 'RTS', 'RTS' ] )
+
+
+    def test_resolve_without_includes(self):
+        tokens = parser.tokenize( 'LDA #$00\n RTS' )
+        self.assertIs( self._resolver.resolve( tokens, self._directory.name ), tokens )
+
+
+    def test_load_tokens_cache(self):
+        self.write( "inc.asm", "inc:\n RTS" )
+        fullpath = os.path.join( self._directory.name, "inc.asm" )
+
+        first = self._resolver.load_tokens( fullpath )
+        second = self._resolver.load_tokens( fullpath )
+
+        self.assertIs( first, second )
+        self.assertEqual( self._resolver.misses, 1 )
+        self.assertEqual( self._resolver.hits, 1 )
+
+        # Tokens are classified when they are loaded
+        self.assertEqual( first[1].kind, assembly_parser.TokenKind.INSTRUCTION )
+
+        # Touching the file without changing it still hits the cache
+        os.utime( fullpath, ns=( 0, 0 ) )
+        self.assertIs( self._resolver.load_tokens( fullpath ), first )
+
+        # Changing it re-tokenizes
+        self.write( "inc.asm", "inc:\n INX\n RTS" )
+        os.utime( fullpath, ns=( 1, 1 ) )
+        self.assertEqual( len( self._resolver.load_tokens( fullpath ) ), 3 )
+        self.assertEqual( self._resolver.misses, 2 )
+
+
+    def test_resolve_cycle(self):
+        self.write( "a.asm", ".include \"b.asm\"" )
+        self.write( "b.asm", ".include \"a.asm\"" )
+
+        tokens = parser.tokenize( '.include "a.asm"' )
+
+        with self.assertRaises(SystemExit):
+            self._resolver.resolve( tokens, self._directory.name )
+
+
+    def test_load_tokens_missing(self):
+        with self.assertRaises(SystemExit):
+            self._resolver.load_tokens( os.path.join( self._directory.name, "missing.asm" ) )
+
+
+if __name__ == '__main__':
+        unittest.main()
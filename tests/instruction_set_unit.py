@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # Import main modules
 import instruction_set
+import instruction_set as instruction_set_module
 
 instruction_set = instruction_set.InstructionSet()
 
@@ -70,6 +71,92 @@ class MnemonicsTests( unittest.TestCase ):
         instruction_set.initialise()
 
 
+    def test_mnemonics_opcode_tables( self ):
+        instruction_set.loadInstructions()
+
+        # Every opcode is unique so the decode table holds all of them
+        self.assertEqual( len( [ entry for entry in instruction_set._decode if entry != None ] ), 151 )
+
+        self.assertEqual( instruction_set.get_opcode( "LDA", instruction_set.addressing_mode_Immediate ), 0xA9 )
+        self.assertEqual( instruction_set.get_opcode( "LDA", instruction_set.addressing_mode_Indirect ), None )
+        self.assertEqual( instruction_set.get_cycles( "STA", instruction_set.addressing_mode_AbsoluteX ), 5 )
+
+        self.assertEqual( instruction_set.decode( 0x6D ), ( "ADC", instruction_set.addressing_mode_Absolute, 3, 4 ) )
+        self.assertEqual( instruction_set.decode( 0x60 ), ( "RTS", instruction_set.addressing_mode_Implied, 1, 6 ) )
+        self.assertEqual( instruction_set.decode( 0x02 ), None )
+
+        instruction_set.initialise()
+
+
+    def test_mnemonics_addOpcode_duplicate_opcode( self ):
+        instruction_set.addInstruction('LDA', 'Load to the accumulator')
+        instruction_set.addInstruction('LDX', 'Load to index X')
+
+        val = instruction_set.addOpcode( "LDA", instruction_set.addressing_mode_Immediate, 0xA9 )
+        self.assertTrue(val)
+
+        val = instruction_set.addOpcode( "LDX", instruction_set.addressing_mode_Immediate, 0xA9 )
+        self.assertFalse(val)
+
+        instruction_set.initialise()
+
+
+    def test_mnemonics_disassemble( self ):
+        instruction_set.loadInstructions()
+
+        code = bytearray([ 0xA2, 0x00, 0x8E, 0x20, 0xD0, 0xE8, 0xD0, 0xF8, 0x60, 0x02 ])
+        val = instruction_set.disassemble( code, 0xC000 )
+
+        expected = [
+            ( 0xC000, "LDX", instruction_set.addressing_mode_Immediate, 0x00 ),
+            ( 0xC002, "STX", instruction_set.addressing_mode_Absolute, 0xD020 ),
+            ( 0xC005, "INX", instruction_set.addressing_mode_Implied, None ),
+            ( 0xC006, "BNE", instruction_set.addressing_mode_Relative, 0xF8 ),
+            ( 0xC008, "RTS", instruction_set.addressing_mode_Implied, None ),
+            ( 0xC009, None, None, 0x02 )
+        ]
+        self.assertEqual( val, expected )
+
+        instruction_set.initialise()
+
+
+    def test_mnemonics_loadFrozen( self ):
+        # The frozen table has to be regenerated whenever loadInstructions changes
+        instruction_set.loadInstructions()
+
+        frozen = instruction_set_module.InstructionSet()
+        frozen.loadFrozen()
+
+        self.assertEqual( frozen._instructions, instruction_set._instructions )
+        self.assertEqual( frozen._opcodes, instruction_set._opcodes )
+        self.assertEqual( frozen._cycles, instruction_set._cycles )
+        self.assertEqual( frozen._decode, instruction_set._decode )
+
+        self.assertIs( instruction_set_module.InstructionSet.shared(), instruction_set_module.InstructionSet.shared() )
+
+        instruction_set.initialise()
+
+
+    def test_mnemonics_get_cycles( self ):
+        instruction_set.loadInstructions()
+
+        # Every opcode has its base cycles
+        for opcode, entry in enumerate( instruction_set._decode ):
+            if ( entry != None ):
+                self.assertGreaterEqual( entry[3], 2, '{:02x}'.format(opcode) )
+
+        self.assertEqual( instruction_set.get_cycles( "LDA", instruction_set.addressing_mode_AbsoluteX ), 4 )
+        self.assertEqual( instruction_set.get_cycles( "STA", instruction_set.addressing_mode_AbsoluteX ), 5 )
+
+        self.assertEqual( instruction_set.get_cycle_penalty( "LDA", instruction_set.addressing_mode_AbsoluteX ), instruction_set.cycle_penalty_Page )
+        self.assertEqual( instruction_set.get_cycle_penalty( "CMP", instruction_set.addressing_mode_Indirect_Indexed_Y ), instruction_set.cycle_penalty_Page )
+        self.assertEqual( instruction_set.get_cycle_penalty( "STA", instruction_set.addressing_mode_AbsoluteX ), instruction_set.cycle_penalty_None )
+        self.assertEqual( instruction_set.get_cycle_penalty( "LDA", instruction_set.addressing_mode_Absolute ), instruction_set.cycle_penalty_None )
+        self.assertEqual( instruction_set.get_cycle_penalty( "BNE", instruction_set.addressing_mode_Relative ), instruction_set.cycle_penalty_Branch )
+
+        instruction_set.initialise()
+
+
     def test_mnemonics_get_instruction_length(self):
         # Implied
         val = instruction_set.get_instruction_length(0)
@@ -0,0 +1,151 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import assembler
+import listing
+
+asm64 = assembler.Assembler()
+
+class ListingTests( unittest.TestCase ):
+
+    def test_format_row(self):
+        context = asm64.create_context()
+        context.run( "LDA #$65\n STA $d020\n RTS\n .byte $AA $55" )
+
+        rows = [ listing.format_row( node ) for node in context._ir ]
+
+        self.assertEqual( rows, [
+            "$C000  A9 65                         LDA #$65 ",
+            "$C002  8D 20 D0                      STA $d020 ",
+            "$C005  60                            RTS ",
+            "$C006  AA 55                         $AA $55 "
+        ] )
+
+        # Machine code too long for its column is still followed by a space
+        context = asm64.create_context()
+        context.run( ".byte $01 $02 $03 $04 $05 $06 $07 $08 $09 $0A\n .byte $01 $02 $03 $04 $05 $06 $07 $08 $09 $0A $0B $0C" )
+
+        self.assertEqual( [ listing.format_row( node ) for node in context._ir ], [
+            "$C000  01 02 03 04 05 06 07 08 09 0A $01 $02 $03 $04 $05 $06 $07 $08 $09 $0A ",
+            "$C00A  01 02 03 04 05 06 07 08 09 0A 0B 0C $01 $02 $03 $04 $05 $06 $07 $08 $09 $0A $0B $0C "
+        ] )
+
+
+    def test_listing_rows(self):
+        context = asm64.create_context()
+        context.run( "loop:\n INX\n BNE loop" )
+
+        # Labels emit nothing so have no row
+        self.assertEqual( list( listing.listing_rows( context._ir ) ), [
+            "$C000  E8                            INX ",
+            "$C001  D0 FD                         BNE $fd "
+        ] )
+
+        self.assertEqual( context.get_listing(), list( context.listing_rows() ) )
+
+
+    def test_resolved_operands(self):
+        context = asm64.create_context()
+        context.run( "PTR = $FB\n start:\n LDA <data\n LDX >data\n STA PTR\n LDA data,Y\n JMP start\n data:\n .byte $01" )
+
+        # Labels and variables are listed as the operand they assembled to
+        self.assertEqual( [ row[37:] for row in context.listing_rows() ], [
+            "LDA #$0c ",
+            "LDX #$c0 ",
+            "STA $fb ",
+            "LDA $c00c,Y ",
+            "JMP $c000 ",
+            "$01 "
+        ] )
+
+
+    def test_labels_program(self):
+        context = asm64.run_file_context( os.path.join( os.path.dirname(__file__), "..", "asm", "labels.asm" ), 0xC000 )
+
+        # The rows dump_assembly() used to log, variables are listed in lower case like labels
+        self.assertEqual( context.get_listing()[:13], [
+            "$C000  AD 00 C0                      LDA $c000 ",
+            "$C003  A2 F8                         LDX #$f8 ",
+            "$C005  A9 15                         LDA #$15 ",
+            "$C007  A9 C0                         LDA #$c0 ",
+            "$C009  8E 00 C0                      STX $c000 ",
+            "$C00C  E8                            INX ",
+            "$C00D  E0 10                         CPX #$10 ",
+            "$C00F  D0 01                         BNE $01 ",
+            "$C011  60                            RTS ",
+            "$C012  4C 05 C0                      JMP $c005 ",
+            "$C015  A9 65                         LDA #$65 ",
+            "$C017  8D 20 D0                      STA $D020 ",
+            "$C01A  60                            RTS "
+        ] )
+
+
+    def test_cycles(self):
+        context = asm64.create_context()
+        context.run( "LDX #$00\n loop:\n LDA $d000,X\n STA $0400,X\n INX\n BNE loop\n done:\n RTS\n .byte $AA" )
+
+        rows = list( context.listing_rows( True ) )
+
+        self.assertEqual( rows[:7], [
+            "$C000      2  2   A2 00                         LDX #$00 ",
+            "$C002      3  4*  BD 00 D0                      LDA $d000,X ",
+            "$C005      3  5   9D 00 04                      STA $0400,X ",
+            "$C008      1  2   E8                            INX ",
+            "$C009      2  2** D0 F7                         BNE $f7 ",
+            "$C00B      1  6   60                            RTS ",
+            "$C00C      1      AA                            $AA "
+        ] )
+
+        # Code before the first label is a block of its own
+        self.assertEqual( listing.block_totals( context._ir, asm64._instruction_set ), [
+            ( None, 0xC000, 2, 2, 0, 0 ),
+            ( "loop", 0xC002, 9, 13, 1, 1 ),
+            ( "done", 0xC00B, 2, 6, 0, 0 )
+        ] )
+        self.assertEqual( rows[-2], "; $C002  loop                         9 bytes      13 cycles    1 *    1 **" )
+
+        # Without cycles the listing is as before
+        self.assertEqual( list( context.listing_rows() )[0], "$C000  A2 00                         LDX #$00 " )
+
+
+    def test_padding(self):
+        context = asm64.create_context()
+        context.run( "RTS\n .align $04\n RTS\n .page\n RTS" )
+
+        # Padding is listed once as the NOPs it was filled with, an .align that padded nothing isn't listed
+        self.assertEqual( list( context.listing_rows() ), [
+            "$C000  60                            RTS ",
+            "$C001  EA x 3                        .align $04 ",
+            "$C004  60                            RTS ",
+            "$C005  EA x 251                      .page ",
+            "$C100  60                            RTS "
+        ] )
+
+        context = asm64.create_context()
+        context.run( ".page\n RTS" )
+        self.assertEqual( len( list( listing.listing_rows( context._ir ) ) ), 1 )
+
+
+    def test_listing_writer(self):
+        context = asm64.create_context()
+        context.run( "INX\n RTS" )
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join( directory, "out.lst" )
+
+            with listing.ListingWriter( filename ) as writer:
+                writer.write_rows( context.listing_rows() )
+
+            self.assertEqual( writer.rows, 2 )
+
+            with open( filename, "r" ) as listing_file:
+                self.assertEqual( listing_file.read(), "$C000  E8                            INX \n$C001  60                            RTS \n" )
+
+
+if __name__ == '__main__':
+        unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import loggy
+
+# Formats its message on demand, counting how often that happens
+class Message:
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted = self.formatted + 1
+        return "message"
+
+
+class LoggyTests( unittest.TestCase ):
+
+    def setUp(self):
+        self._level = loggy.LOG_LEVEL
+        self._stream = io.StringIO()
+        loggy.set_sink( loggy.StreamSink( self._stream ) )
+
+    def tearDown(self):
+        loggy.LOG_LEVEL = self._level
+        loggy.set_sink( loggy.StreamSink() )
+
+
+    def test_enabled(self):
+        loggy.LOG_LEVEL = loggy.LOG_WARN
+
+        self.assertTrue( loggy.enabled( loggy.LOG_ERROR ) )
+        self.assertTrue( loggy.enabled( loggy.LOG_WARN ) )
+        self.assertFalse( loggy.enabled( loggy.LOG_DIAGNOSTIC ) )
+
+
+    def test_log_deferred(self):
+        loggy.LOG_LEVEL = loggy.LOG_WARN
+        message = Message()
+
+        # Arguments are only formatted when the level is enabled
+        loggy.log( loggy.LOG_DIAGNOSTIC, "Hidden %s", message )
+        self.assertEqual( message.formatted, 0 )
+        self.assertEqual( self._stream.getvalue(), "" )
+
+        loggy.log( loggy.LOG_WARN, "Shown %s at $%04x", message, 0xC000 )
+        self.assertEqual( message.formatted, 1 )
+        self.assertEqual( self._stream.getvalue(), "[?] Shown message at $c000\n" )
+
+        # No arguments, no formatting
+        loggy.log( loggy.LOG_ERROR, "100%" )
+        self.assertTrue( self._stream.getvalue().endswith( "[!] 100%\n" ) )
+
+
+    def test_sink_levels(self):
+        loggy.LOG_LEVEL = loggy.LOG_DIAGNOSTIC
+
+        console = io.StringIO()
+        loggy.add_sink( loggy.StreamSink( console ), loggy.LOG_WARN )
+
+        loggy.log( loggy.LOG_WARN, "warning" )
+        loggy.log( loggy.LOG_DIAGNOSTIC, "trace" )
+
+        self.assertEqual( self._stream.getvalue(), "[?] warning\n[@] trace\n" )
+        self.assertEqual( console.getvalue(), "[?] warning\n" )
+
+
+    def test_file_sink(self):
+        loggy.LOG_LEVEL = loggy.LOG_DIAGNOSTIC
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join( directory, "trace.log" )
+
+            loggy.set_sink( loggy.FileSink( filename ) )
+            loggy.log( loggy.LOG_DIAGNOSTIC, "Stored label %s", "loop" )
+            loggy.set_sink( loggy.StreamSink( self._stream ) )
+
+            with open( filename, "r" ) as log_file:
+                self.assertEqual( log_file.read(), "[@] Stored label loop\n" )
+
+
+    def test_logging_sink(self):
+        loggy.LOG_LEVEL = loggy.LOG_INFO
+        loggy.set_sink( loggy.LoggingSink( "retroasm.test" ) )
+
+        with self.assertLogs( "retroasm.test", level="INFO" ) as captured:
+            loggy.log( loggy.LOG_INFO, "Setting origin to %#x", 0xC000 )
+
+        self.assertEqual( captured.output, [ "INFO:retroasm.test:Setting origin to 0xc000" ] )
+
+
+if __name__ == '__main__':
+        unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import memory_image
+
+class MemoryImageTests( unittest.TestCase ):
+
+    def test_segments(self):
+        image = memory_image.MemoryImage()
+
+        image.memory[0xC010:0xC012] = bytes([0xAA, 0x55])
+        image.add_segment( 0xC010, 0xC012 )
+        image.memory[0xC000] = 0x60
+        image.add_segment( 0xC000, 0xC001 )
+
+        # Empty segments aren't recorded
+        image.add_segment( 0xD000, 0xD000 )
+
+        self.assertEqual( image.get_range(), ( 0xC000, 0xC012 ) )
+        self.assertEqual( [ ( start, bytes(data) ) for start, data in image.get_segments() ], [ ( 0xC000, bytes([0x60]) ), ( 0xC010, bytes([0xAA, 0x55]) ) ] )
+
+        # Segments are views of the image, not copies
+        self.assertIsInstance( image.get_segments()[0][1], memoryview )
+
+        self.assertEqual( image.get_prg( 0x0801 ), bytearray([0x00, 0xC0, 0x60]) + bytearray(15) + bytearray([0xAA, 0x55]) )
+
+
+    def test_empty(self):
+        image = memory_image.MemoryImage()
+
+        self.assertIsNone( image.get_range() )
+        self.assertEqual( bytes( image.get_data() ), b"" )
+        self.assertEqual( image.get_prg( 0x0801 ), bytearray([0x01, 0x08]) )
+
+
+    def test_overlaps(self):
+        image = memory_image.MemoryImage()
+
+        image.add_segment( 0xC000, 0xC010 )
+        image.add_segment( 0xC020, 0xC030 )
+        image.add_segment( 0xC008, 0xC028 )
+
+        self.assertEqual( image.overlaps, [ ( 0xC008, 0xC010 ), ( 0xC020, 0xC028 ) ] )
+
+
+    def test_prg_header(self):
+        self.assertEqual( memory_image.prg_header( 0xC000 ), bytearray([0x00, 0xC0]) )
+
+
+if __name__ == '__main__':
+        unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+import tempfile
+import hashlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import output_formats
+
+class OutputFormatsTests( unittest.TestCase ):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def read(self, filename):
+        with open( filename, "rb" ) as output_file:
+            return output_file.read()
+
+
+    def test_write_buffers(self):
+        filename = os.path.join( self._directory.name, "out" )
+        data = bytearray( range(256) )
+
+        self.assertEqual( output_formats.write_buffers( filename, [ b"\x00\xC0", memoryview(data)[16:32], b"" ] ), 18 )
+        self.assertEqual( self.read( filename ), b"\x00\xC0" + bytes( range(16, 32) ) )
+
+
+    def test_prg_raw(self):
+        filename = os.path.join( self._directory.name, "out" )
+        entries = [ ( "out", 0xC000, memoryview( bytearray([0xA9, 0x00, 0x60]) ) ) ]
+
+        self.assertEqual( output_formats.get_writer( "prg" ).write( filename, entries ), [ ( filename, 5 ) ] )
+        self.assertEqual( self.read( filename ), bytes([0x00, 0xC0, 0xA9, 0x00, 0x60]) )
+
+        self.assertEqual( output_formats.get_writer( "raw" ).write( filename + ".bin", entries ), [ ( filename + ".bin", 3 ) ] )
+        self.assertEqual( self.read( filename + ".bin" ), bytes([0xA9, 0x00, 0x60]) )
+
+        # Several entries, or split, go in a file each
+        entries.append( ( "out_d000", 0xD000, bytes([0x60]) ) )
+        written = output_formats.get_writer( "prg" ).write( filename, entries )
+
+        self.assertEqual( written, [ ( filename + "_c000", 5 ), ( filename + "_d000", 3 ) ] )
+        self.assertEqual( self.read( filename + "_d000" ), bytes([0x00, 0xD0, 0x60]) )
+
+        self.assertEqual( output_formats.get_writer( "raw" ).write( filename + ".bin", entries[:1], True ), [ ( filename + "_c000.bin", 3 ) ] )
+
+
+    def test_t64(self):
+        filename = os.path.join( self._directory.name, "test.t64" )
+
+        # asm/benchmarks has the checksum of test.t64
+        output_formats.get_writer( "t64" ).write( filename, [ ( "test", 0xC000, bytes([0xA9, 0x00, 0x8D, 0x00, 0xC0, 0x60]) ) ] )
+        self.assertEqual( hashlib.md5( self.read( filename ) ).hexdigest(), "307e2678aadf8bbd947bdda0c59d9c24" )
+
+        entries = [ ( "border", 0xC000, bytes([0xEE, 0x20, 0xD0, 0x60]) ), ( "hires", 0x2000, memoryview( bytearray(300) ) ) ]
+        output_formats.get_writer( "t64" ).write( filename, entries, tape_name = "builds" )
+        tape = self.read( filename )
+
+        self.assertEqual( tape[0:20], b"C64S tape image file" )
+        self.assertEqual( tape[40:64], b"BUILDS".ljust( 24 ) )
+        self.assertEqual( tape[34:38], bytes([2, 0, 2, 0]) )
+        self.assertEqual( len(tape), 64 + 2 * 32 + 4 + 300 )
+
+        # Second entry, start, end and offset of its data
+        entry = tape[96:128]
+        self.assertEqual( entry[2:6], bytes([0x00, 0x20, 0x2C, 0x21]) )
+        self.assertEqual( int.from_bytes( entry[8:12], byteorder='little' ), 64 + 2 * 32 + 4 )
+        self.assertEqual( entry[16:32], b"HIRES".ljust( 16 ) )
+
+
+    def test_register_format(self):
+
+        class ReverseWriter:
+            EXTENSION = ".rev"
+
+            def write( self, filename, entries, split = False ):
+                return [ ( filename, output_formats.write_buffers( filename, [ bytes( reversed( data ) ) for name, address, data in entries ] ) ) ]
+
+        self.assertIsNone( output_formats.get_writer( "rev" ) )
+        output_formats.register_format( "rev", ReverseWriter() )
+
+        filename = os.path.join( self._directory.name, "out.rev" )
+        output_formats.get_writer( "rev" ).write( filename, [ ( "out", 0xC000, bytes([1, 2, 3]) ) ] )
+        self.assertEqual( self.read( filename ), bytes([3, 2, 1]) )
+
+        del output_formats.FORMATS["rev"]
+
+
+if __name__ == '__main__':
+        unittest.main()
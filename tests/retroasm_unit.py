@@ -0,0 +1,130 @@
+import unittest
+import sys
+import os
+import tempfile
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import retroasm
+import d64
+
+class RetroasmTests( unittest.TestCase ):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def write(self, filename, source):
+        path = os.path.join(self._directory.name, filename)
+        with open( path, "w" ) as source_file:
+            source_file.write(source)
+        return path
+
+    def read(self, filename):
+        with open( filename, "rb" ) as output_file:
+            return output_file.read()
+
+
+    def test_expand_inputs(self):
+        first = self.write( "a.asm", "RTS" )
+        second = self.write( "b.asm", "RTS" )
+        self.write( "c.txt", "RTS" )
+
+        list_filename = self.write( "list.txt", "# programs\n" + first + "\n\n" + os.path.join(self._directory.name, "*.asm") + "\n" )
+
+        self.assertEqual( retroasm.expand_inputs( [ os.path.join(self._directory.name, "*.asm") ] ), [ first, second ] )
+        self.assertEqual( retroasm.expand_inputs( [ second ], list_filename ), [ second, first ] )
+
+
+    def test_assemble_file(self):
+        output_filename = os.path.join( self._directory.name, "border" )
+
+        filename, output, size, elapsed, error, written, programs = retroasm.assemble_file( "fixtures/border.asm", 0xC000, output_filename )
+
+        self.assertIsNone( error )
+        self.assertEqual( size, 18 )
+        self.assertEqual( written, [ output_filename ] )
+        self.assertEqual( programs, [] )
+        self.assertEqual( os.path.getsize(output_filename), 18 )
+
+        # Programs for a disk image are PRGs whatever the output format
+        filename, output, size, elapsed, error, written, programs = retroasm.assemble_file( "fixtures/border.asm", 0xC000, output_filename + ".t64", None, False, "t64", True )
+
+        self.assertEqual( size, 64 + 32 + 16 )
+        self.assertEqual( written, [ output_filename + ".t64" ] )
+        self.assertEqual( programs, [ ( "border", self.read( output_filename ) ) ] )
+
+        filename, output, size, elapsed, error, written, programs = retroasm.assemble_file( self.write( "bad.asm", "JMP nowhere" ), 0xC000, output_filename + "_bad" )
+
+        self.assertIsNotNone( error )
+        self.assertFalse( os.path.exists( output_filename + "_bad" ) )
+
+
+    def test_batch(self):
+        filenames = [ "fixtures/border.asm", self.write( "bad.asm", "JMP nowhere" ), "fixtures/include.asm" ]
+        output_directory = os.path.join( self._directory.name, "out" )
+        os.makedirs( output_directory )
+
+        # The failing file doesn't stop the others
+        self.assertEqual( retroasm.batch( filenames, 0xC000, output_directory, 2, None, 0 ), 1 )
+        self.assertEqual( sorted( os.listdir(output_directory) ), [ "border", "include" ] )
+
+
+    def test_get_programs(self):
+        context = retroasm.assembler.Assembler().run_context( "RTS\n .org $c010\n INX", 0xC000 )
+
+        programs = retroasm.get_programs( context, "out/split.prg" )
+        self.assertEqual( [ ( name, address, len(data) ) for name, address, data in programs ], [ ( "split", 0xC000, 17 ) ] )
+
+        programs = retroasm.get_programs( context, "out/split.prg", True )
+        self.assertEqual( [ ( name, address, bytes(data) ) for name, address, data in programs ], [ ( "split_c000", 0xC000, bytes([0x60]) ), ( "split_c010", 0xC010, bytes([0xE8]) ) ] )
+
+        self.assertEqual( retroasm.get_prg_files( programs ), [ ( "split_c000", bytearray([0x00, 0xC0, 0x60]) ), ( "split_c010", bytearray([0x10, 0xC0, 0xE8]) ) ] )
+
+        self.assertEqual( retroasm.generate_output_filename( "asm/test.asm", "t64" ), "asm/test.t64" )
+
+
+    def test_write_listing(self):
+        context = retroasm.assembler.Assembler().run_context( "loop:\n INX\n BNE loop", 0xC000 )
+        filename = os.path.join( self._directory.name, "out.lst" )
+
+        retroasm.write_listing( context, filename, True )
+
+        rows = self.read( filename ).decode().splitlines()
+        self.assertEqual( rows[0], "$C000      1  2   E8                            INX " )
+        self.assertEqual( rows[-1], "; $C000  loop                         3 bytes       4 cycles    0 *    1 **" )
+
+
+    def test_get_profile(self):
+        asm64 = retroasm.assembler.Assembler()
+        asm64.set_profile( True )
+
+        profile = json.loads( retroasm.get_profile( asm64.run_context( "LDA #$01\n RTS", 0xC000 ), "test.asm" ) )
+
+        self.assertEqual( profile["file"], "test.asm" )
+        self.assertEqual( profile["counters"]["bytes_emitted"], 3 )
+        self.assertIn( "assemble", profile["phases"] )
+
+
+    def test_write_disk(self):
+        disk_filename = os.path.join( self._directory.name, "test.d64" )
+
+        retroasm.write_disk( disk_filename, "test,01", [ ( "out/border", bytearray([0x00, 0xC0, 0x60]) ) ] )
+
+        # Updating an existing image replaces files of the same name
+        retroasm.write_disk( disk_filename, None, [ ( "out/border", bytearray([0x00, 0xC0, 0xEA, 0x60]) ), ( "hires", bytearray([0x00, 0x20]) ) ] )
+
+        with open( disk_filename, "rb" ) as disk_file:
+            image = d64.D64Image( bytearray( disk_file.read() ) )
+
+        self.assertEqual( image.get_name(), ( "TEST", "01" ) )
+        self.assertEqual( [ entry["name"] for entry in image.get_directory() ], [ "BORDER", "HIRES" ] )
+        self.assertEqual( image.read_file( "border" ), bytes([0x00, 0xC0, 0xEA, 0x60]) )
+
+
+if __name__ == '__main__':
+        unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import run_stats
+
+class RunStatsTests( unittest.TestCase ):
+
+    def test_phases(self):
+        stats = run_stats.RunStats()
+
+        self.assertEqual( stats.get_phase( "tokenize" ), ( 0.0, 0.0 ) )
+
+        # A phase run more than once adds up
+        for run in range( 0, 2 ):
+            stats.start( "tokenize" )
+            sum( range( 10000 ) )
+            stats.stop( "tokenize" )
+
+        wall, cpu = stats.get_phase( "tokenize" )
+        self.assertGreater( wall, 0 )
+        self.assertGreaterEqual( cpu, 0 )
+
+
+    def test_count(self):
+        stats = run_stats.RunStats()
+
+        stats.count( "label_lookups" )
+        stats.count( "label_lookups", 2 )
+        stats.count( "tokens", 15 )
+
+        self.assertEqual( stats.counters, { "label_lookups": 3, "tokens": 15 } )
+
+
+    def test_to_dict(self):
+        stats = run_stats.RunStats()
+
+        stats.start( "assemble" )
+        stats.stop( "assemble" )
+        stats.count( "bytes_emitted", 16 )
+
+        profile = json.loads( json.dumps( stats.to_dict() ) )
+
+        self.assertEqual( list( profile["phases"] ), [ "assemble" ] )
+        self.assertEqual( sorted( profile["phases"]["assemble"] ), [ "cpu_ms", "wall_ms" ] )
+        self.assertEqual( profile["counters"], { "bytes_emitted": 16 } )
+        self.assertEqual( profile["total_wall_ms"], profile["phases"]["assemble"]["wall_ms"] )
+
+
+if __name__ == '__main__':
+        unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import symbol_table
+from symbol_table import SymbolKind
+from assembly_parser import TokenKind
+
+class SymbolTableTests( unittest.TestCase ):
+
+    def test_define(self):
+        table = symbol_table.SymbolTable()
+
+        table.define( "loop", SymbolKind.ADDRESS, 0xC000 )
+
+        self.assertTrue( "loop" in table )
+        self.assertEqual( table.get( "loop" ), ( SymbolKind.ADDRESS, 0xC000 ) )
+        self.assertIsNone( table.get( "missing" ) )
+
+
+    def test_format_symbol(self):
+        self.assertEqual( symbol_table.format_symbol( SymbolKind.ADDRESS, 0xC000 ), "$c000" )
+        self.assertEqual( symbol_table.format_symbol( SymbolKind.BYTE, 0xFB ), "$fb" )
+        self.assertEqual( symbol_table.format_symbol( SymbolKind.WORD, 0x00FB ), "$00fb" )
+        self.assertEqual( symbol_table.format_symbol( SymbolKind.IMMEDIATE, 0x20 ), "#$20" )
+
+
+    def test_token_kinds(self):
+        self.assertEqual( SymbolKind.FROM_TOKEN_KINDS[TokenKind.ZEROPAGE], SymbolKind.BYTE )
+        self.assertEqual( SymbolKind.FROM_TOKEN_KINDS[TokenKind.ABSOLUTE], SymbolKind.WORD )
+        self.assertEqual( SymbolKind.TOKEN_KINDS[SymbolKind.WORD], TokenKind.ABSOLUTE )
+        self.assertEqual( SymbolKind.TOKEN_KINDS[SymbolKind.IMMEDIATE], TokenKind.IMMEDIATE )
+        self.assertIsNone( SymbolKind.FROM_TOKEN_KINDS.get( TokenKind.LABEL ) )
+
+
+    def test_export_load(self):
+        table = symbol_table.SymbolTable()
+        table.define( "loop", SymbolKind.ADDRESS, 0xC000 )
+        table.define( "PTR", SymbolKind.BYTE, 0xFB )
+
+        self.assertEqual( table.export_text(), { "loop": "$c000", "PTR": "$fb" } )
+
+        # Survives a round trip through json, as the assembly cache stores it
+        loaded = symbol_table.SymbolTable.load( json.loads( json.dumps( table.export() ) ) )
+
+        self.assertIsInstance( loaded, symbol_table.SymbolTable )
+        self.assertEqual( loaded, table )
+
+
+if __name__ == '__main__':
+        unittest.main()
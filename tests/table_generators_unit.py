@@ -0,0 +1,92 @@
+import unittest
+import sys
+import os
+import math
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import main modules
+import table_generators
+
+class TableGeneratorsTests( unittest.TestCase ):
+
+    def tearDown(self):
+        # Tables are memoized, don't let one computed with or without NumPy leak into other tests
+        table_generators.generate.cache_clear()
+
+
+    def test_sine(self):
+        # The same values as helpers/sine.py
+        expected = bytes( int( 128 + 127 * math.sin( math.radians( angle ) ) ) for angle in range(360) )
+        self.assertEqual( table_generators.table( "sine 360 127 128" ), expected )
+
+        # Values are truncated, cos( 3 * pi / 2 ) is a hair below zero
+        self.assertEqual( table_generators.table( "cosine, 4, 100, $80" ), bytes([228, 128, 28, 127]) )
+
+
+    def test_linear(self):
+        self.assertEqual( table_generators.table( "linear $100 $100" ), bytes( range(256) ) )
+        self.assertEqual( table_generators.table( "linear 4 8 16" ), bytes([16, 18, 20, 22]) )
+
+
+    def test_expression(self):
+        self.assertEqual( table_generators.table( '"$20 + i * 2" 4' ), bytes([0x20, 0x22, 0x24, 0x26]) )
+        self.assertEqual( table_generators.table( '"offset - amplitude * floor( i / 2 )" 4 3 10' ), bytes([10, 10, 7, 7]) )
+        self.assertEqual( table_generators.table( '"n" 2' ), bytes([2, 2]) )
+
+
+    def test_memoized(self):
+        table = table_generators.table( "sine 256 127 128" )
+        self.assertIs( table_generators.table( "sine 256 127 128" ), table )
+
+
+    def test_fill(self):
+        self.assertEqual( table_generators.fill( "3 $EA" ), bytes([0xEA, 0xEA, 0xEA]) )
+        self.assertEqual( table_generators.fill( "2" ), bytes(2) )
+
+
+    def test_errors(self):
+        for arguments in [ "square 10", "sine", "sine 0 1", "linear 4 512", '"i * 100" 4', '"1 / ( i - 1 )" 4',
+                           '"__import__( \'os\' )" 1', '"i.real" 1', '"x" 1', '"(" 1', "sine 4 foo",
+                           '"sin" 4', '"sin( 1, 2 )" 4', '"( i - 2 ) ** 0.5" 4', '"1 / 0" 4' ]:
+            with self.assertRaises( ValueError, msg=arguments ):
+                table_generators.table( arguments )
+
+        for arguments in [ "", "4 $100", "$10001", "4 1.5" ]:
+            with self.assertRaises( ValueError, msg=arguments ):
+                table_generators.fill( arguments )
+
+
+    def test_without_numpy(self):
+        numpy = table_generators.numpy
+        table_generators.numpy = None
+        table_generators.generate.cache_clear()
+
+        try:
+            self.assertEqual( table_generators.table( "cosine, 4, 100, $80" ), bytes([228, 128, 28, 127]) )
+            self.assertEqual( table_generators.table( '"abs( i - 2 ) * 3" 4' ), bytes([6, 3, 0, 3]) )
+
+            with self.assertRaises( ValueError ):
+                table_generators.table( '"sin" 4' )
+        finally:
+            table_generators.numpy = numpy
+
+
+    @unittest.skipIf( table_generators.numpy == None, "NumPy is not installed" )
+    def test_numpy(self):
+        # Computed for the whole table at once, the values are the same as one at a time
+        for arguments in [ "sine 360 127 128", "cosine, 4, 100, $80", "linear $100 $100", '"abs( i - 2 ) * 3" 4' ]:
+            expected = table_generators.table( arguments )
+            table_generators.generate.cache_clear()
+
+            numpy = table_generators.numpy
+            table_generators.numpy = None
+            try:
+                self.assertEqual( table_generators.table( arguments ), expected, msg=arguments )
+            finally:
+                table_generators.numpy = numpy
+                table_generators.generate.cache_clear()
+
+
+if __name__ == '__main__':
+        unittest.main()